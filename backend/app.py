@@ -3,10 +3,12 @@ Synora Backend - FastAPI Application
 Think Beyond.
 Main entry point for the API server
 """
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import uvicorn
+import anyio
+import asyncio
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -15,12 +17,26 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from routes import notes, search, graph, tags, auth, projects, tasks, ideas, habits
-from routes import snippets, attachments, connects
+from routes import snippets, attachments, connects, sync, realtime
+from models.user import User
+from routes.auth import get_current_user
 from services.index_service import IndexService
+from services.database import close_database
+from services.user_cache import user_cache
+from services.password_service import password_hasher
+from services.graph_service import graph_cache, graph_index_cache
+from services.layout_service import layout_cache
+from services.analytics_service import analytics_cache
+from services.tag_service import TAG_VERIFY_INTERVAL, run_tag_count_verifier
+from services.write_buffer import note_buffer
+from services.event_bus import event_bus
+from services.image_service import image_derivatives
 
 # Configuration
 VAULT_PATH = Path(os.getenv("VAULT_PATH", "./vault"))
 DATABASE_PATH = Path(os.getenv("DATABASE_PATH", "./data/notes.db"))
+# Worker threads for sync route handlers and SQLite calls
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "40"))
 
 # CORS Origins - specific origins for security
 _cors_env = os.getenv("CORS_ORIGINS", "")
@@ -48,6 +64,9 @@ DATABASE_PATH.parent.mkdir(parents=True, exist_ok=True)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize services on startup"""
+    # Size the threadpool that sync handlers and database calls run in
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    
     # Initialize index service
     index_service = IndexService(VAULT_PATH, DATABASE_PATH)
     await index_service.initialize()
@@ -56,6 +75,17 @@ async def lifespan(app: FastAPI):
     app.state.index_service = index_service
     app.state.vault_path = VAULT_PATH
     
+    # Periodically check the materialized tag counts against note_tags
+    tag_verifier = None
+    if TAG_VERIFY_INTERVAL > 0:
+        tag_verifier = asyncio.create_task(run_tag_count_verifier(TAG_VERIFY_INTERVAL))
+    
+    # Write coalesced note saves in the background
+    note_flusher = asyncio.create_task(note_buffer.run_flusher()) if note_buffer.enabled else None
+    
+    # Push committed changes to WebSocket subscribers
+    await event_bus.start()
+    
     print(f"✅ Synora Backend started")
     print(f"📁 Vault Path: {VAULT_PATH.absolute()}")
     print(f"🗄️  Database: {DATABASE_PATH.absolute()}")
@@ -64,7 +94,18 @@ async def lifespan(app: FastAPI):
     yield
     
     # Cleanup
+    if tag_verifier is not None:
+        tag_verifier.cancel()
+    if note_flusher is not None:
+        note_flusher.cancel()
+    flushed = await note_buffer.flush_all()
+    if flushed:
+        print(f"💾 Flushed {flushed} buffered note saves")
+    await event_bus.stop()
     await index_service.close()
+    close_database()
+    password_hasher.close()
+    image_derivatives.close()
 
 
 # Create FastAPI app
@@ -82,6 +123,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Total-Count"],
 )
 
 # Include routers
@@ -97,6 +139,8 @@ app.include_router(habits.router, prefix="/api/habits", tags=["habits"])
 app.include_router(snippets.router, prefix="/api/snippets", tags=["snippets"])
 app.include_router(attachments.router, prefix="/api/attachments", tags=["attachments"])
 app.include_router(connects.router, prefix="/api/connects", tags=["connects"])
+app.include_router(sync.router, prefix="/api/sync", tags=["sync"])
+app.include_router(realtime.router, tags=["realtime"])
 
 
 @app.get("/")
@@ -116,6 +160,23 @@ async def health():
     return {"status": "healthy"}
 
 
+@app.get("/api/metrics")
+async def metrics(current_user: User = Depends(get_current_user)):
+    """In-process cache and worker pool counters (signed-in users only; nginx
+    does not expose this route)"""
+    return {
+        "user_cache": user_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "graph_cache": graph_cache.stats(),
+        "graph_index_cache": graph_index_cache.stats(),
+        "layout_cache": layout_cache.stats(),
+        "analytics_cache": analytics_cache.stats(),
+        "note_buffer": note_buffer.stats(),
+        "event_bus": event_bus.stats(),
+        "image_derivatives": image_derivatives.stats()
+    }
+
+
 if __name__ == "__main__":
     uvicorn.run(
         "app:app",
@@ -0,0 +1,121 @@
+"""
+Concurrency Benchmark - Measure throughput of cheap requests next to slow ones
+Run against a live server (like test_api.py):
+
+    python bench_concurrency.py --base-url http://localhost:8000
+
+Seeds a benchmark user with bulk notes, then measures GET /api/projects
+throughput and latency on its own and while other clients keep the server
+busy with full-scan searches. Before the data-access layer moved off the
+event loop, a single slow search stalled every other request on the worker.
+"""
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCH_USER = {
+    "email": "bench@example.com",
+    "username": "bench",
+    "password": "benchpassword123"
+}
+
+
+def get_token(base_url: str) -> str:
+    """Register the benchmark user, or log in if it already exists"""
+    r = requests.post(f"{base_url}/api/auth/register", json=BENCH_USER, timeout=30)
+    if r.status_code == 400:
+        r = requests.post(f"{base_url}/api/auth/login", json={
+            "email": BENCH_USER["email"],
+            "password": BENCH_USER["password"]
+        }, timeout=30)
+    r.raise_for_status()
+    return r.json()["access_token"]
+
+
+def seed_notes(base_url: str, headers: dict, count: int, size: int):
+    """Create bulk notes so LIKE searches have to scan real content"""
+    existing = requests.get(f"{base_url}/api/notes", headers=headers, timeout=60).json()
+    body = ("lorem ipsum dolor sit amet consectetur " * (size // 39 + 1))[:size]
+    with requests.Session() as session:
+        for i in range(len(existing), count):
+            session.post(f"{base_url}/api/notes", headers=headers, json={
+                "name": f"bench-{i:05d}",
+                "content": f"# Bench {i}\n\n{body}"
+            }, timeout=60).raise_for_status()
+
+
+def hammer(url: str, headers: dict, stop: threading.Event, latencies: list):
+    """Issue requests back to back until stopped, recording latencies"""
+    with requests.Session() as session:
+        while not stop.is_set():
+            start = time.perf_counter()
+            r = session.get(url, headers=headers, timeout=120)
+            if r.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+
+
+def run_phase(base_url: str, headers: dict, clients: int, slow_clients: int, duration: float):
+    """Measure cheap-request throughput with optional slow background load"""
+    stop = threading.Event()
+    fast, slow = [], []
+    fast_url = f"{base_url}/api/projects"
+    slow_url = f"{base_url}/api/search?q=no-such-term&limit=100"
+
+    with ThreadPoolExecutor(max_workers=clients + slow_clients) as pool:
+        futures = [pool.submit(hammer, slow_url, headers, stop, slow) for _ in range(slow_clients)]
+        if slow_clients:
+            time.sleep(0.5)  # Let the slow load build up first
+        futures += [pool.submit(hammer, fast_url, headers, stop, fast) for _ in range(clients)]
+        time.sleep(duration)
+        stop.set()
+        for future in futures:
+            future.result()
+
+    if not fast:
+        return {"rps": 0.0, "p50": None, "p95": None, "slow": len(slow)}
+    fast.sort()
+    return {
+        "rps": len(fast) / duration,
+        "p50": statistics.median(fast) * 1000,
+        "p95": fast[int(len(fast) * 0.95) - 1] * 1000,
+        "slow": len(slow)
+    }
+
+
+def print_phase(label: str, result: dict):
+    if result["p50"] is None:
+        print(f"{label:<28} no requests completed")
+        return
+    print(f"{label:<28} {result['rps']:8.1f} req/s   "
+          f"p50 {result['p50']:7.1f} ms   p95 {result['p95']:7.1f} ms   "
+          f"(slow searches: {result['slow']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synora concurrency benchmark")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--notes", type=int, default=2000, help="Notes to seed")
+    parser.add_argument("--note-size", type=int, default=4000, help="Bytes per note")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent cheap clients")
+    parser.add_argument("--slow-clients", type=int, default=2, help="Concurrent search clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per phase")
+    args = parser.parse_args()
+
+    base_url = args.base_url.rstrip("/")
+    headers = {"Authorization": f"Bearer {get_token(base_url)}"}
+
+    print(f"Seeding {args.notes} notes...")
+    seed_notes(base_url, headers, args.notes, args.note_size)
+
+    print_phase("cheap requests only", run_phase(
+        base_url, headers, args.clients, 0, args.duration))
+    print_phase("with slow searches", run_phase(
+        base_url, headers, args.clients, args.slow_clients, args.duration))
+
+
+if __name__ == "__main__":
+    main()
@@ -72,12 +72,17 @@ def init_database():
                 modified TIMESTAMP,
                 created_at TEXT,
                 modified_at TEXT,
+                version INTEGER NOT NULL DEFAULT 1,
                 FOREIGN KEY (user_id) REFERENCES users(id)
             )
         """)
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_notes_user ON notes(user_id)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_notes_name ON notes(name)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_notes_user_title ON notes(user_id, title)")
         cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_notes_user_name ON notes(user_id, name)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_notes_user_modified ON notes(user_id, modified_at, id, name, path, title, project, tags)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_notes_user_project ON notes(user_id, project, modified_at, id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_notes_user_path ON notes(user_id, path)")
         print("✅ Notes table created")
         
         # FTS5 for full-text search
@@ -99,17 +104,16 @@ def init_database():
         """)
         cursor.execute("""
             CREATE TRIGGER IF NOT EXISTS notes_ad AFTER DELETE ON notes BEGIN
-                DELETE FROM notes_fts WHERE rowid = old.rowid;
+                INSERT INTO notes_fts(notes_fts, rowid, name, title, content, tags)
+                VALUES ('delete', old.rowid, old.name, old.title, old.content, old.tags);
             END
         """)
         cursor.execute("""
             CREATE TRIGGER IF NOT EXISTS notes_au AFTER UPDATE ON notes BEGIN
-                UPDATE notes_fts SET 
-                    name = new.name,
-                    title = new.title,
-                    content = new.content,
-                    tags = new.tags
-                WHERE rowid = old.rowid;
+                INSERT INTO notes_fts(notes_fts, rowid, name, title, content, tags)
+                VALUES ('delete', old.rowid, old.name, old.title, old.content, old.tags);
+                INSERT INTO notes_fts(rowid, name, title, content, tags)
+                VALUES (new.rowid, new.name, new.title, new.content, new.tags);
             END
         """)
         print("✅ FTS5 search index created")
@@ -156,6 +160,7 @@ def init_database():
                 linked_notes TEXT,
                 created_at TEXT NOT NULL,
                 modified_at TEXT NOT NULL,
+                version INTEGER NOT NULL DEFAULT 1,
                 FOREIGN KEY (user_id) REFERENCES users(id),
                 FOREIGN KEY (project_id) REFERENCES projects(id)
             )
@@ -256,6 +261,7 @@ def init_database():
                 reminder TEXT,
                 created_at TEXT NOT NULL,
                 modified_at TEXT NOT NULL,
+                version INTEGER NOT NULL DEFAULT 1,
                 FOREIGN KEY (user_id) REFERENCES users(id)
             )
         """)
@@ -266,23 +272,27 @@ def init_database():
         # ============================================================
         # ATTACHMENTS TABLE
         # ============================================================
+        # Metadata only; files live in ATTACHMENTS_PATH, named by their SHA-256.
+        # Older tables (BLOBs in a data column) are migrated by the backend on start.
         print("\n📦 Creating attachments table...")
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS attachments (
                 id TEXT PRIMARY KEY,
-                user_id TEXT NOT NULL,
+                user_id TEXT,
                 filename TEXT NOT NULL,
-                original_name TEXT NOT NULL,
-                mime_type TEXT,
-                size INTEGER,
+                content_type TEXT,
+                size INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
                 note_name TEXT,
-                created_at TEXT NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES users(id)
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_attachments_user ON attachments(user_id)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_attachments_note ON attachments(note_name)")
-        print("✅ Attachments table created")
+        cursor.execute("PRAGMA table_info(attachments)")
+        if "sha256" in [row[1] for row in cursor.fetchall()]:
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_attachments_sha256 ON attachments(sha256)")
+            print("✅ Attachments table created")
+        else:
+            print("⚠️  Old attachments table found, it is migrated when the backend starts")
         
         # ============================================================
         # SESSIONS TABLE (for JWT refresh tokens)
@@ -11,7 +11,9 @@ class GraphNode(BaseModel):
     label: str
     title: Optional[str] = None
     tags: List[str] = Field(default_factory=list)
-    size: int = 1  # Number of connections
+    size: int = 1  # Relative importance (PageRank, 1 = average note)
+    x: Optional[float] = None  # Precomputed layout position (layout=true)
+    y: Optional[float] = None
 
 
 class GraphEdge(BaseModel):
@@ -25,3 +27,24 @@ class GraphData(BaseModel):
     """Complete graph structure"""
     nodes: List[GraphNode]
     edges: List[GraphEdge]
+
+
+class NodeStats(BaseModel):
+    """Link analysis scores for one note"""
+    id: str
+    pagerank: float
+    hub: float
+    authority: float
+    component: int  # 0 = largest connected component
+    in_degree: int
+    out_degree: int
+
+
+class GraphStats(BaseModel):
+    """Graph-wide link analysis"""
+    node_count: int
+    edge_count: int
+    component_count: int
+    component_sizes: List[int]
+    orphans: List[str]
+    nodes: List[NodeStats]  # Sorted by PageRank, highest first
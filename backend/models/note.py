@@ -30,6 +30,7 @@ class Note(BaseModel):
     modified: Optional[datetime] = None
     user_id: Optional[str] = None  # Owner of the note
     is_encrypted: bool = False  # Whether content is encrypted
+    version: int = 1  # Bumped on every write; base for PATCH
 
 
 class NoteCreate(BaseModel):
@@ -64,3 +65,24 @@ class SearchResult(BaseModel):
     snippet: str
     score: float
     tags: List[str] = Field(default_factory=list)
+
+
+class Suggestion(BaseModel):
+    """Typeahead completion"""
+    type: str  # note, tag or project
+    value: str
+    name: Optional[str] = None  # Note name or project ID to open
+    count: int = 0  # Notes using the tag/project
+
+
+class Splice(BaseModel):
+    """Replace `delete` characters at `start` with `insert` (UTF-16 offsets into the base text)"""
+    start: int = Field(ge=0)
+    delete: int = Field(0, ge=0)
+    insert: str = ""
+
+
+class NotePatch(BaseModel):
+    """Incremental update request"""
+    base_version: int
+    splices: List[Splice] = Field(max_length=10000)
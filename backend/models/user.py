@@ -5,8 +5,12 @@ from pydantic import BaseModel, EmailStr, Field
 from typing import Optional
 from datetime import datetime
 import bcrypt
+import os
 import secrets
 
+# bcrypt work factor for new hashes; existing hashes are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -61,7 +65,7 @@ class TwoFactorVerify(BaseModel):
 # Password hashing utilities
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt"""
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
@@ -74,6 +78,15 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     )
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Check whether a hash was made with a different work factor"""
+    try:
+        rounds = int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds != BCRYPT_ROUNDS
+
+
 def generate_backup_codes(count: int = 10) -> list[str]:
     """Generate backup codes for 2FA recovery"""
     return [secrets.token_hex(4).upper() for _ in range(count)]
@@ -1,49 +1,60 @@
 """
-Attachments route - handles image uploads and retrieval in database
+Attachments route - handles image uploads and retrieval from the attachment store
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Depends, BackgroundTasks, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import Response
+import logging
 import sqlite3
 import uuid
 from pathlib import Path
-from typing import List
-import base64
+from typing import List, Optional
+
+from models.user import User
+from routes.auth import get_current_user
+from services.database import Database, get_database, get_read_db, get_write_db
+from services.attachment_service import (
+    ATTACHMENTS_ACCEL_PREFIX, ATTACHMENTS_CACHE_CONTROL, FileTooLarge,
+    add_attachment, blob_store, init_attachments_table
+)
+from services.file_response import RangeFileResponse
+from services.image_service import (
+    FORMATS, PASSTHROUGH_TYPES, image_derivatives, release_attachment_files, snap_width
+)
+from services.version_service import etag_matches
+from services.write_buffer import note_buffer
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 ALLOWED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.svg', '.bmp'}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
-def get_db_connection(db_path: Path):
-    """Get database connection"""
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    return conn
+def init_attachments_db():
+    """Initialize the attachment tables, moving old BLOBs out of the database"""
+    with get_database().write() as conn:
+        moved = init_attachments_table(conn, blob_store)
+    if moved:
+        print(f"📦 Moved {moved} attachments from the database to {blob_store.root}")
+        # Give the pages the BLOBs used back to the filesystem
+        with get_database().write() as conn:
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
 
-def init_attachments_table(db_path: Path):
-    """Initialize attachments table if it doesn't exist"""
-    conn = get_db_connection(db_path)
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS attachments (
-            id TEXT PRIMARY KEY,
-            filename TEXT NOT NULL,
-            content_type TEXT NOT NULL,
-            data BLOB NOT NULL,
-            size INTEGER NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    conn.commit()
-    conn.close()
+
+# Initialize table on import
+init_attachments_db()
 
 
 @router.post("/upload")
-async def upload_attachment(request: Request, file: UploadFile = File(...)):
-    """Upload an image attachment to database"""
-    db_path = request.app.state.vault_path.parent / "data" / "notes.db"
-    init_attachments_table(db_path)
-    
+async def upload_attachment(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    db: Database = Depends(get_database)
+):
+    """Upload an image attachment to the attachment store"""
     # Check file extension
     file_ext = Path(file.filename).suffix.lower()
     if file_ext not in ALLOWED_EXTENSIONS:
@@ -52,11 +63,11 @@ async def upload_attachment(request: Request, file: UploadFile = File(...)):
             detail=f"File type not allowed. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
         )
     
-    # Read file content
-    content = await file.read()
-    
-    # Check file size
-    if len(content) > MAX_FILE_SIZE:
+    # Copy the upload to disk in chunks, hashing as it goes, and check the
+    # size on the way instead of reading the whole file into memory
+    try:
+        digest, temp, size = await run_in_threadpool(blob_store.stage, file.file, MAX_FILE_SIZE)
+    except FileTooLarge:
         raise HTTPException(
             status_code=400,
             detail=f"File too large. Maximum size: {MAX_FILE_SIZE / 1024 / 1024}MB"
@@ -65,59 +76,106 @@ async def upload_attachment(request: Request, file: UploadFile = File(...)):
     # Generate unique ID
     attachment_id = uuid.uuid4().hex
     
-    # Save to database
-    conn = get_db_connection(db_path)
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO attachments (id, filename, content_type, data, size)
-        VALUES (?, ?, ?, ?, ?)
-    """, (attachment_id, file.filename, file.content_type, content, len(content)))
-    conn.commit()
-    conn.close()
+    # Only the rename into place and the metadata row need the writer
+    try:
+        await db.run_write(
+            add_attachment, blob_store, attachment_id, file.filename, file.content_type,
+            size, digest, temp, current_user.id
+        )
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+    
+    # Render the usual display sizes once the response is out
+    if file.content_type not in PASSTHROUGH_TYPES:
+        background_tasks.add_task(image_derivatives.pregenerate, blob_store.path(digest), digest)
     
     return {
         "id": attachment_id,
         "filename": file.filename,
-        "size": len(content),
+        "size": size,
         "url": f"/api/attachments/{attachment_id}"
     }
 
 
-@router.get("/{attachment_id}")
-async def get_attachment(request: Request, attachment_id: str):
-    """Get an attachment by ID from database"""
-    db_path = request.app.state.vault_path.parent / "data" / "notes.db"
-    
-    conn = get_db_connection(db_path)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT filename, content_type, data
+def _get_attachment_row(conn: sqlite3.Connection, attachment_id: str) -> Optional[sqlite3.Row]:
+    return conn.execute("""
+        SELECT filename, content_type, sha256
         FROM attachments
         WHERE id = ?
-    """, (attachment_id,))
-    
-    row = cursor.fetchone()
-    conn.close()
+    """, (attachment_id,)).fetchone()
+
+
+@router.get("/{attachment_id}")
+async def get_attachment(
+    request: Request,
+    attachment_id: str,
+    w: Optional[int] = Query(None, ge=1, le=10000, description="Resize to at most this width"),
+    format: Optional[str] = Query(None, pattern="^(webp|jpeg|png)$"),
+    db: Database = Depends(get_database)
+):
+    """Get an attachment by ID from the attachment store.
+
+    With `w` and/or `format` an image is resized (never enlarged) and
+    re-encoded; widths are rounded up to a fixed set of sizes.
+    """
+    row = await db.run_read(_get_attachment_row, attachment_id)
     
     if not row:
         raise HTTPException(status_code=404, detail="Attachment not found")
     
-    return Response(
-        content=row['data'],
-        media_type=row['content_type'] or 'application/octet-stream',
-        headers={
-            'Content-Disposition': f'inline; filename="{row["filename"]}"'
-        }
-    )
+    digest = row['sha256']
+    media_type = row['content_type'] or 'application/octet-stream'
+    filename = row["filename"]
+    width = snap_width(w) if w else None
+    derived = bool(width or format) and media_type not in PASSTHROUGH_TYPES
+    fmt = format or {v: k for k, v in FORMATS.items()}.get(media_type, "webp")
+    
+    # The content hash is a strong validator that survives re-uploads and moves
+    etag = f'"{digest}_w{width or 0}.{fmt}"' if derived else f'"{digest}"'
+    cache_headers = {'ETag': etag, 'Cache-Control': ATTACHMENTS_CACHE_CONTROL}
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=cache_headers)
+    
+    path = blob_store.path(digest)
+    if not await run_in_threadpool(path.exists):
+        raise HTTPException(status_code=404, detail="Attachment file missing")
+    relative = blob_store.relative_path(digest)
+    
+    if derived:
+        try:
+            derivative = await image_derivatives.get(path, digest, width, fmt)
+        except HTTPException:
+            raise
+        except Exception:
+            # Not an image Pillow can read; serve the original
+            logger.warning("Image derivative for %s failed", attachment_id, exc_info=True)
+            derivative = None
+        if derivative:
+            relative = derivative
+            path = blob_store.root / derivative
+            media_type = FORMATS[fmt]
+            filename = f"{Path(filename).stem}.{fmt}"
+        else:
+            cache_headers['ETag'] = f'"{digest}"'
+    
+    headers = {
+        **cache_headers,
+        'Content-Disposition': f'inline; filename="{filename}"'
+    }
+    
+    # Let nginx send the bytes (sendfile, ranges) from its internal location
+    if ATTACHMENTS_ACCEL_PREFIX:
+        headers['X-Accel-Redirect'] = ATTACHMENTS_ACCEL_PREFIX + relative
+        return Response(media_type=media_type, headers=headers)
+    
+    return RangeFileResponse(path, media_type=media_type, headers=headers)
 
 
 @router.get("/")
-async def list_attachments(request: Request):
+def list_attachments(request: Request, conn: sqlite3.Connection = Depends(get_read_db)):
     """List all attachments from database"""
-    db_path = request.app.state.vault_path.parent / "data" / "notes.db"
-    init_attachments_table(db_path)
     
-    conn = get_db_connection(db_path)
     cursor = conn.cursor()
     cursor.execute("""
         SELECT id, filename, size, created_at
@@ -126,7 +184,6 @@ async def list_attachments(request: Request):
     """)
     
     rows = cursor.fetchall()
-    conn.close()
     
     attachments = []
     for row in rows:
@@ -142,41 +199,42 @@ async def list_attachments(request: Request):
 
 
 @router.delete("/{attachment_id}")
-async def delete_attachment(request: Request, attachment_id: str):
+def delete_attachment(
+    request: Request,
+    attachment_id: str,
+    conn: sqlite3.Connection = Depends(get_write_db)
+):
     """Delete an attachment from database"""
-    db_path = request.app.state.vault_path.parent / "data" / "notes.db"
     
-    conn = get_db_connection(db_path)
     cursor = conn.cursor()
     
     # Check if attachment exists
     cursor.execute("SELECT id FROM attachments WHERE id = ?", (attachment_id,))
     if not cursor.fetchone():
-        conn.close()
         raise HTTPException(status_code=404, detail="Attachment not found")
     
-    # Delete attachment
+    # Delete attachment, and its file if no other attachment has the same content
     cursor.execute("DELETE FROM attachments WHERE id = ?", (attachment_id,))
-    conn.commit()
-    conn.close()
+    release_attachment_files(conn)
     
     return {"message": "Attachment deleted successfully"}
 
 
 @router.post("/cleanup")
-async def cleanup_orphaned_attachments(request: Request):
+def cleanup_orphaned_attachments(request: Request, conn: sqlite3.Connection = Depends(get_write_db)):
     """Remove attachments that are not referenced in any note"""
-    db_path = request.app.state.vault_path.parent / "data" / "notes.db"
     
-    conn = get_db_connection(db_path)
     cursor = conn.cursor()
     
+    # Write buffered saves first, or an image only an unflushed autosave
+    # references would look orphaned
+    note_buffer.flush(conn)
+    
     # Get all attachment IDs
     cursor.execute("SELECT id FROM attachments")
     all_attachments = [row['id'] for row in cursor.fetchall()]
     
     if not all_attachments:
-        conn.close()
         return {"message": "No attachments found", "deleted": 0}
     
     # Get all notes content
@@ -191,9 +249,8 @@ async def cleanup_orphaned_attachments(request: Request):
     if orphaned_ids:
         placeholders = ','.join('?' * len(orphaned_ids))
         cursor.execute(f"DELETE FROM attachments WHERE id IN ({placeholders})", orphaned_ids)
-        conn.commit()
+        release_attachment_files(conn)
     
-    conn.close()
     
     return {
         "message": f"Cleaned up {len(orphaned_ids)} orphaned attachments",
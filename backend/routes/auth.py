@@ -12,7 +12,7 @@ import uuid
 from models.user import (
     UserCreate, UserLogin, User, UserInDB, Token, 
     TwoFactorSetup, TwoFactorVerify,
-    hash_password, verify_password, generate_backup_codes
+    password_needs_rehash, generate_backup_codes
 )
 from services.auth_service import (
     create_access_token, verify_token,
@@ -20,83 +20,88 @@ from services.auth_service import (
     is_account_locked, calculate_lockout_time
 )
 from services.encryption_service import EncryptionService
-import os
+from services.database import Database, get_database, get_write_db
+from services.user_cache import user_cache
+from services.password_service import password_hasher
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 security = HTTPBearer()
 
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "notes.db")
-
-
-def get_db():
-    """Get database connection"""
-    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
-    try:
-        conn.execute("PRAGMA journal_mode=WAL;")
-        conn.execute("PRAGMA busy_timeout=30000;")
-    except Exception:
-        pass
-    conn.row_factory = sqlite3.Row
-    return conn
-
 
 def init_auth_db():
     """Initialize authentication tables"""
-    conn = get_db()
-    cursor = conn.cursor()
+    with get_database().write() as conn:
+        cursor = conn.cursor()
     
-    # Users table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id TEXT PRIMARY KEY,
-            email TEXT UNIQUE NOT NULL,
-            username TEXT NOT NULL,
-            hashed_password TEXT NOT NULL,
-            is_active INTEGER DEFAULT 1,
-            is_2fa_enabled INTEGER DEFAULT 0,
-            totp_secret TEXT,
-            encryption_salt TEXT,
-            failed_login_attempts INTEGER DEFAULT 0,
-            locked_until TEXT,
-            created_at TEXT NOT NULL
-        )
-    """)
-    
-    # Backup codes table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS backup_codes (
-            id TEXT PRIMARY KEY,
-            user_id TEXT NOT NULL,
-            code TEXT NOT NULL,
-            used INTEGER DEFAULT 0,
-            created_at TEXT NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    """)
+        # Users table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id TEXT PRIMARY KEY,
+                email TEXT UNIQUE NOT NULL,
+                username TEXT NOT NULL,
+                hashed_password TEXT NOT NULL,
+                is_active INTEGER DEFAULT 1,
+                is_2fa_enabled INTEGER DEFAULT 0,
+                totp_secret TEXT,
+                encryption_salt TEXT,
+                failed_login_attempts INTEGER DEFAULT 0,
+                locked_until TEXT,
+                created_at TEXT NOT NULL
+            )
+        """)
     
-    # Sessions table (optional, for session management)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS sessions (
-            id TEXT PRIMARY KEY,
-            user_id TEXT NOT NULL,
-            token TEXT NOT NULL,
-            expires_at TEXT NOT NULL,
-            created_at TEXT NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    """)
+        # Backup codes table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS backup_codes (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                code TEXT NOT NULL,
+                used INTEGER DEFAULT 0,
+                created_at TEXT NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        """)
     
-    conn.commit()
-    conn.close()
+        # Sessions table (optional, for session management)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                token TEXT NOT NULL,
+                expires_at TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        """)
 
 
 # Initialize DB on import
 init_auth_db()
 
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
+def _user_from_row(row: sqlite3.Row) -> User:
+    return User(
+        id=row["id"],
+        email=row["email"],
+        username=row["username"],
+        created_at=datetime.fromisoformat(row["created_at"]),
+        is_active=bool(row["is_active"]),
+        is_2fa_enabled=bool(row["is_2fa_enabled"]),
+        encryption_salt=row["encryption_salt"] if "encryption_salt" in row.keys() else None,
+        failed_login_attempts=row["failed_login_attempts"]
+    )
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Database = Depends(get_database)
+) -> User:
     """Get current authenticated user from JWT token"""
-    token = credentials.credentials
+    return await user_from_token(credentials.credentials, db)
+
+
+async def user_from_token(token: str, db: Database) -> User:
+    """Resolve a JWT to its user; raises 401 if it is invalid"""
     payload = verify_token(token)
     email = payload.get("sub")
     
@@ -106,11 +111,12 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="Invalid authentication credentials"
         )
     
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
-    row = cursor.fetchone()
-    conn.close()
+    # Most requests are served from the cache without touching SQLite
+    user = user_cache.get(email)
+    if user is not None:
+        return user
+    
+    row = await db.run_read(_get_user_row, email)
     
     if row is None:
         raise HTTPException(
@@ -118,28 +124,62 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="User not found"
         )
     
-    return User(
-        id=row["id"],
-        email=row["email"],
-        username=row["username"],
-        created_at=datetime.fromisoformat(row["created_at"]),
-        is_active=bool(row["is_active"]),
-        is_2fa_enabled=bool(row["is_2fa_enabled"]),
-        encryption_salt=row["encryption_salt"] if "encryption_salt" in row.keys() else None,
-        failed_login_attempts=row["failed_login_attempts"]
-    )
+    user = _user_from_row(row)
+    user_cache.set(email, user)
+    return user
 
 
-@router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate):
-    """Register a new user"""
-    conn = get_db()
+def _get_user_row(conn: sqlite3.Connection, email: str) -> Optional[sqlite3.Row]:
+    """Fetch the full users row for an email"""
+    return conn.execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
+
+
+def _insert_user(conn: sqlite3.Connection, user_id: str, email: str, username: str,
+                 hashed_pw: str, encryption_salt: str, created_at: str):
+    conn.execute("""
+        INSERT INTO users (id, email, username, hashed_password, encryption_salt, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (user_id, email, username, hashed_pw, encryption_salt, created_at))
+
+
+def _record_failed_login(conn: sqlite3.Connection, user_id: str, attempts: int,
+                         locked_until: Optional[datetime]):
+    conn.execute("""
+        UPDATE users 
+        SET failed_login_attempts = ?, locked_until = ?
+        WHERE id = ?
+    """, (attempts, locked_until.isoformat() if locked_until else None, user_id))
+
+
+def _complete_login(conn: sqlite3.Connection, user_id: str, backup_code: Optional[str],
+                    new_hash: Optional[str] = None) -> bool:
+    """Consume a backup code (if given), reset failed attempts and store an upgraded hash"""
     cursor = conn.cursor()
+    if backup_code is not None:
+        cursor.execute("""
+            UPDATE backup_codes SET used = 1 
+            WHERE user_id = ? AND code = ? AND used = 0
+        """, (user_id, backup_code))
+        if cursor.rowcount == 0:
+            return False
     
+    # Reset failed attempts on successful login
+    cursor.execute("""
+        UPDATE users 
+        SET failed_login_attempts = 0, locked_until = NULL
+        WHERE id = ?
+    """, (user_id,))
+    
+    if new_hash is not None:
+        cursor.execute("UPDATE users SET hashed_password = ? WHERE id = ?", (new_hash, user_id))
+    return True
+
+
+@router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
+async def register(user_data: UserCreate, db: Database = Depends(get_database)):
+    """Register a new user"""
     # Check if user already exists
-    cursor.execute("SELECT id FROM users WHERE email = ?", (user_data.email,))
-    if cursor.fetchone():
-        conn.close()
+    if await db.run_read(_get_user_row, user_data.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
@@ -147,25 +187,27 @@ async def register(user_data: UserCreate):
     
     # Validate password strength
     if len(user_data.password) < 8:
-        conn.close()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Password must be at least 8 characters long"
         )
     
-    # Create user
+    # Create user (hash before taking the writer so other writes aren't held up)
     user_id = str(uuid.uuid4())
-    hashed_pw = hash_password(user_data.password)
+    hashed_pw = await password_hasher.hash(user_data.password)
     encryption_salt = EncryptionService.generate_salt()
     created_at = datetime.utcnow().isoformat()
     
-    cursor.execute("""
-        INSERT INTO users (id, email, username, hashed_password, encryption_salt, created_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (user_id, user_data.email, user_data.username, hashed_pw, encryption_salt, created_at))
-    
-    conn.commit()
-    conn.close()
+    try:
+        await db.run_write(
+            _insert_user, user_id, user_data.email, user_data.username,
+            hashed_pw, encryption_salt, created_at
+        )
+    except sqlite3.IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
     
     # Create access token
     access_token = create_access_token(data={"sub": user_data.email})
@@ -185,16 +227,11 @@ async def register(user_data: UserCreate):
 
 
 @router.post("/login", response_model=Token)
-async def login(credentials: UserLogin):
+async def login(credentials: UserLogin, db: Database = Depends(get_database)):
     """Login user"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT * FROM users WHERE email = ?", (credentials.email,))
-    row = cursor.fetchone()
+    row = await db.run_read(_get_user_row, credentials.email)
     
     if not row:
-        conn.close()
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -203,25 +240,18 @@ async def login(credentials: UserLogin):
     # Check if account is locked
     locked_until = datetime.fromisoformat(row["locked_until"]) if row["locked_until"] else None
     if is_account_locked(row["failed_login_attempts"], locked_until):
-        conn.close()
         raise HTTPException(
             status_code=status.HTTP_423_LOCKED,
             detail="Account is temporarily locked due to too many failed login attempts"
         )
     
     # Verify password
-    if not verify_password(credentials.password, row["hashed_password"]):
+    if not await password_hasher.verify(credentials.password, row["hashed_password"]):
         # Increment failed attempts
         new_attempts = row["failed_login_attempts"] + 1
         new_lockout = calculate_lockout_time(new_attempts)
-        
-        cursor.execute("""
-            UPDATE users 
-            SET failed_login_attempts = ?, locked_until = ?
-            WHERE id = ?
-        """, (new_attempts, new_lockout.isoformat() if new_lockout else None, row["id"]))
-        conn.commit()
-        conn.close()
+        await db.run_write(_record_failed_login, row["id"], new_attempts, new_lockout)
+        user_cache.invalidate(row["email"])
         
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -229,44 +259,30 @@ async def login(credentials: UserLogin):
         )
     
     # Check 2FA if enabled
+    backup_code = None
     if row["is_2fa_enabled"]:
         if not credentials.totp_code:
-            conn.close()
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="2FA code required"
             )
         
-        # Verify TOTP code
+        # Fall back to a backup code if the TOTP code doesn't verify
         if not verify_totp_code(row["totp_secret"], credentials.totp_code):
-            # Check backup codes
-            cursor.execute("""
-                SELECT id FROM backup_codes 
-                WHERE user_id = ? AND code = ? AND used = 0
-            """, (row["id"], credentials.totp_code))
-            backup_code = cursor.fetchone()
-            
-            if not backup_code:
-                conn.close()
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid 2FA code"
-                )
-            
-            # Mark backup code as used
-            cursor.execute("""
-                UPDATE backup_codes SET used = 1 WHERE id = ?
-            """, (backup_code["id"],))
-            conn.commit()
+            backup_code = credentials.totp_code
     
-    # Reset failed attempts on successful login
-    cursor.execute("""
-        UPDATE users 
-        SET failed_login_attempts = 0, locked_until = NULL
-        WHERE id = ?
-    """, (row["id"],))
-    conn.commit()
-    conn.close()
+    # Transparently upgrade hashes made with an old work factor
+    new_hash = None
+    if password_needs_rehash(row["hashed_password"]):
+        new_hash = await password_hasher.hash(credentials.password)
+    
+    if not await db.run_write(_complete_login, row["id"], backup_code, new_hash):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid 2FA code"
+        )
+    if row["failed_login_attempts"]:
+        user_cache.invalidate(row["email"])
     
     # Create access token
     access_token = create_access_token(data={"sub": credentials.email})
@@ -291,7 +307,10 @@ async def get_me(current_user: User = Depends(get_current_user)):
 
 
 @router.post("/2fa/setup", response_model=TwoFactorSetup)
-async def setup_2fa(current_user: User = Depends(get_current_user)):
+def setup_2fa(
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
+):
     """Setup 2FA for user"""
     # Generate TOTP secret
     secret = generate_totp_secret()
@@ -303,7 +322,6 @@ async def setup_2fa(current_user: User = Depends(get_current_user)):
     backup_codes = generate_backup_codes()
     
     # Store secret temporarily (not enabled until verified)
-    conn = get_db()
     cursor = conn.cursor()
     cursor.execute("""
         UPDATE users SET totp_secret = ? WHERE id = ?
@@ -318,7 +336,7 @@ async def setup_2fa(current_user: User = Depends(get_current_user)):
         """, (code_id, current_user.id, code, datetime.utcnow().isoformat()))
     
     conn.commit()
-    conn.close()
+    user_cache.invalidate(current_user.email)
     
     return TwoFactorSetup(
         secret=secret,
@@ -328,19 +346,18 @@ async def setup_2fa(current_user: User = Depends(get_current_user)):
 
 
 @router.post("/2fa/verify")
-async def verify_2fa(
+def verify_2fa(
     verification: TwoFactorVerify,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
     """Verify and enable 2FA"""
-    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute("SELECT totp_secret FROM users WHERE id = ?", (current_user.id,))
     row = cursor.fetchone()
     
     if not row or not row["totp_secret"]:
-        conn.close()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="2FA not set up"
@@ -348,7 +365,6 @@ async def verify_2fa(
     
     # Verify code
     if not verify_totp_code(row["totp_secret"], verification.totp_code):
-        conn.close()
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid 2FA code"
@@ -359,15 +375,17 @@ async def verify_2fa(
         UPDATE users SET is_2fa_enabled = 1 WHERE id = ?
     """, (current_user.id,))
     conn.commit()
-    conn.close()
+    user_cache.invalidate(current_user.email)
     
     return {"message": "2FA enabled successfully"}
 
 
 @router.post("/2fa/disable")
-async def disable_2fa(current_user: User = Depends(get_current_user)):
+def disable_2fa(
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
+):
     """Disable 2FA"""
-    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -380,6 +398,6 @@ async def disable_2fa(current_user: User = Depends(get_current_user)):
     cursor.execute("DELETE FROM backup_codes WHERE user_id = ?", (current_user.id,))
     
     conn.commit()
-    conn.close()
+    user_cache.invalidate(current_user.email)
     
     return {"message": "2FA disabled successfully"}
@@ -6,7 +6,6 @@ from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 import sqlite3
-import os
 import uuid
 
 from models.user import User
@@ -15,74 +14,59 @@ from models.connect import (
     ShareItem, SharedItem, UserSearchResult
 )
 from routes.auth import get_current_user
+from services.database import get_database, get_read_db, get_write_db
+from services.event_bus import event_bus
 
 router = APIRouter()
 
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "notes.db")
-
-
-def get_db():
-    """Get database connection"""
-    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
-    try:
-        conn.execute("PRAGMA journal_mode=WAL;")
-        conn.execute("PRAGMA busy_timeout=30000;")
-    except Exception:
-        pass
-    conn.row_factory = sqlite3.Row
-    return conn
-
 
 def init_connects_db():
     """Initialize connects tables"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    # Connect requests table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS connect_requests (
-            id TEXT PRIMARY KEY,
-            requester_id TEXT NOT NULL,
-            target_id TEXT NOT NULL,
-            status TEXT DEFAULT 'pending',
-            created_at TEXT NOT NULL,
-            FOREIGN KEY (requester_id) REFERENCES users (id),
-            FOREIGN KEY (target_id) REFERENCES users (id),
-            UNIQUE(requester_id, target_id)
-        )
-    """)
-    
-    # Connections table (established connections)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS connects (
-            id TEXT PRIMARY KEY,
-            user_id TEXT NOT NULL,
-            connected_user_id TEXT NOT NULL,
-            created_at TEXT NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (connected_user_id) REFERENCES users (id),
-            UNIQUE(user_id, connected_user_id)
-        )
-    """)
-    
-    # Shared items table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS shared_items (
-            id TEXT PRIMARY KEY,
-            item_type TEXT NOT NULL,
-            item_id TEXT NOT NULL,
-            owner_id TEXT NOT NULL,
-            shared_with_id TEXT NOT NULL,
-            permission TEXT DEFAULT 'view',
-            created_at TEXT NOT NULL,
-            FOREIGN KEY (owner_id) REFERENCES users (id),
-            FOREIGN KEY (shared_with_id) REFERENCES users (id),
-            UNIQUE(item_type, item_id, shared_with_id)
-        )
-    """)
+    with get_database().write() as conn:
+        cursor = conn.cursor()
     
-    conn.commit()
-    conn.close()
+        # Connect requests table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS connect_requests (
+                id TEXT PRIMARY KEY,
+                requester_id TEXT NOT NULL,
+                target_id TEXT NOT NULL,
+                status TEXT DEFAULT 'pending',
+                created_at TEXT NOT NULL,
+                FOREIGN KEY (requester_id) REFERENCES users (id),
+                FOREIGN KEY (target_id) REFERENCES users (id),
+                UNIQUE(requester_id, target_id)
+            )
+        """)
+    
+        # Connections table (established connections)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS connects (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                connected_user_id TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users (id),
+                FOREIGN KEY (connected_user_id) REFERENCES users (id),
+                UNIQUE(user_id, connected_user_id)
+            )
+        """)
+    
+        # Shared items table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS shared_items (
+                id TEXT PRIMARY KEY,
+                item_type TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                owner_id TEXT NOT NULL,
+                shared_with_id TEXT NOT NULL,
+                permission TEXT DEFAULT 'view',
+                created_at TEXT NOT NULL,
+                FOREIGN KEY (owner_id) REFERENCES users (id),
+                FOREIGN KEY (shared_with_id) REFERENCES users (id),
+                UNIQUE(item_type, item_id, shared_with_id)
+            )
+        """)
 
 
 # Initialize DB on import
@@ -92,15 +76,15 @@ init_connects_db()
 # ============= User Search =============
 
 @router.get("/users/search", response_model=List[UserSearchResult])
-async def search_users(
+def search_users(
     q: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_read_db)
 ):
     """Search for users by email or username to connect with"""
     if len(q) < 2:
         return []
     
-    conn = get_db()
     cursor = conn.cursor()
     
     # Search by email or username, excluding current user
@@ -112,7 +96,6 @@ async def search_users(
     """, (f"%{q}%", f"%{q}%", current_user.id))
     
     rows = cursor.fetchall()
-    conn.close()
     
     return [UserSearchResult(
         id=row["id"],
@@ -124,12 +107,12 @@ async def search_users(
 # ============= Connect Requests =============
 
 @router.post("/request", response_model=ConnectRequest)
-async def send_connect_request(
+def send_connect_request(
     connect_data: ConnectCreate,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
     """Send a connect request to another user"""
-    conn = get_db()
     cursor = conn.cursor()
     
     # Find target user by email or username
@@ -138,19 +121,16 @@ async def send_connect_request(
     elif connect_data.username:
         cursor.execute("SELECT id, username, email FROM users WHERE username = ?", (connect_data.username,))
     else:
-        conn.close()
         raise HTTPException(status_code=400, detail="Email or username required")
     
     target = cursor.fetchone()
     if not target:
-        conn.close()
         raise HTTPException(status_code=404, detail="User not found")
     
     target_id = target["id"]
     
     # Can't connect to yourself
     if target_id == current_user.id:
-        conn.close()
         raise HTTPException(status_code=400, detail="Cannot connect to yourself")
     
     # Check if already connected
@@ -161,7 +141,6 @@ async def send_connect_request(
     """, (current_user.id, target_id, target_id, current_user.id))
     
     if cursor.fetchone():
-        conn.close()
         raise HTTPException(status_code=400, detail="Already connected")
     
     # Check if request already exists
@@ -174,7 +153,6 @@ async def send_connect_request(
     existing = cursor.fetchone()
     if existing:
         if existing["status"] == "pending":
-            conn.close()
             raise HTTPException(status_code=400, detail="Connect request already pending")
         elif existing["status"] == "rejected":
             # Delete old rejected request and create new one
@@ -190,7 +168,7 @@ async def send_connect_request(
     """, (request_id, current_user.id, target_id, now))
     
     conn.commit()
-    conn.close()
+    event_bus.emit([current_user.id, target_id], {"type": "connects", "action": "request", "request_id": request_id})
     
     return ConnectRequest(
         id=request_id,
@@ -206,9 +184,8 @@ async def send_connect_request(
 
 
 @router.get("/requests/incoming", response_model=List[ConnectRequest])
-async def get_incoming_requests(current_user: User = Depends(get_current_user)):
+def get_incoming_requests(current_user: User = Depends(get_current_user), conn: sqlite3.Connection = Depends(get_read_db)):
     """Get all incoming connect requests"""
-    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -223,7 +200,6 @@ async def get_incoming_requests(current_user: User = Depends(get_current_user)):
     """, (current_user.id,))
     
     rows = cursor.fetchall()
-    conn.close()
     
     return [ConnectRequest(
         id=row["id"],
@@ -239,9 +215,8 @@ async def get_incoming_requests(current_user: User = Depends(get_current_user)):
 
 
 @router.get("/requests/outgoing", response_model=List[ConnectRequest])
-async def get_outgoing_requests(current_user: User = Depends(get_current_user)):
+def get_outgoing_requests(current_user: User = Depends(get_current_user), conn: sqlite3.Connection = Depends(get_read_db)):
     """Get all outgoing connect requests"""
-    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -256,7 +231,6 @@ async def get_outgoing_requests(current_user: User = Depends(get_current_user)):
     """, (current_user.id,))
     
     rows = cursor.fetchall()
-    conn.close()
     
     return [ConnectRequest(
         id=row["id"],
@@ -272,12 +246,12 @@ async def get_outgoing_requests(current_user: User = Depends(get_current_user)):
 
 
 @router.post("/requests/{request_id}/accept", response_model=Connect)
-async def accept_connect_request(
+def accept_connect_request(
     request_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
     """Accept an incoming connect request"""
-    conn = get_db()
     cursor = conn.cursor()
     
     # Get the request
@@ -288,7 +262,6 @@ async def accept_connect_request(
     
     request = cursor.fetchone()
     if not request:
-        conn.close()
         raise HTTPException(status_code=404, detail="Connect request not found")
     
     requester_id = request["requester_id"]
@@ -318,7 +291,7 @@ async def accept_connect_request(
     """, (connect_id_2, requester_id, current_user.id, now))
     
     conn.commit()
-    conn.close()
+    event_bus.emit([current_user.id, requester_id], {"type": "connects", "action": "accepted", "request_id": request_id})
     
     return Connect(
         id=connect_id_1,
@@ -331,12 +304,12 @@ async def accept_connect_request(
 
 
 @router.post("/requests/{request_id}/reject")
-async def reject_connect_request(
+def reject_connect_request(
     request_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
     """Reject an incoming connect request"""
-    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -346,35 +319,39 @@ async def reject_connect_request(
     """, (request_id, current_user.id))
     
     if cursor.rowcount == 0:
-        conn.close()
         raise HTTPException(status_code=404, detail="Connect request not found")
     
+    cursor.execute("SELECT requester_id FROM connect_requests WHERE id = ?", (request_id,))
+    requester_id = cursor.fetchone()["requester_id"]
+    
     conn.commit()
-    conn.close()
+    event_bus.emit([current_user.id, requester_id], {"type": "connects", "action": "rejected", "request_id": request_id})
     
     return {"message": "Connect request rejected"}
 
 
 @router.delete("/requests/{request_id}")
-async def cancel_connect_request(
+def cancel_connect_request(
     request_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
     """Cancel an outgoing connect request"""
-    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute("""
-        DELETE FROM connect_requests 
+        SELECT target_id FROM connect_requests 
         WHERE id = ? AND requester_id = ? AND status = 'pending'
     """, (request_id, current_user.id))
     
-    if cursor.rowcount == 0:
-        conn.close()
+    request = cursor.fetchone()
+    if not request:
         raise HTTPException(status_code=404, detail="Connect request not found")
     
+    cursor.execute("DELETE FROM connect_requests WHERE id = ?", (request_id,))
+    
     conn.commit()
-    conn.close()
+    event_bus.emit([current_user.id, request["target_id"]], {"type": "connects", "action": "cancelled", "request_id": request_id})
     
     return {"message": "Connect request cancelled"}
 
@@ -382,9 +359,8 @@ async def cancel_connect_request(
 # ============= Connections =============
 
 @router.get("", response_model=List[Connect])
-async def list_connects(current_user: User = Depends(get_current_user)):
+def list_connects(current_user: User = Depends(get_current_user), conn: sqlite3.Connection = Depends(get_read_db)):
     """List all connections for current user"""
-    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -396,7 +372,6 @@ async def list_connects(current_user: User = Depends(get_current_user)):
     """, (current_user.id,))
     
     rows = cursor.fetchall()
-    conn.close()
     
     return [Connect(
         id=row["id"],
@@ -409,12 +384,12 @@ async def list_connects(current_user: User = Depends(get_current_user)):
 
 
 @router.delete("/{connect_id}")
-async def remove_connect(
+def remove_connect(
     connect_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
     """Remove a connection"""
-    conn = get_db()
     cursor = conn.cursor()
     
     # Get the connection to find the other user
@@ -425,7 +400,6 @@ async def remove_connect(
     
     row = cursor.fetchone()
     if not row:
-        conn.close()
         raise HTTPException(status_code=404, detail="Connection not found")
     
     other_user_id = row["connected_user_id"]
@@ -445,7 +419,7 @@ async def remove_connect(
     """, (current_user.id, other_user_id, other_user_id, current_user.id))
     
     conn.commit()
-    conn.close()
+    event_bus.emit([current_user.id, other_user_id], {"type": "connects", "action": "removed"})
     
     return {"message": "Connection removed"}
 
@@ -453,17 +427,17 @@ async def remove_connect(
 # ============= Sharing =============
 
 @router.post("/share/{item_type}/{item_id}")
-async def share_item(
+def share_item(
     item_type: str,
     item_id: str,
     share_data: ShareItem,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
     """Share an item (project, note, task) with connects"""
     if item_type not in ["project", "note", "task"]:
         raise HTTPException(status_code=400, detail="Invalid item type")
     
-    conn = get_db()
     cursor = conn.cursor()
     
     # Verify the item belongs to the current user
@@ -475,7 +449,6 @@ async def share_item(
         cursor.execute("SELECT id FROM tasks WHERE id = ? AND user_id = ?", (item_id, current_user.id))
     
     if not cursor.fetchone():
-        conn.close()
         raise HTTPException(status_code=404, detail=f"{item_type.capitalize()} not found")
     
     now = datetime.utcnow().isoformat()
@@ -511,20 +484,23 @@ async def share_item(
             shared_with.append(shared_with_id)
     
     conn.commit()
-    conn.close()
+    event_bus.emit(
+        [current_user.id, *shared_with],
+        {"type": "shared", "action": "added", "item_type": item_type, "item_id": item_id}
+    )
     
     return {"message": f"{item_type.capitalize()} shared with {len(shared_with)} connects"}
 
 
 @router.delete("/share/{item_type}/{item_id}/{connect_id}")
-async def unshare_item(
+def unshare_item(
     item_type: str,
     item_id: str,
     connect_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
     """Remove sharing of an item from a connect"""
-    conn = get_db()
     cursor = conn.cursor()
     
     # Get the connected user ID
@@ -535,7 +511,6 @@ async def unshare_item(
     
     connect = cursor.fetchone()
     if not connect:
-        conn.close()
         raise HTTPException(status_code=404, detail="Connection not found")
     
     cursor.execute("""
@@ -544,15 +519,17 @@ async def unshare_item(
     """, (item_type, item_id, current_user.id, connect["connected_user_id"]))
     
     conn.commit()
-    conn.close()
+    event_bus.emit(
+        [current_user.id, connect["connected_user_id"]],
+        {"type": "shared", "action": "removed", "item_type": item_type, "item_id": item_id}
+    )
     
     return {"message": "Share removed"}
 
 
 @router.get("/shared/with-me", response_model=List[SharedItem])
-async def get_items_shared_with_me(current_user: User = Depends(get_current_user)):
+def get_items_shared_with_me(current_user: User = Depends(get_current_user), conn: sqlite3.Connection = Depends(get_read_db)):
     """Get all items shared with the current user"""
-    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -564,7 +541,6 @@ async def get_items_shared_with_me(current_user: User = Depends(get_current_user
     """, (current_user.id,))
     
     rows = cursor.fetchall()
-    conn.close()
     
     return [SharedItem(
         id=row["id"],
@@ -579,9 +555,8 @@ async def get_items_shared_with_me(current_user: User = Depends(get_current_user
 
 
 @router.get("/shared/by-me", response_model=List[SharedItem])
-async def get_items_shared_by_me(current_user: User = Depends(get_current_user)):
+def get_items_shared_by_me(current_user: User = Depends(get_current_user), conn: sqlite3.Connection = Depends(get_read_db)):
     """Get all items shared by the current user"""
-    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -593,7 +568,6 @@ async def get_items_shared_by_me(current_user: User = Depends(get_current_user))
     """, (current_user.id,))
     
     rows = cursor.fetchall()
-    conn.close()
     
     return [SharedItem(
         id=row["id"],
@@ -608,13 +582,13 @@ async def get_items_shared_by_me(current_user: User = Depends(get_current_user))
 
 
 @router.get("/shared/{item_type}/{item_id}")
-async def get_item_shares(
+def get_item_shares(
     item_type: str,
     item_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_read_db)
 ):
     """Get all shares for a specific item"""
-    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -625,7 +599,6 @@ async def get_item_shares(
     """, (item_type, item_id, current_user.id))
     
     rows = cursor.fetchall()
-    conn.close()
     
     return [{
         "id": row["id"],
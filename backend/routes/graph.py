@@ -1,58 +1,125 @@
 """
 Graph API routes - User-specific
 """
-from fastapi import APIRouter, Request, Depends
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from typing import Optional
 import sqlite3
-import os
-import json
 
-from models.graph import GraphData
+from models.graph import GraphData, GraphStats, NodeStats
 from models.user import User
 from routes.auth import get_current_user
+from services.database import get_read_db
+from services.graph_service import get_graph_index, graph_cache, graph_etag
+from services.vault_service import get_vault_version
+from services.version_service import etag_matches
+from services.layout_service import get_layout
+from services.analytics_service import get_analytics
 
 router = APIRouter()
 
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "notes.db")
-
-def get_db():
-    """Get database connection"""
-    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
-    try:
-        conn.execute("PRAGMA journal_mode=WAL;")
-        conn.execute("PRAGMA busy_timeout=30000;")
-    except Exception:
-        pass
-    conn.row_factory = sqlite3.Row
-    return conn
-
 
 @router.get("", response_model=GraphData)
-async def get_graph(current_user: User = Depends(get_current_user)):
+def get_graph(
+    layout: bool = Query(False, description="Include precomputed x/y positions"),
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_read_db)
+):
     """Get graph data for current user's notes"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    # Get all notes for this user
-    cursor.execute("""
-        SELECT id, name, title, tags 
-        FROM notes 
-        WHERE user_id = ?
-    """, (current_user.id,))
-    
-    rows = cursor.fetchall()
-    conn.close()
-    
-    # Build nodes
-    nodes = []
-    for row in rows:
-        tags = json.loads(row["tags"]) if row["tags"] else []
-        nodes.append({
-            "id": row["name"],
-            "label": row["title"] or row["name"],
-            "tags": tags
-        })
-    
-    # TODO: Build edges from note links
-    edges = []
-    
-    return GraphData(nodes=nodes, edges=edges)
+    headers = {"Cache-Control": "private, no-cache"}
+    
+    # Read the version before the graph: a concurrent write can only make
+    # the snapshot newer than its tag, which the next request corrects
+    version = get_vault_version(conn, current_user.id)
+    etag = graph_etag(current_user.id, version, "graph", layout)
+    headers["ETag"] = etag
+    
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    
+    cache_key = f"{current_user.id}:layout" if layout else current_user.id
+    body = graph_cache.get(cache_key, version)
+    if body is None:
+        index = get_graph_index(conn, current_user.id, version)
+        positions = get_layout(current_user.id, version, index).coordinates() if layout else None
+        sizes = get_analytics(current_user.id, version, index).sizes
+        body = index.to_graph_data(positions=positions, sizes=sizes).model_dump_json().encode("utf-8")
+        graph_cache.set(cache_key, version, body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/stats", response_model=GraphStats)
+def get_graph_stats(
+    limit: int = Query(100, ge=1, le=100000, description="Number of top-ranked notes to return"),
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_read_db)
+):
+    """PageRank, hub/authority scores, connected components and orphan notes"""
+    version = get_vault_version(conn, current_user.id)
+    etag = graph_etag(current_user.id, version, "stats", limit)
+    headers = {"Cache-Control": "private, no-cache", "ETag": etag}
+    
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    
+    index = get_graph_index(conn, current_user.id, version)
+    analytics = get_analytics(current_user.id, version, index)
+    
+    stats = GraphStats(
+        node_count=len(index),
+        edge_count=analytics.edge_count,
+        component_count=analytics.component_count,
+        component_sizes=analytics.component_sizes.tolist(),
+        orphans=[index.names[i] for i in analytics.orphans],
+        nodes=[
+            NodeStats(
+                id=index.names[i],
+                pagerank=round(float(analytics.pagerank[i]), 8),
+                hub=round(float(analytics.hubs[i]), 8),
+                authority=round(float(analytics.authorities[i]), 8),
+                component=int(analytics.components[i]),
+                in_degree=int(analytics.in_degree[i]),
+                out_degree=int(analytics.out_degree[i])
+            )
+            for i in analytics.top(limit)
+        ]
+    )
+    return Response(content=stats.model_dump_json(), media_type="application/json", headers=headers)
+
+
+@router.get("/neighborhood/{name:path}", response_model=GraphData)
+def get_neighborhood(
+    name: str,
+    depth: int = Query(2, ge=1, le=6, description="Maximum link distance from the note"),
+    limit: int = Query(200, ge=1, le=5000, description="Maximum number of nodes"),
+    layout: bool = Query(False, description="Include x/y positions from the full-graph layout"),
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_read_db)
+):
+    """Get the subgraph around a note (breadth-first, depth- and size-limited)"""
+    version = get_vault_version(conn, current_user.id)
+    etag = graph_etag(current_user.id, version, "neighborhood", name, depth, limit, layout)
+    headers = {"Cache-Control": "private, no-cache", "ETag": etag}
+    
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    
+    index = get_graph_index(conn, current_user.id, version)
+    start = index.resolve(name)
+    if start is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+    
+    node_ids = index.neighborhood(start, depth, limit)
+    positions = None
+    if layout:
+        full = get_layout(current_user.id, version, index)
+        positions = {index.names[i]: full.position(index.names[i]) for i in node_ids}
+    sizes = get_analytics(current_user.id, version, index).sizes
+    subgraph = index.to_graph_data(node_ids, positions, sizes)
+    return Response(
+        content=subgraph.model_dump_json(),
+        media_type="application/json",
+        headers=headers
+    )
@@ -4,12 +4,11 @@ from typing import Optional, List
 from datetime import datetime, date, timedelta
 from models.user import User
 from routes.auth import get_current_user
+from services.database import get_read_db, get_write_db
 import sqlite3
 import uuid
-import os
 
 router = APIRouter()
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "notes.db")
 
 class HabitCreate(BaseModel):
     name: str
@@ -25,17 +24,6 @@ class HabitUpdate(BaseModel):
     color: Optional[str] = None
     icon: Optional[str] = None
 
-def get_db():
-    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
-    try:
-        conn.execute("PRAGMA journal_mode=WAL;")
-        conn.execute("PRAGMA busy_timeout=30000;")
-    except Exception:
-        pass
-    conn.row_factory = sqlite3.Row
-    return conn
-
-
 def calculate_streak(habit_id: str, user_id: str, conn) -> dict:
     """Calculate current and best streak for a habit"""
     cursor = conn.cursor()
@@ -82,9 +70,8 @@ def calculate_streak(habit_id: str, user_id: str, conn) -> dict:
 
 
 @router.get("")
-async def get_habits(current_user: User = Depends(get_current_user)):
+def get_habits(current_user: User = Depends(get_current_user), conn: sqlite3.Connection = Depends(get_read_db)):
     """Get all habits for the current user"""
-    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute(
@@ -100,37 +87,36 @@ async def get_habits(current_user: User = Depends(get_current_user)):
     
     rows = cursor.fetchall()
     
-    habits = []
-    for row in rows:
-        row_dict = dict(row)
-        # Recalculate streaks based on completions
-        streak_info = calculate_streak(row_dict['id'], current_user.id, conn)
-        
-        habits.append({
-            'id': row_dict['id'],
-            'user_id': row_dict['user_id'],
-            'name': row_dict['name'],
-            'description': row_dict['description'],
-            'frequency': row_dict['frequency'],
-            'color': row_dict.get('color'),
-            'icon': row_dict.get('icon'),
-            'streak': streak_info['streak'],
-            'best_streak': streak_info['best_streak'],
-            'last_completed': row_dict['last_completed'],
-            'created_at': row_dict['created_at'],
-            'modified_at': row_dict['modified_at']
-        })
+    return [habit_list_item(dict(row), current_user.id, conn) for row in rows]
+
+
+def habit_list_item(row_dict: dict, user_id: str, conn) -> dict:
+    """A habits row as returned by the list endpoint"""
+    # Recalculate streaks based on completions
+    streak_info = calculate_streak(row_dict['id'], user_id, conn)
     
-    conn.close()
-    return habits
+    return {
+        'id': row_dict['id'],
+        'user_id': row_dict['user_id'],
+        'name': row_dict['name'],
+        'description': row_dict['description'],
+        'frequency': row_dict['frequency'],
+        'color': row_dict.get('color'),
+        'icon': row_dict.get('icon'),
+        'streak': streak_info['streak'],
+        'best_streak': streak_info['best_streak'],
+        'last_completed': row_dict['last_completed'],
+        'created_at': row_dict['created_at'],
+        'modified_at': row_dict['modified_at']
+    }
 
 @router.post("")
-async def create_habit(
+def create_habit(
     habit: HabitCreate,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
     """Create a new habit"""
-    conn = get_db()
     cursor = conn.cursor()
     
     now = datetime.now().isoformat()
@@ -155,7 +141,6 @@ async def create_habit(
     )
     
     conn.commit()
-    conn.close()
     
     return {
         'id': habit_id,
@@ -173,13 +158,13 @@ async def create_habit(
     }
 
 @router.put("/{habit_id}")
-async def update_habit(
+def update_habit(
     habit_id: str,
     habit_update: HabitUpdate,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
     """Update a habit"""
-    conn = get_db()
     cursor = conn.cursor()
     
     # Check if habit exists and belongs to user
@@ -187,11 +172,9 @@ async def update_habit(
     row = cursor.fetchone()
     
     if not row:
-        conn.close()
         raise HTTPException(status_code=404, detail="Habit not found")
     
     if row[0] != current_user.id:
-        conn.close()
         raise HTTPException(status_code=403, detail="Not authorized")
     
     # Update only provided fields
@@ -219,7 +202,6 @@ async def update_habit(
         update_values.append(habit_update.icon)
     
     if not update_fields:
-        conn.close()
         raise HTTPException(status_code=400, detail="No fields to update")
     
     now = datetime.now().isoformat()
@@ -247,7 +229,6 @@ async def update_habit(
     row = cursor.fetchone()
     row_dict = dict(row)
     streak_info = calculate_streak(habit_id, current_user.id, conn)
-    conn.close()
     
     return {
         'id': row_dict['id'],
@@ -265,12 +246,12 @@ async def update_habit(
     }
 
 @router.delete("/{habit_id}")
-async def delete_habit(
+def delete_habit(
     habit_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
     """Delete a habit and its completions"""
-    conn = get_db()
     cursor = conn.cursor()
     
     # Check if habit exists and belongs to user
@@ -278,28 +259,25 @@ async def delete_habit(
     row = cursor.fetchone()
     
     if not row:
-        conn.close()
         raise HTTPException(status_code=404, detail="Habit not found")
     
     if row[0] != current_user.id:
-        conn.close()
         raise HTTPException(status_code=403, detail="Not authorized")
     
     # Delete completions first
     cursor.execute("DELETE FROM habit_completions WHERE habit_id = ?", (habit_id,))
     cursor.execute("DELETE FROM habits WHERE id = ?", (habit_id,))
     conn.commit()
-    conn.close()
     
     return {"message": "Habit deleted successfully"}
 
 @router.post("/{habit_id}/complete")
-async def complete_habit(
+def complete_habit(
     habit_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
     """Mark a habit as completed for today"""
-    conn = get_db()
     cursor = conn.cursor()
     
     # Check if habit exists and belongs to user
@@ -310,11 +288,9 @@ async def complete_habit(
     row = cursor.fetchone()
     
     if not row:
-        conn.close()
         raise HTTPException(status_code=404, detail="Habit not found")
     
     if row[0] != current_user.id:
-        conn.close()
         raise HTTPException(status_code=403, detail="Not authorized")
     
     today = date.today().isoformat()
@@ -329,7 +305,6 @@ async def complete_habit(
     if cursor.fetchone():
         # Already completed - return current streak
         streak_info = calculate_streak(habit_id, current_user.id, conn)
-        conn.close()
         return {
             "message": "Already completed today",
             "streak": streak_info['streak'],
@@ -358,7 +333,6 @@ async def complete_habit(
         UPDATE habits SET streak = ?, best_streak = ? WHERE id = ?
     """, (streak_info['streak'], streak_info['best_streak'], habit_id))
     conn.commit()
-    conn.close()
     
     return {
         "message": "Habit completed",
@@ -369,12 +343,12 @@ async def complete_habit(
 
 
 @router.delete("/{habit_id}/complete")
-async def uncomplete_habit(
+def uncomplete_habit(
     habit_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
     """Remove today's completion for a habit"""
-    conn = get_db()
     cursor = conn.cursor()
     
     # Check if habit exists and belongs to user
@@ -382,11 +356,9 @@ async def uncomplete_habit(
     row = cursor.fetchone()
     
     if not row:
-        conn.close()
         raise HTTPException(status_code=404, detail="Habit not found")
     
     if row[0] != current_user.id:
-        conn.close()
         raise HTTPException(status_code=403, detail="Not authorized")
     
     today = date.today().isoformat()
@@ -417,7 +389,6 @@ async def uncomplete_habit(
     """, (streak_info['streak'], streak_info['best_streak'], last_completed, datetime.now().isoformat(), habit_id))
     
     conn.commit()
-    conn.close()
     
     return {
         "message": "Completion removed",
@@ -428,13 +399,13 @@ async def uncomplete_habit(
 
 
 @router.get("/{habit_id}/history")
-async def get_habit_history(
+def get_habit_history(
     habit_id: str,
     days: int = 30,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_read_db)
 ):
     """Get completion history for a habit"""
-    conn = get_db()
     cursor = conn.cursor()
     
     # Check ownership
@@ -442,11 +413,9 @@ async def get_habit_history(
     row = cursor.fetchone()
     
     if not row:
-        conn.close()
         raise HTTPException(status_code=404, detail="Habit not found")
     
     if row[0] != current_user.id:
-        conn.close()
         raise HTTPException(status_code=403, detail="Not authorized")
     
     # Get completions for the last N days
@@ -466,7 +435,6 @@ async def get_habit_history(
             'created_at': row[2]
         })
     
-    conn.close()
     
     return {
         'habit_id': habit_id,
@@ -4,11 +4,10 @@ from typing import Optional, List
 from datetime import datetime
 from models.user import User
 from routes.auth import get_current_user
+from services.database import get_read_db, get_write_db
 import sqlite3
-import os
 
 router = APIRouter()
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "notes.db")
 
 class IdeaCreate(BaseModel):
     title: str
@@ -22,20 +21,9 @@ class IdeaUpdate(BaseModel):
     category: Optional[str] = None
     tags: Optional[str] = None
 
-def get_db():
-    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
-    try:
-        conn.execute("PRAGMA journal_mode=WAL;")
-        conn.execute("PRAGMA busy_timeout=30000;")
-    except Exception:
-        pass
-    conn.row_factory = sqlite3.Row
-    return conn
-
 @router.get("")
-async def get_ideas(current_user: User = Depends(get_current_user)):
+def get_ideas(current_user: User = Depends(get_current_user), conn: sqlite3.Connection = Depends(get_read_db)):
     """Get all ideas for the current user"""
-    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute(
@@ -49,7 +37,6 @@ async def get_ideas(current_user: User = Depends(get_current_user)):
     )
     
     rows = cursor.fetchall()
-    conn.close()
     
     ideas = []
     for row in rows:
@@ -67,12 +54,12 @@ async def get_ideas(current_user: User = Depends(get_current_user)):
     return ideas
 
 @router.post("")
-async def create_idea(
+def create_idea(
     idea: IdeaCreate,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
     """Create a new idea"""
-    conn = get_db()
     cursor = conn.cursor()
     
     now = datetime.now().isoformat()
@@ -95,7 +82,6 @@ async def create_idea(
     
     idea_id = cursor.lastrowid
     conn.commit()
-    conn.close()
     
     return {
         'id': idea_id,
@@ -109,13 +95,13 @@ async def create_idea(
     }
 
 @router.put("/{idea_id}")
-async def update_idea(
+def update_idea(
     idea_id: int,
     idea_update: IdeaUpdate,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
     """Update an idea"""
-    conn = get_db()
     cursor = conn.cursor()
     
     # Check if idea exists and belongs to user
@@ -123,11 +109,9 @@ async def update_idea(
     row = cursor.fetchone()
     
     if not row:
-        conn.close()
         raise HTTPException(status_code=404, detail="Idea not found")
     
     if row[0] != current_user.id:
-        conn.close()
         raise HTTPException(status_code=403, detail="Not authorized")
     
     # Update only provided fields
@@ -151,7 +135,6 @@ async def update_idea(
         update_values.append(idea_update.tags)
     
     if not update_fields:
-        conn.close()
         raise HTTPException(status_code=400, detail="No fields to update")
     
     now = datetime.now().isoformat()
@@ -176,7 +159,6 @@ async def update_idea(
     )
     
     row = cursor.fetchone()
-    conn.close()
     
     return {
         'id': row[0],
@@ -190,12 +172,12 @@ async def update_idea(
     }
 
 @router.delete("/{idea_id}")
-async def delete_idea(
+def delete_idea(
     idea_id: int,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
     """Delete an idea"""
-    conn = get_db()
     cursor = conn.cursor()
     
     # Check if idea exists and belongs to user
@@ -203,15 +185,12 @@ async def delete_idea(
     row = cursor.fetchone()
     
     if not row:
-        conn.close()
         raise HTTPException(status_code=404, detail="Idea not found")
     
     if row[0] != current_user.id:
-        conn.close()
         raise HTTPException(status_code=403, detail="Not authorized")
     
     cursor.execute("DELETE FROM ideas WHERE id = ?", (idea_id,))
     conn.commit()
-    conn.close()
     
     return {"message": "Idea deleted successfully"}
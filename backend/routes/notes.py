@@ -1,22 +1,69 @@
 """
 Notes API routes - User-specific with E2E encryption support
 """
-from fastapi import APIRouter, HTTPException, Request, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Request, Depends, Header, Query, Response
+from typing import List, Optional
 from datetime import datetime
 import sqlite3
 import uuid
-import os
 import re
 import json
+import base64
 
-from models.note import Note, NoteCreate, NoteUpdate, NoteList
+from models.note import Note, NoteCreate, NoteUpdate, NotePatch, NoteList
 from models.user import User
 from routes.auth import get_current_user
+from services.database import get_database, get_read_db, get_write_db
+from services import link_service, tag_service
+from services.vault_service import init_vault_versions
+from services.version_service import ensure_version_column, etag_matches, item_etag, require_if_match
+from services.patch_service import PatchError, apply_splices, frontmatter_block
+from services.suggest_service import suggest_index
+from services.write_buffer import PendingNote, note_buffer, write_note
+from services.image_service import release_attachment_files
 
 router = APIRouter()
 
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "notes.db")
+
+# Columns GET /api/notes can project (response field -> column)
+LIST_FIELDS = {
+    "id": "n.id",
+    "name": "n.name",
+    "path": "n.path",
+    "title": "n.title",
+    "project": "n.project",
+    "tags": "n.tags",
+    "modified": "n.modified_at",
+}
+
+# Keyset-pagination indexes for list_notes. The first covers the unfiltered
+# listing entirely; the others find a page's rows in index order.
+LIST_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_notes_user_modified ON notes(user_id, modified_at, id, name, path, title, project, tags)",
+    "CREATE INDEX IF NOT EXISTS idx_notes_user_project ON notes(user_id, project, modified_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_notes_user_path ON notes(user_id, path)",
+]
+
+
+def init_notes_db():
+    """Initialize the wiki-link and tag tables, note/vault versions and list indexes"""
+    with get_database().write() as conn:
+        ensure_version_column(conn, "notes")
+        link_service.init_links_table(conn)
+        tag_service.init_tags_table(conn)
+        init_vault_versions(conn)
+        # Keyset pagination can't step over NULL sort keys
+        conn.execute("""
+            UPDATE notes SET modified_at = COALESCE(created_at, '')
+            WHERE modified_at IS NULL
+        """)
+        for sql in LIST_INDEXES:
+            conn.execute(sql)
+
+
+# Initialize DB on import
+init_notes_db()
+
 
 def parse_frontmatter(content: str):
     """Extract frontmatter metadata from markdown content"""
@@ -59,54 +106,104 @@ def parse_frontmatter(content: str):
     
     return metadata
 
-def get_db():
-    """Get database connection with optimized settings"""
-    conn = sqlite3.connect(DB_PATH, timeout=60, check_same_thread=False, isolation_level=None)
-    conn.execute("PRAGMA journal_mode=WAL")
-    conn.execute("PRAGMA busy_timeout=60000")
-    conn.execute("PRAGMA synchronous=NORMAL")
-    conn.execute("PRAGMA cache_size=10000")
-    conn.execute("PRAGMA temp_store=MEMORY")
-    conn.row_factory = sqlite3.Row
-    return conn
+def _encode_cursor(modified_at: str, note_id: str) -> str:
+    raw = json.dumps([modified_at, note_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        modified_at, note_id = json.loads(raw)
+        return str(modified_at), str(note_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 
 @router.get("", response_model=List[NoteList])
-async def list_notes(current_user: User = Depends(get_current_user)):
-    """List all notes for current user"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT id, name, path, title, project, tags, created_at, modified_at 
-        FROM notes 
-        WHERE user_id = ?
-        ORDER BY modified_at DESC
-    """, (current_user.id,))
-    
-    rows = cursor.fetchall()
-    conn.close()
-    
-    # Parse tags from JSON string
+def list_notes(
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit for all notes"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. name,title,tags"),
+    project: Optional[str] = Query(None, description="Only notes in this project"),
+    folder: Optional[str] = Query(None, description="Only notes under this folder path"),
+    tag: Optional[str] = Query(None, description="Only notes with this tag"),
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_read_db)
+):
+    """List notes for current user, newest first.
+
+    Pages are keyed on (modified_at, id): pass the X-Next-Cursor header of a
+    page as `cursor` to get the next one. The first page of a paginated
+    listing also carries X-Total-Count, so a virtualized list can size
+    itself. Without `limit` every matching note is returned.
+    """
+    if fields:
+        selected = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in selected if f not in LIST_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(unknown)}")
+    else:
+        selected = list(LIST_FIELDS)
+    
+    joins = ""
+    where = ["n.user_id = ?"]
+    params: list = [current_user.id]
+    if tag:
+        joins = "JOIN note_tags t ON t.user_id = n.user_id AND t.tag = ? AND t.note_id = n.id"
+        params.insert(0, tag)
+    if project:
+        where.append("n.project = ?")
+        params.append(project)
+    if folder:
+        # Range on path instead of LIKE so idx_notes_user_path is used
+        prefix = folder.strip("/") + "/"
+        where.append("n.path >= ? AND n.path < ?")
+        params.extend([prefix, prefix[:-1] + chr(ord("/") + 1)])
+    
+    headers = {}
+    if limit is not None and cursor is None:
+        total = conn.execute(
+            f"SELECT COUNT(*) FROM notes n {joins} WHERE {' AND '.join(where)}", params
+        ).fetchone()[0]
+        headers["X-Total-Count"] = str(total)
+    if cursor is not None:
+        where.append("(n.modified_at, n.id) < (?, ?)")
+        params.extend(_decode_cursor(cursor))
+    
+    columns = ", ".join(LIST_FIELDS[f] for f in selected)
+    sql = f"""
+        SELECT n.modified_at AS sort_modified, n.id AS sort_id, {columns}
+        FROM notes n {joins}
+        WHERE {' AND '.join(where)}
+        ORDER BY n.modified_at DESC, n.id DESC
+    """
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit + 1)
+    rows = conn.execute(sql, params).fetchall()
+    
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = _encode_cursor(rows[-1][0], rows[-1][1])
+    
+    # Plain dicts straight to JSON: no per-row model validation
     notes_list = []
     for row in rows:
-        tags = json.loads(row["tags"]) if row["tags"] else []
-        notes_list.append(NoteList(
-            id=row["id"],
-            name=row["name"],
-            path=row["path"],
-            title=row["title"],
-            project=row["project"],
-            tags=tags
-        ))
-    
-    return notes_list
+        note = {}
+        for i, field in enumerate(selected, start=2):
+            value = row[i]
+            if field == "tags":
+                value = json.loads(value) if value else []
+            note[field] = value
+        notes_list.append(note)
+    
+    return Response(content=json.dumps(notes_list), media_type="application/json", headers=headers)
 
 
 @router.get("/shared/all")
-async def list_shared_notes(current_user: User = Depends(get_current_user)):
+def list_shared_notes(current_user: User = Depends(get_current_user), conn: sqlite3.Connection = Depends(get_read_db)):
     """List all notes shared with the current user"""
-    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -120,7 +217,6 @@ async def list_shared_notes(current_user: User = Depends(get_current_user)):
     """, (current_user.id,))
     
     rows = cursor.fetchall()
-    conn.close()
     
     notes_list = []
     for row in rows:
@@ -140,10 +236,43 @@ async def list_shared_notes(current_user: User = Depends(get_current_user)):
     return notes_list
 
 
+@router.get("/{name:path}/backlinks", response_model=List[str])
+def get_backlinks(name: str, current_user: User = Depends(get_current_user), conn: sqlite3.Connection = Depends(get_read_db)):
+    """Get notes linking to a note (by name or title)"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT user_id, name, title FROM notes 
+        WHERE user_id = ? AND name = ?
+    """, (current_user.id, name))
+    row = cursor.fetchone()
+    
+    if not row:
+        cursor.execute("""
+            SELECT n.user_id, n.name, n.title FROM notes n
+            JOIN shared_items si ON n.id = si.item_id AND si.item_type = 'note'
+            WHERE n.name = ? AND si.shared_with_id = ?
+        """, (name, current_user.id))
+        row = cursor.fetchone()
+    
+    if not row:
+        raise HTTPException(status_code=404, detail="Note not found")
+    
+    return link_service.get_backlinks(conn, row["user_id"], (row["name"], row["title"]))
+
+
 @router.get("/{name:path}", response_model=Note)
-async def get_note(name: str, current_user: User = Depends(get_current_user)):
-    """Get a specific note for current user or shared with user"""
-    conn = get_db()
+def get_note(
+    name: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_read_db)
+):
+    """Get a specific note for current user or shared with user.
+
+    The ETag changes with every save; If-None-Match returns 304 if the
+    client's copy is still current.
+    """
     cursor = conn.cursor()
     
     # First try to get own note
@@ -156,27 +285,12 @@ async def get_note(name: str, current_user: User = Depends(get_current_user)):
     
     # If not found, try to get shared note
     if not row:
-        print(f"[DEBUG] Note '{name}' not found for user {current_user.id}, checking shared...")
         cursor.execute("""
             SELECT n.*, si.permission FROM notes n
             JOIN shared_items si ON n.id = si.item_id AND si.item_type = 'note'
             WHERE n.name = ? AND si.shared_with_id = ?
         """, (name, current_user.id))
         row = cursor.fetchone()
-        if row:
-            print(f"[DEBUG] Found shared note: {row['name']}")
-        else:
-            # Debug: show what shared items exist for this user
-            cursor.execute("""
-                SELECT n.name, n.id, si.shared_with_id 
-                FROM notes n 
-                JOIN shared_items si ON n.id = si.item_id 
-                WHERE si.shared_with_id = ?
-            """, (current_user.id,))
-            shared = cursor.fetchall()
-            print(f"[DEBUG] Available shared notes for user: {[dict(s) for s in shared]}")
-    
-    conn.close()
     
     if not row:
         raise HTTPException(status_code=404, detail="Note not found")
@@ -184,33 +298,49 @@ async def get_note(name: str, current_user: User = Depends(get_current_user)):
     # Parse tags from JSON string
     import json
     tags = json.loads(row["tags"]) if row["tags"] else []
+    content, title, project = row["content"], row["title"], row["project"]
+    modified_at, version = row["modified_at"], row["version"]
+    links = None
+    
+    # A save still waiting in the write buffer is the current state
+    pending = note_buffer.get(row["user_id"], row["name"])
+    if pending:
+        content, title, project, tags = pending.content, pending.title, pending.project, pending.tags
+        modified_at, version = pending.modified_at, pending.version
+        links = link_service.extract_links(content)
+    
+    etag = item_etag(row["id"], version)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=dict(response.headers))
     
     return Note(
         name=row["name"],
         path=row["path"],
-        content=row["content"],
+        content=content,
         metadata={
-            "title": row["title"],
+            "title": title,
             "tags": tags,
-            "project": row["project"],
+            "project": project,
             "created": row["created_at"],
-            "modified": row["modified_at"]
+            "modified": modified_at
         },
         tags=tags,
-        links=[],
-        backlinks=[],
+        links=links if links is not None else link_service.get_links(conn, row["user_id"], row["name"]),
+        backlinks=link_service.get_backlinks(conn, row["user_id"], (row["name"], title)),
         created=datetime.fromisoformat(row["created_at"]) if row["created_at"] else None,
-        modified=datetime.fromisoformat(row["modified_at"]) if row["modified_at"] else None,
+        modified=datetime.fromisoformat(modified_at) if modified_at else None,
         user_id=row["user_id"],
-        is_encrypted=bool(row["is_encrypted"])
+        is_encrypted=bool(row["is_encrypted"]),
+        version=version
     )
 
 
 @router.post("", response_model=dict)
-async def create_note(note_data: NoteCreate, current_user: User = Depends(get_current_user)):
+def create_note(note_data: NoteCreate, current_user: User = Depends(get_current_user), conn: sqlite3.Connection = Depends(get_write_db)):
     """Create a new note for current user"""
     try:
-        conn = get_db()
         cursor = conn.cursor()
         
         # Check if note already exists for this user
@@ -220,7 +350,6 @@ async def create_note(note_data: NoteCreate, current_user: User = Depends(get_cu
         """, (current_user.id, note_data.name))
         
         if cursor.fetchone():
-            conn.close()
             raise HTTPException(status_code=409, detail="Note already exists")
         
         # Extract metadata from frontmatter
@@ -244,11 +373,15 @@ async def create_note(note_data: NoteCreate, current_user: User = Depends(get_cu
             metadata['title'], metadata['project'], json.dumps(metadata['tags']),
             0, now, now
         ))
+        link_service.set_links(conn, current_user.id, note_data.name, note_data.content)
+        tag_service.set_tags(conn, current_user.id, note_id, metadata['tags'])
         
         conn.commit()
-        conn.close()
+        suggest_index.note_saved(
+            current_user.id, note_data.name, metadata['title'], metadata['project'], metadata['tags']
+        )
         
-        return {"success": True, "name": note_data.name, "id": note_id}
+        return {"success": True, "name": note_data.name, "id": note_id, "version": 1}
     except HTTPException:
         raise
     except sqlite3.IntegrityError as e:
@@ -262,18 +395,24 @@ async def create_note(note_data: NoteCreate, current_user: User = Depends(get_cu
 
 
 @router.put("/{name:path}", response_model=dict)
-async def update_note(
+def update_note(
     name: str, 
     note_data: NoteUpdate, 
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
-    """Update an existing note for current user or shared note with edit permission"""
-    conn = get_db()
+    """Update an existing note for current user or shared note with edit permission.
+
+    With If-Match, the update is rejected with 412 if the note changed
+    since the client read it.
+    """
     cursor = conn.cursor()
     
     # Check if note exists (own note)
     cursor.execute("""
-        SELECT id, user_id FROM notes 
+        SELECT id, user_id, version FROM notes 
         WHERE user_id = ? AND name = ?
     """, (current_user.id, name))
     
@@ -284,21 +423,21 @@ async def update_note(
     if not row:
         # Check if it's a shared note with edit permission
         cursor.execute("""
-            SELECT n.id, n.user_id, si.permission 
+            SELECT n.id, n.user_id, n.version, si.permission 
             FROM notes n
             JOIN shared_items si ON si.item_type = 'note' AND si.item_id = n.id
             WHERE n.name = ? AND si.shared_with_id = ? AND si.permission = 'edit'
         """, (name, current_user.id))
         
-        shared_row = cursor.fetchone()
-        if not shared_row:
-            conn.close()
+        row = cursor.fetchone()
+        if not row:
             raise HTTPException(status_code=404, detail="Note not found or no edit permission")
         
         is_shared_note = True
-        owner_id = shared_row[1]
-    else:
-        owner_id = row[1]
+    note_id, owner_id = row[0], row[1]
+    pending = note_buffer.get(owner_id, name)
+    current_version = pending.version if pending else row[2]
+    require_if_match(if_match, item_etag(note_id, current_version))
     
     now = datetime.utcnow().isoformat()
     
@@ -309,7 +448,6 @@ async def update_note(
     if note_data.name and note_data.name != name:
         # Shared notes cannot be renamed
         if is_shared_note:
-            conn.close()
             raise HTTPException(status_code=403, detail="Cannot rename shared notes")
         
         # Check if new name already exists
@@ -319,89 +457,185 @@ async def update_note(
         """, (current_user.id, note_data.name))
         
         if cursor.fetchone():
-            conn.close()
             raise HTTPException(status_code=409, detail="Note with new name already exists")
         
+        # Write any buffered save under the old name before renaming
+        note_buffer.flush(conn, key=(owner_id, name))
+        
         # Update with new name and metadata
         cursor.execute("""
             UPDATE notes 
-            SET name = ?, content = ?, title = ?, project = ?, tags = ?, modified_at = ?
+            SET name = ?, content = ?, title = ?, project = ?, tags = ?, modified_at = ?,
+                version = version + 1
             WHERE user_id = ? AND name = ?
         """, (note_data.name, note_data.content, metadata['title'], metadata['project'], 
               json.dumps(metadata['tags']), now, current_user.id, name))
+        link_service.delete_links(conn, owner_id, name)
+        link_service.set_links(conn, owner_id, note_data.name, note_data.content)
+        tag_service.set_tags(conn, owner_id, note_id, metadata['tags'])
+        version = cursor.execute("SELECT version FROM notes WHERE id = ?", (note_id,)).fetchone()[0]
         
-        final_name = note_data.name
-    else:
-        # Just update content and metadata
-        # Use owner_id for shared notes, current_user.id for own notes
-        update_user_id = owner_id if is_shared_note else current_user.id
-        cursor.execute("""
-            UPDATE notes 
-            SET content = ?, title = ?, project = ?, tags = ?, modified_at = ?
-            WHERE user_id = ? AND name = ?
-        """, (note_data.content, metadata['title'], metadata['project'], 
-              json.dumps(metadata['tags']), now, update_user_id, name))
+        conn.commit()
+        suggest_index.note_removed(owner_id, name)
+        suggest_index.note_saved(owner_id, note_data.name, metadata['title'], metadata['project'], metadata['tags'])
         
-        final_name = name
+        response.headers["ETag"] = item_etag(note_id, version)
+        return {"success": True, "name": note_data.name, "version": version}
+    
+    # Just update content and metadata, through the write buffer
+    version = current_version + 1
+    _save_note(conn, PendingNote(
+        note_id, owner_id, name, note_data.content,
+        metadata['title'], metadata['project'], metadata['tags'], version, now
+    ))
+    
+    response.headers["ETag"] = item_etag(note_id, version)
+    return {"success": True, "name": name, "version": version}
+
+
+@router.patch("/{name:path}", response_model=dict)
+def patch_note(
+    name: str,
+    patch: NotePatch,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
+):
+    """Apply an incremental edit (splices against base_version) to a note.
+
+    Autosave sends only what changed instead of the whole body. If the note
+    was written since base_version, nothing is applied and 409 is returned
+    with the current version; the client then reloads or falls back to PUT.
+    """
+    cursor = conn.cursor()
     
-    conn.commit()
-    conn.close()
+    # Own note first, then a note shared with edit permission
+    cursor.execute("""
+        SELECT id, user_id, content, title, project, tags, version FROM notes
+        WHERE user_id = ? AND name = ?
+    """, (current_user.id, name))
+    row = cursor.fetchone()
+    if not row:
+        cursor.execute("""
+            SELECT n.id, n.user_id, n.content, n.title, n.project, n.tags, n.version
+            FROM notes n
+            JOIN shared_items si ON si.item_type = 'note' AND si.item_id = n.id
+            WHERE n.name = ? AND si.shared_with_id = ? AND si.permission = 'edit'
+        """, (name, current_user.id))
+        row = cursor.fetchone()
+        if not row:
+            raise HTTPException(status_code=404, detail="Note not found or no edit permission")
+    
+    # Patch the latest state, which may still be in the write buffer
+    note_id, owner_id = row["id"], row["user_id"]
+    pending = note_buffer.get(owner_id, name)
+    if pending:
+        old_content, current_version = pending.content, pending.version
+        title, project, tags = pending.title, pending.project, pending.tags
+    else:
+        old_content, current_version = row["content"] or "", row["version"]
+        title, project, tags = row["title"], row["project"], tag_service.parse_tags(row["tags"])
+    
+    if current_version != patch.base_version:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Note was modified", "version": current_version}
+        )
     
-    return {"success": True, "name": final_name}
+    try:
+        content = apply_splices(old_content, patch.splices)
+    except PatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    if content == old_content:
+        response.headers["ETag"] = item_etag(note_id, current_version)
+        return {"success": True, "name": name, "version": current_version}
+    
+    # Metadata only changes if the frontmatter block did
+    if frontmatter_block(content) != frontmatter_block(old_content):
+        metadata = parse_frontmatter(content)
+        title, project, tags = metadata['title'], metadata['project'], metadata['tags']
+    
+    version = current_version + 1
+    _save_note(conn, PendingNote(
+        note_id, owner_id, name, content, title, project, tags,
+        version, datetime.utcnow().isoformat()
+    ))
+    
+    response.headers["ETag"] = item_etag(note_id, version)
+    return {"success": True, "name": name, "version": version}
+
+
+def _save_note(conn: sqlite3.Connection, note: PendingNote):
+    """Buffer a content save, or write it through if buffering is off"""
+    if note_buffer.enabled:
+        note_buffer.put(note)
+        return
+    write_note(conn, note)
+    conn.commit()
+    suggest_index.note_saved(note.user_id, note.name, note.title, note.project, note.tags)
 
 
 @router.delete("/{name:path}", response_model=dict)
-async def delete_note(name: str, current_user: User = Depends(get_current_user)):
+def delete_note(name: str, current_user: User = Depends(get_current_user), conn: sqlite3.Connection = Depends(get_write_db)):
     """Delete a note for current user and all its attachments"""
-    conn = get_db()
     cursor = conn.cursor()
     
     # First, get the note content to extract attachment IDs
     cursor.execute("""
-        SELECT content FROM notes 
+        SELECT id, content FROM notes 
         WHERE user_id = ? AND name = ?
     """, (current_user.id, name))
     
     row = cursor.fetchone()
     if not row:
-        conn.close()
         raise HTTPException(status_code=404, detail="Note not found")
     
-    content = row[0]
+    note_id, content = row[0], row[1]
+    pending = note_buffer.get(current_user.id, name)
+    if pending:
+        content = pending.content
     
     # Extract attachment IDs from markdown content
     # Pattern: ![...](/api/attachments/{id})
     import re
     attachment_pattern = r'!\[.*?\]\(/api/attachments/([a-f0-9]+)\)'
     attachment_ids = re.findall(attachment_pattern, content)
+    deleted_attachments = 0
     
-    # Delete all attachments referenced in the note
+    # Delete the user's attachments referenced in the note (rows from before
+    # uploads recorded their owner have no user_id)
     if attachment_ids:
         placeholders = ','.join('?' * len(attachment_ids))
         cursor.execute(f"""
             DELETE FROM attachments 
-            WHERE id IN ({placeholders})
-        """, attachment_ids)
+            WHERE id IN ({placeholders}) AND (user_id = ? OR user_id IS NULL)
+        """, [*attachment_ids, current_user.id])
+        deleted_attachments = cursor.rowcount
     
     # Delete the note
     cursor.execute("""
         DELETE FROM notes 
         WHERE user_id = ? AND name = ?
     """, (current_user.id, name))
+    link_service.delete_links(conn, current_user.id, name)
+    tag_service.delete_tags(conn, note_id)
+    note_buffer.discard(current_user.id, name)
     
-    conn.commit()
-    conn.close()
+    # Commits, then removes files no other attachment shares
+    release_attachment_files(conn)
+    suggest_index.note_removed(current_user.id, name)
     
-    return {"success": True, "deleted_attachments": len(attachment_ids)}
+    return {"success": True, "deleted_attachments": deleted_attachments}
 
 
 @router.post("/daily", response_model=dict)
-async def create_daily_note(
+def create_daily_note(
     date: str = None, 
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
     """Create or get today's daily note for current user"""
-    conn = get_db()
     cursor = conn.cursor()
     
     # Use provided date or today
@@ -420,7 +654,6 @@ async def create_daily_note(
     """, (current_user.id, name))
     
     if cursor.fetchone():
-        conn.close()
         return {"success": True, "name": name, "created": False}
     
     # Create daily note
@@ -437,13 +670,6 @@ async def create_daily_note(
     """, (note_id, current_user.id, name, path, content, 0, now, now))
     
     conn.commit()
-    conn.close()
+    suggest_index.note_saved(current_user.id, name, None, None, [])
     
     return {"success": True, "name": name, "created": True}
-
-
-@router.get("/{name:path}/backlinks", response_model=List[str])
-async def get_backlinks(name: str, current_user: User = Depends(get_current_user)):
-    """Get backlinks for a note (simplified - returns empty for now)"""
-    # TODO: Implement backlinks tracking in database
-    return []
@@ -6,30 +6,16 @@ from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 import sqlite3
-import os
 import uuid
 
 from models.user import User
 from routes.auth import get_current_user
+from services.database import get_read_db, get_write_db
+from services.event_bus import event_bus
+from services.suggest_service import suggest_index
 
 router = APIRouter()
 
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "notes.db")
-
-def get_db():
-    """Get database connection"""
-    # Use a longer timeout and allow connections from other threads to
-    # reduce 'database is locked' errors when multiple requests run concurrently.
-    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
-    try:
-        conn.execute("PRAGMA journal_mode=WAL;")
-        conn.execute("PRAGMA busy_timeout=30000;")
-    except Exception:
-        # If pragmas fail for any reason, ignore and continue with the connection
-        pass
-    conn.row_factory = sqlite3.Row
-    return conn
-
 
 class ProjectCreate(BaseModel):
     name: str
@@ -56,9 +42,8 @@ class Project(BaseModel):
 
 
 @router.get("", response_model=List[Project])
-async def list_projects(current_user: User = Depends(get_current_user)):
+def list_projects(current_user: User = Depends(get_current_user), conn: sqlite3.Connection = Depends(get_read_db)):
     """List all projects for current user"""
-    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -68,18 +53,17 @@ async def list_projects(current_user: User = Depends(get_current_user)):
     """, (current_user.id,))
     
     rows = cursor.fetchall()
-    conn.close()
     
     return [dict(row) for row in rows]
 
 
 @router.post("", response_model=Project)
-async def create_project(
+def create_project(
     project: ProjectCreate,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
     """Create a new project"""
-    conn = get_db()
     cursor = conn.cursor()
     
     # Check if project exists
@@ -89,7 +73,6 @@ async def create_project(
     """, (current_user.id, project.name))
     
     if cursor.fetchone():
-        conn.close()
         raise HTTPException(status_code=409, detail="Project already exists")
     
     project_id = str(uuid.uuid4())
@@ -108,7 +91,7 @@ async def create_project(
     ))
     
     conn.commit()
-    conn.close()
+    suggest_index.project_saved(current_user.id, project_id, project.name)
     
     return Project(
         id=project_id,
@@ -122,13 +105,13 @@ async def create_project(
 
 
 @router.put("/{project_id}", response_model=Project)
-async def update_project(
+def update_project(
     project_id: str,
     project: ProjectUpdate,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
     """Update a project"""
-    conn = get_db()
     cursor = conn.cursor()
     
     # Get existing project
@@ -139,7 +122,6 @@ async def update_project(
     
     row = cursor.fetchone()
     if not row:
-        conn.close()
         raise HTTPException(status_code=404, detail="Project not found")
     
     # Build update
@@ -179,18 +161,18 @@ async def update_project(
     """, (project_id,))
     
     row = cursor.fetchone()
-    conn.close()
+    suggest_index.project_saved(current_user.id, project_id, row["name"])
     
     return dict(row)
 
 
 @router.delete("/{project_id}")
-async def delete_project(
+def delete_project(
     project_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
     """Delete a project"""
-    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -199,25 +181,29 @@ async def delete_project(
     """, (project_id, current_user.id))
     
     if cursor.rowcount == 0:
-        conn.close()
         raise HTTPException(status_code=404, detail="Project not found")
     
     # Also delete any shares of this project
+    cursor.execute("""
+        SELECT shared_with_id FROM shared_items 
+        WHERE item_type = 'project' AND item_id = ? AND owner_id = ?
+    """, (project_id, current_user.id))
+    shared_with = [row["shared_with_id"] for row in cursor.fetchall()]
     cursor.execute("""
         DELETE FROM shared_items 
         WHERE item_type = 'project' AND item_id = ? AND owner_id = ?
     """, (project_id, current_user.id))
     
     conn.commit()
-    conn.close()
+    event_bus.emit(shared_with, {"type": "shared", "action": "removed", "item_type": "project", "item_id": project_id})
+    suggest_index.project_removed(current_user.id, project_id)
     
     return {"success": True}
 
 
 @router.get("/shared", response_model=List[Project])
-async def list_shared_projects(current_user: User = Depends(get_current_user)):
+def list_shared_projects(current_user: User = Depends(get_current_user), conn: sqlite3.Connection = Depends(get_read_db)):
     """List all projects shared with the current user"""
-    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -230,7 +216,6 @@ async def list_shared_projects(current_user: User = Depends(get_current_user)):
     """, (current_user.id,))
     
     rows = cursor.fetchall()
-    conn.close()
     
     result = []
     for row in rows:
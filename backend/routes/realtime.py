@@ -0,0 +1,93 @@
+"""
+Realtime WebSocket route - Pushes change events to the signed-in user
+"""
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+import asyncio
+import json
+
+from routes.auth import user_from_token
+from services.database import get_database
+from services.event_bus import event_bus
+from services.sync_service import get_latest_seq
+
+router = APIRouter()
+
+# Seconds a new connection has to send its token
+WS_AUTH_TIMEOUT = 10
+# Close codes: unauthenticated, and a frame that isn't a JSON object
+WS_CLOSE_UNAUTHORIZED = 4401
+WS_CLOSE_UNSUPPORTED_DATA = 1003
+
+
+async def _receive_message(websocket: WebSocket) -> dict:
+    """Next frame as a JSON object; raises ValueError for anything else
+    (binary frames, invalid JSON, other JSON values)"""
+    try:
+        message = json.loads(await websocket.receive_text())
+    except KeyError:
+        # receive_text() on a binary frame
+        raise ValueError("Expected a text frame")
+    if not isinstance(message, dict):
+        raise ValueError("Expected a JSON object")
+    return message
+
+
+async def _receive(websocket: WebSocket):
+    """Answer pings until the client goes away or sends a malformed frame"""
+    while True:
+        try:
+            message = await _receive_message(websocket)
+        except ValueError:
+            await websocket.close(code=WS_CLOSE_UNSUPPORTED_DATA)
+            return
+        if message.get("type") == "ping":
+            await websocket.send_json({"type": "pong"})
+
+
+async def _send(websocket: WebSocket, queue: asyncio.Queue):
+    """Forward the user's events; idles on the queue between them"""
+    while True:
+        await websocket.send_json(await queue.get())
+
+
+@router.websocket("/ws")
+async def events(websocket: WebSocket):
+    """Change events for the current user.
+
+    The client sends {"type": "auth", "token": "<jwt>"} first (browsers
+    can't set headers on a WebSocket, and a query string would end up in
+    access logs), gets {"type": "ready", "cursor": ...} back and then
+    receives "changes", "connects", "shared" and "resync" events.
+    """
+    await websocket.accept()
+    db = get_database()
+    try:
+        message = await asyncio.wait_for(_receive_message(websocket), WS_AUTH_TIMEOUT)
+        if message.get("type") != "auth":
+            raise ValueError("Expected an auth frame")
+        user = await user_from_token(str(message.get("token", "")), db)
+    except (asyncio.TimeoutError, HTTPException, ValueError):
+        # A malformed first frame counts as a failed sign-in
+        await websocket.close(code=WS_CLOSE_UNAUTHORIZED)
+        return
+    except WebSocketDisconnect:
+        return
+
+    queue = event_bus.subscribe(user.id)
+    try:
+        cursor = await db.run_read(get_latest_seq, user.id)
+        await websocket.send_json({"type": "ready", "cursor": cursor})
+        tasks = [
+            asyncio.create_task(_receive(websocket)),
+            asyncio.create_task(_send(websocket, queue)),
+        ]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            if not isinstance(task.exception(), (WebSocketDisconnect, RuntimeError)):
+                task.result()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        event_bus.unsubscribe(user.id, queue)
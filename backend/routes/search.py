@@ -1,80 +1,59 @@
 """
 Search API routes - User-specific
 """
-from fastapi import APIRouter, Query, Request, Depends
+from fastapi import APIRouter, Query, Depends, HTTPException
 from typing import List
 import sqlite3
-import os
 
-from models.note import SearchResult
+from models.note import SearchResult, Suggestion
 from models.user import User
 from routes.auth import get_current_user
+from services.database import get_database, get_read_db
+from services import search_service
+from services.suggest_service import suggest_index
 
 router = APIRouter()
 
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "notes.db")
 
-def get_db():
-    """Get database connection"""
-    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
-    try:
-        conn.execute("PRAGMA journal_mode=WAL;")
-        conn.execute("PRAGMA busy_timeout=30000;")
-    except Exception:
-        pass
-    conn.row_factory = sqlite3.Row
-    return conn
+def init_search_index():
+    """Create or repair the FTS5 indexes.
+
+    The indexes span every user's notes, so a full rebuild only runs here
+    at startup (SEARCH_REBUILD_ON_START) rather than from a request.
+    """
+    with get_database().write() as conn:
+        search_service.init_fts_index(conn)
+        if search_service.SEARCH_REBUILD_ON_START:
+            count = search_service.rebuild_fts_index(conn)
+            print(f"🔎 Rebuilt the search index ({count} notes)")
+
+
+# Initialize index on import
+init_search_index()
 
 
 @router.get("", response_model=List[SearchResult])
-async def search_notes(
+def search_notes(
     q: str = Query(..., description="Search query"),
     limit: int = Query(20, ge=1, le=100),
-    current_user: User = Depends(get_current_user)
+    mode: str = Query("fts", pattern="^(fts|fuzzy)$", description="fts or fuzzy (typo-tolerant name/title lookup)"),
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_read_db)
 ):
-    """Full-text search across user's notes"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    # Simple LIKE search for now (can be upgraded to FTS later)
-    search_pattern = f"%{q}%"
-    cursor.execute("""
-        SELECT name, path, title, content, created_at, modified_at
-        FROM notes 
-        WHERE user_id = ? 
-        AND (name LIKE ? OR title LIKE ? OR content LIKE ?)
-        ORDER BY modified_at DESC
-        LIMIT ?
-    """, (current_user.id, search_pattern, search_pattern, search_pattern, limit))
-    
-    rows = cursor.fetchall()
-    conn.close()
-    
-    results = []
-    for row in rows:
-        # Extract snippet around match
-        content = row["content"]
-        idx = content.lower().find(q.lower())
-        if idx >= 0:
-            start = max(0, idx - 50)
-            end = min(len(content), idx + len(q) + 50)
-            snippet = "..." + content[start:end] + "..."
-        else:
-            snippet = content[:100] + "..." if len(content) > 100 else content
-        
-        results.append(SearchResult(
-            name=row["name"],
-            path=row["path"],
-            title=row["title"] or row["name"],
-            snippet=snippet,
-            score=1.0
-        ))
-    
-    return results
+    """Full-text search across user's notes (bm25-ranked, supports prefix* and "phrases")"""
+    try:
+        if mode == "fuzzy":
+            return search_service.fuzzy_search_notes(conn, current_user.id, q, limit)
+        return search_service.search_notes(conn, current_user.id, q, limit)
+    except sqlite3.OperationalError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid search query: {e}")
 
 
-@router.post("/rebuild", response_model=dict)
-async def rebuild_index(current_user: User = Depends(get_current_user)):
-    """Rebuild search index for user (placeholder)"""
-    # TODO: Implement FTS rebuild
-    return {"success": True, "message": "Index rebuilt successfully"}
+@router.get("/suggest", response_model=List[Suggestion])
+def suggest(
+    q: str = Query(..., description="Prefix typed so far"),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: User = Depends(get_current_user)
+):
+    """Typeahead completions for note titles, tags and projects"""
+    return suggest_index.suggest(current_user.id, q, limit)
@@ -1,35 +1,30 @@
 """
 Snippets API routes - per-user snippet storage
 """
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Response
 from pydantic import BaseModel
 from typing import Optional, List, Any
 from datetime import datetime
 import sqlite3
-import os
 import uuid
 import json
 
 from models.user import User
 from routes.auth import get_current_user
+from services.database import get_database, get_read_db, get_write_db
+from services.version_service import ensure_version_column, etag_matches, item_etag, require_if_match
 
 router = APIRouter()
 
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "notes.db")
 
+def init_snippets_db():
+    """Add the row version column used for ETags"""
+    with get_database().write() as conn:
+        ensure_version_column(conn, "snippets")
 
-def get_db():
-    # Use a longer timeout and allow connections from other threads.
-    # Enable WAL journal mode for better concurrency with the async indexer.
-    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
-    try:
-        conn.execute("PRAGMA journal_mode=WAL;")
-        conn.execute("PRAGMA busy_timeout=30000;")
-    except Exception:
-        # Ignore if pragma fails for some reason
-        pass
-    conn.row_factory = sqlite3.Row
-    return conn
+
+# Initialize DB on import
+init_snippets_db()
 
 
 class SnippetCreate(BaseModel):
@@ -64,8 +59,7 @@ class SnippetUpdate(BaseModel):
 
 
 @router.get("")
-async def list_snippets(current_user: User = Depends(get_current_user)):
-    conn = get_db()
+def list_snippets(current_user: User = Depends(get_current_user), conn: sqlite3.Connection = Depends(get_read_db)):
     cur = conn.cursor()
     cur.execute("""
         SELECT * FROM snippets
@@ -73,28 +67,28 @@ async def list_snippets(current_user: User = Depends(get_current_user)):
         ORDER BY modified_at DESC
     """, (current_user.id,))
     rows = cur.fetchall()
-    conn.close()
-
-    results = []
-    for r in rows:
-        row = dict(r)
-        # parse JSON fields
-        for key in ['items', 'code', 'images', 'links', 'voiceNote', 'connections', 'reminder']:
-            if row.get(key) is not None:
-                try:
-                    row[key] = json.loads(row[key])
-                except Exception:
-                    row[key] = row[key]
-        # booleans from int
-        row['pinned'] = bool(row.get('pinned'))
-        row['pinnedToDashboard'] = bool(row.get('pinned_to_dashboard')) if 'pinned_to_dashboard' in row else False
-        results.append(row)
-    return results
+
+    return [snippet_list_item(r) for r in rows]
+
+
+def snippet_list_item(r: sqlite3.Row) -> dict:
+    """A snippets row as returned by the list endpoint"""
+    row = dict(r)
+    # parse JSON fields
+    for key in ['items', 'code', 'images', 'links', 'voiceNote', 'connections', 'reminder']:
+        if row.get(key) is not None:
+            try:
+                row[key] = json.loads(row[key])
+            except Exception:
+                row[key] = row[key]
+    # booleans from int
+    row['pinned'] = bool(row.get('pinned'))
+    row['pinnedToDashboard'] = bool(row.get('pinned_to_dashboard')) if 'pinned_to_dashboard' in row else False
+    return row
 
 
 @router.post("")
-async def create_snippet(snippet: SnippetCreate, current_user: User = Depends(get_current_user)):
-    conn = get_db()
+def create_snippet(snippet: SnippetCreate, current_user: User = Depends(get_current_user), conn: sqlite3.Connection = Depends(get_write_db)):
     cur = conn.cursor()
 
     snippet_id = snippet.id or str(uuid.uuid4())
@@ -162,6 +156,7 @@ async def create_snippet(snippet: SnippetCreate, current_user: User = Depends(ge
 
             # Always update modified_at
             updates.append("modified_at = ?"); values.append(now)
+            updates.append("version = version + 1")
             values.append(snippet_id)
             values.append(current_user.id)
 
@@ -171,13 +166,11 @@ async def create_snippet(snippet: SnippetCreate, current_user: User = Depends(ge
                     conn.commit()
                 except sqlite3.OperationalError as e:
                     conn.rollback()
-                    conn.close()
                     raise HTTPException(status_code=503, detail=f"Database is busy: {e}")
 
             # Return the updated row
             cur.execute("SELECT * FROM snippets WHERE id = ?", (snippet_id,))
             row = cur.fetchone()
-            conn.close()
             if not row:
                 raise HTTPException(status_code=500, detail="Failed to retrieve snippet after resolving ID conflict")
 
@@ -192,32 +185,65 @@ async def create_snippet(snippet: SnippetCreate, current_user: User = Depends(ge
             res['pinnedToDashboard'] = bool(res.get('pinned_to_dashboard')) if 'pinned_to_dashboard' in res else False
             return res
         else:
-            conn.close()
             raise HTTPException(status_code=400, detail=f"Snippet id conflict: {ie}")
     except sqlite3.OperationalError as e:
         # Common cause: database is locked due to concurrent access. Return 503 so the client can retry.
         conn.rollback()
-        conn.close()
         raise HTTPException(status_code=503, detail=f"Database is busy: {e}")
-    finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
 
     return {"id": snippet_id, "created_at": now, "modified_at": now}
 
 
+@router.get("/{snippet_id}")
+def get_snippet(
+    snippet_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_read_db)
+):
+    """One snippet; 304 if If-None-Match is still current"""
+    cur = conn.cursor()
+    cur.execute("SELECT * FROM snippets WHERE id = ? AND user_id = ?", (snippet_id, current_user.id))
+    row = cur.fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="Snippet not found")
+
+    etag = item_etag(snippet_id, row["version"])
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+    res = dict(row)
+    for key in ['items', 'code', 'images', 'links', 'voice_note', 'connections', 'reminder']:
+        if res.get(key) is not None:
+            try:
+                res[key] = json.loads(res[key])
+            except Exception:
+                res[key] = res[key]
+    res['pinned'] = bool(res.get('pinned'))
+    res['pinnedToDashboard'] = bool(res.get('pinned_to_dashboard')) if 'pinned_to_dashboard' in res else False
+    return res
+
+
 @router.put("/{snippet_id}")
-async def update_snippet(snippet_id: str, snippet: SnippetUpdate, current_user: User = Depends(get_current_user)):
-    conn = get_db()
+def update_snippet(
+    snippet_id: str,
+    snippet: SnippetUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
+):
     cur = conn.cursor()
 
-    # verify ownership
-    cur.execute("SELECT id FROM snippets WHERE id = ? AND user_id = ?", (snippet_id, current_user.id))
-    if not cur.fetchone():
-        conn.close()
+    # verify ownership, and the client's version if it sent If-Match
+    cur.execute("SELECT id, version FROM snippets WHERE id = ? AND user_id = ?", (snippet_id, current_user.id))
+    existing = cur.fetchone()
+    if not existing:
         raise HTTPException(status_code=404, detail="Snippet not found")
+    require_if_match(if_match, item_etag(snippet_id, existing["version"]))
 
     updates = []
     values = []
@@ -248,6 +274,7 @@ async def update_snippet(snippet_id: str, snippet: SnippetUpdate, current_user:
 
     now = datetime.utcnow().isoformat()
     updates.append("modified_at = ?"); values.append(now)
+    updates.append("version = version + 1")
 
     values.append(snippet_id)
     values.append(current_user.id)
@@ -258,15 +285,14 @@ async def update_snippet(snippet_id: str, snippet: SnippetUpdate, current_user:
             conn.commit()
         except sqlite3.OperationalError as e:
             conn.rollback()
-            conn.close()
             raise HTTPException(status_code=503, detail=f"Database is busy: {e}")
 
     # return updated row
     cur.execute("SELECT * FROM snippets WHERE id = ?", (snippet_id,))
     row = cur.fetchone()
-    conn.close()
     if not row:
         raise HTTPException(status_code=404, detail="Snippet not found after update")
+    response.headers["ETag"] = item_etag(snippet_id, row["version"])
     res = dict(row)
     for key in ['items', 'code', 'images', 'links', 'voice_note', 'connections', 'reminder']:
         if res.get(key) is not None:
@@ -280,23 +306,15 @@ async def update_snippet(snippet_id: str, snippet: SnippetUpdate, current_user:
 
 
 @router.delete("/{snippet_id}")
-async def delete_snippet(snippet_id: str, current_user: User = Depends(get_current_user)):
-    conn = get_db()
+def delete_snippet(snippet_id: str, current_user: User = Depends(get_current_user), conn: sqlite3.Connection = Depends(get_write_db)):
     cur = conn.cursor()
     try:
         cur.execute("DELETE FROM snippets WHERE id = ? AND user_id = ?", (snippet_id, current_user.id))
         if cur.rowcount == 0:
-            conn.close()
             raise HTTPException(status_code=404, detail="Snippet not found")
         conn.commit()
     except sqlite3.OperationalError as e:
         conn.rollback()
-        conn.close()
         raise HTTPException(status_code=503, detail=f"Database is busy: {e}")
-    finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
 
     return {"success": True}
@@ -0,0 +1,98 @@
+"""
+Sync API routes - Delta sync from a per-user change log
+"""
+from fastapi import APIRouter, Depends, Query
+from typing import Dict, List
+import sqlite3
+
+from models.user import User
+from routes.auth import get_current_user
+from routes.habits import habit_list_item
+from routes.snippets import snippet_list_item
+from routes.tasks import task_from_row
+from services.database import get_database, get_read_db
+from services import sync_service, tag_service
+
+router = APIRouter()
+
+
+def init_sync_db():
+    """Create the change log and its triggers"""
+    with get_database().write() as conn:
+        sync_service.init_change_log(conn)
+
+
+# Initialize on import
+init_sync_db()
+
+
+def _note_item(row: dict, user_id: str, conn: sqlite3.Connection) -> dict:
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "path": row["path"],
+        "title": row["title"],
+        "project": row["project"],
+        "tags": tag_service.parse_tags(row["tags"]),
+        "content": row["content"],
+        "modified": row["modified_at"],
+        "version": row["version"],
+    }
+
+
+def _idea_item(row: dict, user_id: str, conn: sqlite3.Connection) -> dict:
+    return {key: row[key] for key in (
+        "id", "user_id", "title", "description", "category", "tags", "created_at", "modified_at"
+    )}
+
+
+# Entity -> builder of the item sent to clients, the same shape as the
+# entity's list endpoint (notes also carry their content and version)
+ITEM_BUILDERS = {
+    "notes": _note_item,
+    "tasks": lambda row, user_id, conn: task_from_row(row).model_dump(),
+    "projects": lambda row, user_id, conn: row,
+    "ideas": _idea_item,
+    "habits": habit_list_item,
+    "snippets": lambda row, user_id, conn: snippet_list_item(row),
+}
+
+
+@router.get("")
+def sync_changes(
+    since: int = Query(0, ge=0, description="Cursor from the previous sync; 0 for a full sync"),
+    limit: int = Query(500, ge=1, le=5000),
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_read_db)
+):
+    """Everything that changed for the current user since a cursor.
+
+    Returns upserts (current state) and deletes (ids) per entity, at most
+    `limit` entities per batch. Clients store `cursor` and call again while
+    `has_more` is true. An entity changed several times since the cursor
+    appears once, in its latest state.
+    """
+    entries = sync_service.get_changes(conn, current_user.id, since, limit)
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    changes: Dict[str, Dict[str, List]] = {}
+    upserts: Dict[str, List] = {}
+    for entry in entries:
+        bucket = changes.setdefault(entry["entity"], {"upserts": [], "deletes": []})
+        if entry["deleted"]:
+            bucket["deletes"].append(entry["entity_id"])
+        else:
+            upserts.setdefault(entry["entity"], []).append(entry["entity_id"])
+
+    for entity, ids in upserts.items():
+        build = ITEM_BUILDERS[entity]
+        placeholders = ",".join("?" * len(ids))
+        rows = conn.execute(
+            f"SELECT * FROM {entity} WHERE user_id = ? AND id IN ({placeholders})",
+            [current_user.id, *ids]
+        ).fetchall()
+        changes[entity]["upserts"] = [build(dict(row), current_user.id, conn) for row in rows]
+
+    cursor = entries[-1]["seq"] if entries else since
+    return {"cursor": cursor, "has_more": has_more, "changes": changes}
@@ -1,32 +1,31 @@
 """
 Tasks API routes - User-specific
 """
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Response
 from pydantic import BaseModel
 from typing import List, Optional, Any
 from datetime import datetime
 import sqlite3
-import os
 import uuid
 import json
 
 from models.user import User
 from routes.auth import get_current_user
+from services.database import get_database, get_read_db, get_write_db
+from services.event_bus import event_bus
+from services.version_service import ensure_version_column, etag_matches, item_etag, require_if_match
 
 router = APIRouter()
 
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "notes.db")
 
-def get_db():
-    """Get database connection"""
-    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
-    try:
-        conn.execute("PRAGMA journal_mode=WAL;")
-        conn.execute("PRAGMA busy_timeout=30000;")
-    except Exception:
-        pass
-    conn.row_factory = sqlite3.Row
-    return conn
+def init_tasks_db():
+    """Add the row version column used for ETags"""
+    with get_database().write() as conn:
+        ensure_version_column(conn, "tasks")
+
+
+# Initialize DB on import
+init_tasks_db()
 
 
 class TaskCreate(BaseModel):
@@ -69,15 +68,37 @@ class Task(BaseModel):
     reminder: Optional[str] = None
     favorite: Optional[bool] = False
     linked_notes: Optional[List[str]] = None
+    version: int = 1  # Bumped on every update; the ETag is derived from it
+
+
+def task_from_row(row_dict: dict) -> Task:
+    """Task model from a tasks row"""
+    return Task(
+        id=row_dict["id"],
+        title=row_dict["title"],
+        description=row_dict["description"],
+        completed=bool(row_dict["completed"]),
+        priority=row_dict["priority"],
+        due_date=row_dict["due_date"],
+        project_id=row_dict["project_id"],
+        created_at=row_dict["created_at"],
+        modified_at=row_dict["modified_at"],
+        tags=json.loads(row_dict["tags"]) if row_dict.get("tags") else None,
+        subtasks=json.loads(row_dict["subtasks"]) if row_dict.get("subtasks") else None,
+        reminder=row_dict.get("reminder"),
+        favorite=bool(row_dict.get("favorite", 0)),
+        linked_notes=json.loads(row_dict["linked_notes"]) if row_dict.get("linked_notes") else None,
+        version=row_dict.get("version", 1)
+    )
 
 
 @router.get("", response_model=List[Task])
-async def list_tasks(
+def list_tasks(
     completed: Optional[bool] = None,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_read_db)
 ):
     """List all tasks for current user"""
-    conn = get_db()
     cursor = conn.cursor()
     
     if completed is None:
@@ -94,7 +115,6 @@ async def list_tasks(
         """, (current_user.id, 1 if completed else 0))
     
     rows = cursor.fetchall()
-    conn.close()
     
     tasks = []
     for row in rows:
@@ -115,7 +135,8 @@ async def list_tasks(
             "subtasks": json.loads(row_dict["subtasks"]) if row_dict.get("subtasks") else None,
             "reminder": row_dict.get("reminder"),
             "favorite": bool(row_dict.get("favorite", 0)),
-            "linked_notes": json.loads(row_dict["linked_notes"]) if row_dict.get("linked_notes") else None
+            "linked_notes": json.loads(row_dict["linked_notes"]) if row_dict.get("linked_notes") else None,
+            "version": row_dict.get("version", 1)
         }
         tasks.append(Task(**task_dict))
     
@@ -123,12 +144,12 @@ async def list_tasks(
 
 
 @router.post("", response_model=Task)
-async def create_task(
+def create_task(
     task: TaskCreate,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
     """Create a new task"""
-    conn = get_db()
     cursor = conn.cursor()
     
     task_id = str(uuid.uuid4())
@@ -150,7 +171,6 @@ async def create_task(
     ))
     
     conn.commit()
-    conn.close()
     
     return Task(
         id=task_id,
@@ -171,13 +191,15 @@ async def create_task(
 
 
 @router.put("/{task_id}", response_model=Task)
-async def update_task(
+def update_task(
     task_id: str,
     task: TaskUpdate,
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
-    """Update a task"""
-    conn = get_db()
+    """Update a task (412 if If-Match names an outdated version)"""
     cursor = conn.cursor()
     
     # Check if task exists
@@ -188,8 +210,8 @@ async def update_task(
     
     row = cursor.fetchone()
     if not row:
-        conn.close()
         raise HTTPException(status_code=404, detail="Task not found")
+    require_if_match(if_match, item_etag(task_id, row["version"]))
     
     # Build update
     updates = []
@@ -232,6 +254,7 @@ async def update_task(
     now = datetime.utcnow().isoformat()
     updates.append("modified_at = ?")
     values.append(now)
+    updates.append("version = version + 1")
     values.append(task_id)
     values.append(current_user.id)
     
@@ -249,10 +272,10 @@ async def update_task(
     """, (task_id,))
     
     row = cursor.fetchone()
-    conn.close()
     
     # Convert Row to dict
     row_dict = dict(row)
+    response.headers["ETag"] = item_etag(task_id, row_dict["version"])
     
     return Task(
         id=row_dict["id"],
@@ -268,17 +291,18 @@ async def update_task(
         subtasks=json.loads(row_dict["subtasks"]) if row_dict.get("subtasks") else None,
         reminder=row_dict.get("reminder"),
         favorite=bool(row_dict.get("favorite", 0)),
-        linked_notes=json.loads(row_dict["linked_notes"]) if row_dict.get("linked_notes") else None
+        linked_notes=json.loads(row_dict["linked_notes"]) if row_dict.get("linked_notes") else None,
+        version=row_dict.get("version", 1)
     )
 
 
 @router.delete("/{task_id}")
-async def delete_task(
+def delete_task(
     task_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_write_db)
 ):
     """Delete a task"""
-    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -287,25 +311,28 @@ async def delete_task(
     """, (task_id, current_user.id))
     
     if cursor.rowcount == 0:
-        conn.close()
         raise HTTPException(status_code=404, detail="Task not found")
     
     # Also delete any shares of this task
+    cursor.execute("""
+        SELECT shared_with_id FROM shared_items 
+        WHERE item_type = 'task' AND item_id = ? AND owner_id = ?
+    """, (task_id, current_user.id))
+    shared_with = [row["shared_with_id"] for row in cursor.fetchall()]
     cursor.execute("""
         DELETE FROM shared_items 
         WHERE item_type = 'task' AND item_id = ? AND owner_id = ?
     """, (task_id, current_user.id))
     
     conn.commit()
-    conn.close()
+    event_bus.emit(shared_with, {"type": "shared", "action": "removed", "item_type": "task", "item_id": task_id})
     
     return {"success": True}
 
 
 @router.get("/shared", response_model=List[Task])
-async def list_shared_tasks(current_user: User = Depends(get_current_user)):
+def list_shared_tasks(current_user: User = Depends(get_current_user), conn: sqlite3.Connection = Depends(get_read_db)):
     """List all tasks shared with the current user"""
-    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -318,7 +345,6 @@ async def list_shared_tasks(current_user: User = Depends(get_current_user)):
     """, (current_user.id,))
     
     rows = cursor.fetchall()
-    conn.close()
     
     tasks = []
     for row in rows:
@@ -337,7 +363,43 @@ async def list_shared_tasks(current_user: User = Depends(get_current_user)):
             subtasks=json.loads(row_dict["subtasks"]) if row_dict.get("subtasks") else None,
             reminder=row_dict.get("reminder"),
             favorite=bool(row_dict.get("favorite", 0)),
-            linked_notes=json.loads(row_dict["linked_notes"]) if row_dict.get("linked_notes") else None
+            linked_notes=json.loads(row_dict["linked_notes"]) if row_dict.get("linked_notes") else None,
+            version=row_dict.get("version", 1)
         ))
     
     return tasks
+
+
+@router.get("/{task_id}", response_model=Task)
+def get_task(
+    task_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    conn: sqlite3.Connection = Depends(get_read_db)
+):
+    """Get one task (own or shared); 304 if If-None-Match is still current"""
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        SELECT t.* FROM tasks t
+        WHERE t.id = ? AND (
+            t.user_id = ? OR EXISTS (
+                SELECT 1 FROM shared_items si
+                WHERE si.item_type = 'task' AND si.item_id = t.id AND si.shared_with_id = ?
+            )
+        )
+    """, (task_id, current_user.id, current_user.id))
+    
+    row = cursor.fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    row_dict = dict(row)
+    etag = item_etag(task_id, row_dict["version"])
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    
+    return task_from_row(row_dict)
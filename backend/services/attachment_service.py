@@ -0,0 +1,196 @@
+"""
+Attachment Service
+Content-addressed attachment files with reference-counted metadata in SQLite
+"""
+from pathlib import Path
+from typing import BinaryIO, List, Optional, Tuple
+import hashlib
+import io
+import os
+import sqlite3
+import uuid
+
+# Directory for attachment files (keep it on the same volume as the database)
+ATTACHMENTS_PATH = Path(os.getenv("ATTACHMENTS_PATH", "./data/attachments"))
+# Bytes read, hashed and written per step when storing a file
+CHUNK_SIZE = 64 * 1024
+# nginx internal location mapped to ATTACHMENTS_PATH; when set, downloads
+# answer with X-Accel-Redirect and nginx sends the file (empty = disabled)
+ATTACHMENTS_ACCEL_PREFIX = os.getenv("ATTACHMENTS_ACCEL_PREFIX", "")
+# An attachment id always names the same bytes, so responses never go stale
+ATTACHMENTS_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# attachment_blobs.refcount follows the attachments rows pointing at a file
+BLOB_TRIGGERS = {
+    "attachments_blob_ai": """
+        CREATE TRIGGER IF NOT EXISTS attachments_blob_ai AFTER INSERT ON attachments BEGIN
+            INSERT INTO attachment_blobs (sha256, size, refcount) VALUES (new.sha256, new.size, 1)
+            ON CONFLICT(sha256) DO UPDATE SET refcount = refcount + 1;
+        END
+    """,
+    "attachments_blob_ad": """
+        CREATE TRIGGER IF NOT EXISTS attachments_blob_ad AFTER DELETE ON attachments BEGIN
+            UPDATE attachment_blobs SET refcount = refcount - 1 WHERE sha256 = old.sha256;
+        END
+    """,
+}
+
+
+class FileTooLarge(ValueError):
+    """The content is larger than the limit it was stored with"""
+
+
+class BlobStore:
+    """Files named by the SHA-256 of their content.
+
+    Sharded by the first two byte pairs of the digest (ab/cd/abcd...) so no
+    directory grows past a few thousand entries. Files are written to tmp/
+    first and renamed into place, so a reader never sees a partial file.
+    """
+
+    def __init__(self, root: Path = ATTACHMENTS_PATH):
+        self.root = Path(root)
+
+    def relative_path(self, digest: str) -> str:
+        return f"{digest[:2]}/{digest[2:4]}/{digest}"
+
+    def path(self, digest: str) -> Path:
+        return self.root / self.relative_path(digest)
+
+    def stage(self, source: BinaryIO, limit: Optional[int] = None) -> Tuple[str, Path, int]:
+        """Copy a file object to a temporary file chunk by chunk, hashing as
+        it goes. Returns (digest, temp path, size); raises FileTooLarge
+        as soon as more than `limit` bytes were read."""
+        tmp = self.root / "tmp"
+        tmp.mkdir(parents=True, exist_ok=True)
+        temp = tmp / uuid.uuid4().hex
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp, "wb") as out:
+                while chunk := source.read(CHUNK_SIZE):
+                    size += len(chunk)
+                    if limit is not None and size > limit:
+                        raise FileTooLarge(f"File larger than {limit} bytes")
+                    hasher.update(chunk)
+                    out.write(chunk)
+        except BaseException:
+            temp.unlink(missing_ok=True)
+            raise
+        return hasher.hexdigest(), temp, size
+
+    def commit(self, digest: str, temp: Path):
+        """Move a staged file into place, or drop it if the content is already stored"""
+        target = self.path(digest)
+        if target.exists():
+            temp.unlink(missing_ok=True)
+            return
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp, target)
+
+    def put(self, content: bytes) -> str:
+        digest, temp, _ = self.stage(io.BytesIO(content))
+        self.commit(digest, temp)
+        return digest
+
+    def delete(self, digest: str):
+        self.path(digest).unlink(missing_ok=True)
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def init_attachments_table(conn: sqlite3.Connection, store: BlobStore) -> int:
+    """Create the attachment tables and move BLOBs of an older attachments
+    table into the store. Returns the number of moved attachments."""
+    legacy = _columns(conn, "attachments")
+    if legacy and "sha256" not in legacy:
+        conn.execute("ALTER TABLE attachments RENAME TO attachments_legacy")
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS attachments (
+            id TEXT PRIMARY KEY,
+            user_id TEXT,
+            filename TEXT NOT NULL,
+            content_type TEXT,
+            size INTEGER NOT NULL,
+            sha256 TEXT NOT NULL,
+            note_name TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS attachment_blobs (
+            sha256 TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            refcount INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    for sql in BLOB_TRIGGERS.values():
+        conn.execute(sql)
+
+    moved = 0
+    if "data" in legacy:
+        # One row at a time so a large table never sits in memory at once
+        ids = [row[0] for row in conn.execute("SELECT id FROM attachments_legacy").fetchall()]
+        for attachment_id in ids:
+            row = conn.execute("""
+                SELECT filename, content_type, data, created_at
+                FROM attachments_legacy WHERE id = ?
+            """, (attachment_id,)).fetchone()
+            content = bytes(row[2])
+            conn.execute("""
+                INSERT INTO attachments (id, filename, content_type, size, sha256, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (attachment_id, row[0], row[1], len(content), store.put(content), row[3]))
+            moved += 1
+        conn.execute("DROP TABLE attachments_legacy")
+    elif legacy and "sha256" not in legacy:
+        # Metadata-only table from init_database.py: nothing to move
+        count = conn.execute("SELECT COUNT(*) FROM attachments_legacy").fetchone()[0]
+        if count:
+            print(f"⚠️  Kept {count} attachment rows without content in attachments_legacy")
+        else:
+            conn.execute("DROP TABLE attachments_legacy")
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_attachments_sha256 ON attachments(sha256)")
+    return moved
+
+
+def add_attachment(conn: sqlite3.Connection, store: BlobStore, attachment_id: str,
+                   filename: str, content_type: Optional[str], size: int,
+                   digest: str, temp: Path, user_id: Optional[str] = None):
+    """Move a staged file into place and record it; call with the writer
+    connection so a concurrent delete can't remove the file in between"""
+    try:
+        store.commit(digest, temp)
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+    conn.execute("""
+        INSERT INTO attachments (id, user_id, filename, content_type, size, sha256)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (attachment_id, user_id, filename, content_type, size, digest))
+
+
+def release_unreferenced(conn: sqlite3.Connection, store: BlobStore) -> List[str]:
+    """Commit, then delete the files no attachment points at any more.
+
+    Call with the writer connection after deleting attachments rows; the
+    files are only removed once the rows are gone for good. Returns the
+    digests of the removed files.
+    """
+    digests = [
+        row[0] for row in
+        conn.execute("SELECT sha256 FROM attachment_blobs WHERE refcount <= 0").fetchall()
+    ]
+    conn.executemany("DELETE FROM attachment_blobs WHERE sha256 = ?", [(d,) for d in digests])
+    conn.commit()
+    for digest in digests:
+        store.delete(digest)
+    return digests
+
+
+# Process-wide blob store
+blob_store = BlobStore()
@@ -0,0 +1,343 @@
+"""
+Database service - pooled SQLite access shared by all routers
+"""
+from contextlib import contextmanager, asynccontextmanager
+from typing import AsyncIterator, Callable, Iterator, List, Optional, TypeVar
+from collections import deque
+from pathlib import Path
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "notes.db")
+DB_PATH = os.getenv("DATABASE_PATH", DEFAULT_DB_PATH)
+
+# Pool configuration
+DB_READERS = int(os.getenv("DB_READERS", "8"))
+DB_TIMEOUT = float(os.getenv("DB_TIMEOUT", "30"))
+DB_CACHED_STATEMENTS = 256  # Prepared statements kept per connection
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Slots:
+    """Counting semaphore usable from both threads and the event loop.
+
+    Waiting on the event loop never ties up a worker thread, so requests
+    queued for a connection cannot starve the requests that need a thread
+    to hand their connection back.
+    """
+
+    def __init__(self, value: int):
+        self._value = value
+        self._lock = threading.Lock()
+        self._waiters = deque()
+
+    def _try_acquire(self) -> bool:
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+            return True
+        return False
+
+    def acquire(self, timeout: float) -> bool:
+        """Block the calling thread until a slot is free"""
+        with self._lock:
+            if self._try_acquire():
+                return True
+            event = threading.Event()
+            self._waiters.append(event)
+
+        if event.wait(timeout):
+            return True
+
+        with self._lock:
+            try:
+                self._waiters.remove(event)
+                return False
+            except ValueError:
+                # Released to us right as we timed out
+                return True
+
+    async def acquire_async(self, timeout: float) -> bool:
+        """Wait on the event loop until a slot is free"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._try_acquire():
+                return True
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._waiters.append(waiter)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+            return True
+        except asyncio.TimeoutError:
+            with self._lock:
+                try:
+                    self._waiters.remove(waiter)
+                    return False
+                except ValueError:
+                    pass
+            # A slot was handed over concurrently; wait for it to land
+            await future
+            return True
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    future.add_done_callback(lambda _: self.release())
+            raise
+
+    def release(self):
+        """Free a slot, handing it straight to the oldest waiter if any"""
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    return
+                loop, future = waiter
+                try:
+                    loop.call_soon_threadsafe(self._hand_over, future)
+                    return
+                except RuntimeError:
+                    # Loop already closed, try the next waiter
+                    continue
+            self._value += 1
+
+    def _hand_over(self, future: asyncio.Future):
+        if future.done():
+            self.release()
+        else:
+            future.set_result(None)
+
+
+class Database:
+    """Bounded SQLite connection pool.
+
+    Readers are handed out from a fixed-size pool, all writes go through a
+    single connection guarded by a lock so SQLite never has to arbitrate
+    between competing writers. Connections are long-lived, so PRAGMAs run
+    once per connection and the sqlite3 statement cache is reused across
+    requests.
+
+    The async variants only wait on the event loop; anything that touches
+    SQLite (opening, committing, the queries in run_read/run_write) runs in
+    the worker threadpool so a slow query never stalls the loop.
+    """
+
+    def __init__(self, db_path: str, readers: int = DB_READERS, timeout: float = DB_TIMEOUT):
+        self.db_path = str(db_path)
+        self.readers = max(1, readers)
+        self.timeout = timeout
+        self._reader_slots = _Slots(self.readers)
+        self._writer_slot = _Slots(1)
+        self._idle: List[sqlite3.Connection] = []
+        self._idle_lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._write_hooks: List[Callable[[sqlite3.Connection, bool], None]] = []
+
+    def _connect(self, readonly: bool = False) -> sqlite3.Connection:
+        """Open a connection and apply per-connection settings once"""
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=DB_CACHED_STATEMENTS,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=-16000")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        if readonly:
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    @staticmethod
+    def _busy() -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database is busy"
+        )
+
+    # ----- readers -----
+
+    def _pop_idle(self) -> Optional[sqlite3.Connection]:
+        """Take an idle reader; caller must already hold a reader slot"""
+        with self._idle_lock:
+            if self._idle:
+                return self._idle.pop()
+        return None
+
+    def _open_reader(self) -> sqlite3.Connection:
+        try:
+            return self._connect(readonly=True)
+        except Exception:
+            self._reader_slots.release()
+            raise
+
+    def _checkin_reader(self, conn: sqlite3.Connection):
+        try:
+            # Don't let an open read transaction pin an old WAL snapshot
+            if conn.in_transaction:
+                conn.rollback()
+            with self._idle_lock:
+                self._idle.append(conn)
+        except sqlite3.Error:
+            conn.close()
+        finally:
+            self._reader_slots.release()
+
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a read-only connection from the pool"""
+        if not self._reader_slots.acquire(self.timeout):
+            raise self._busy()
+        conn = self._pop_idle() or self._open_reader()
+        try:
+            yield conn
+        finally:
+            self._checkin_reader(conn)
+
+    @asynccontextmanager
+    async def read_async(self) -> AsyncIterator[sqlite3.Connection]:
+        """Borrow a read-only connection, waiting on the event loop"""
+        if not await self._reader_slots.acquire_async(self.timeout):
+            raise self._busy()
+        conn = self._pop_idle() or await run_in_threadpool(self._open_reader)
+        try:
+            yield conn
+        finally:
+            self._checkin_reader(conn)
+
+    # ----- writer -----
+
+    def add_write_hook(self, hook: Callable[[sqlite3.Connection, bool], None]):
+        """Call hook(conn, committed) after every write transaction ends.
+
+        Hooks run in the thread that committed, while the writer is still
+        held, so they see exactly the rows the transaction wrote.
+        """
+        self._write_hooks.append(hook)
+
+    def remove_write_hook(self, hook: Callable[[sqlite3.Connection, bool], None]):
+        if hook in self._write_hooks:
+            self._write_hooks.remove(hook)
+
+    def _end_write(self, conn: sqlite3.Connection, committed: bool):
+        """Commit or roll back, then run the write hooks"""
+        if committed:
+            conn.commit()
+        else:
+            conn.rollback()
+        for hook in self._write_hooks:
+            try:
+                hook(conn, committed)
+            except Exception:
+                logger.exception("Write hook %r failed", hook)
+
+    def _writer_connection(self) -> sqlite3.Connection:
+        """Get the writer; caller must already hold the writer slot"""
+        if self._writer is None:
+            self._writer = self._connect()
+        return self._writer
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        """Hold the writer connection; commits on success, rolls back on error"""
+        if not self._writer_slot.acquire(self.timeout):
+            raise self._busy()
+        try:
+            conn = self._writer_connection()
+            try:
+                yield conn
+            except BaseException:
+                self._end_write(conn, False)
+                raise
+            else:
+                self._end_write(conn, True)
+        finally:
+            self._writer_slot.release()
+
+    @asynccontextmanager
+    async def write_async(self) -> AsyncIterator[sqlite3.Connection]:
+        """Hold the writer connection, waiting on the event loop"""
+        if not await self._writer_slot.acquire_async(self.timeout):
+            raise self._busy()
+        try:
+            conn = self._writer or await run_in_threadpool(self._writer_connection)
+            try:
+                yield conn
+            except BaseException:
+                await run_in_threadpool(self._end_write, conn, False)
+                raise
+            else:
+                await run_in_threadpool(self._end_write, conn, True)
+        finally:
+            self._writer_slot.release()
+
+    async def run_read(self, func: Callable[..., T], *args) -> T:
+        """Run func(conn, *args) on a pooled reader in a worker thread"""
+        async with self.read_async() as conn:
+            return await run_in_threadpool(func, conn, *args)
+
+    async def run_write(self, func: Callable[..., T], *args) -> T:
+        """Run func(conn, *args) on the writer in a worker thread and commit"""
+        async with self.write_async() as conn:
+            return await run_in_threadpool(func, conn, *args)
+
+    def close(self):
+        """Close every idle connection and the writer"""
+        with self._idle_lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+_database: Optional[Database] = None
+_database_lock = threading.Lock()
+
+
+def get_database() -> Database:
+    """Get the process-wide database pool"""
+    global _database
+    if _database is None:
+        with _database_lock:
+            if _database is None:
+                _database = Database(DB_PATH)
+    return _database
+
+
+def close_database():
+    """Close the process-wide database pool"""
+    global _database
+    with _database_lock:
+        if _database is not None:
+            _database.close()
+            _database = None
+
+
+async def get_read_db() -> AsyncIterator[sqlite3.Connection]:
+    """FastAPI dependency: pooled read-only connection for the request"""
+    async with get_database().read_async() as conn:
+        yield conn
+
+
+async def get_write_db() -> AsyncIterator[sqlite3.Connection]:
+    """FastAPI dependency: the serialized writer connection for the request"""
+    async with get_database().write_async() as conn:
+        yield conn
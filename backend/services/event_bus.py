@@ -0,0 +1,196 @@
+"""
+Event Bus Service
+Per-user pub/sub that pushes change events to WebSocket subscribers
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import importlib
+import os
+import sqlite3
+import threading
+
+from services.database import get_database
+
+# "memory" (single process) or "package.module:Class" for a shared backend
+EVENT_BUS_BACKEND = os.getenv("EVENT_BUS_BACKEND", "memory")
+# Events buffered per connection before it is told to resync instead
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "256"))
+
+# change_log entity -> shared_items.item_type, for entities that can be shared
+SHARED_TYPES = {"notes": "note", "tasks": "task", "projects": "project"}
+
+
+class MemoryBackend:
+    """Delivers events to the subscribers of this process.
+
+    A backend for multi-worker deployments implements the same three
+    methods, e.g. over Redis pub/sub: publish() sends to the shared channel,
+    and start() listens on it and calls deliver(user_id, event) on the
+    event loop for every message, including this worker's own.
+    """
+
+    def __init__(self):
+        self._deliver: Optional[Callable[[str, dict], None]] = None
+
+    async def start(self, deliver: Callable[[str, dict], None]):
+        self._deliver = deliver
+
+    def publish(self, user_id: str, event: dict):
+        """Called on the event loop"""
+        if self._deliver is not None:
+            self._deliver(user_id, event)
+
+    async def stop(self):
+        self._deliver = None
+
+
+def load_backend(spec: str):
+    """Backend instance from EVENT_BUS_BACKEND"""
+    if spec == "memory":
+        return MemoryBackend()
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)()
+
+
+class EventBus:
+    """Fans change events out to each user's open WebSocket connections.
+
+    Data changes are read from change_log right after each write
+    transaction commits, so every mutation path that goes through the
+    change log triggers is covered, and nothing is sent for a transaction
+    that rolled back. Routes add events that have no change_log row
+    (connect requests, shares) with emit(); those are held until the same
+    commit.
+
+    One "changes" event per user and transaction carries the ids per
+    entity and the /api/sync cursor; clients fetch the data themselves.
+    Owners and the users an item is shared with are notified.
+    """
+
+    def __init__(self, backend=None, queue_size: int = EVENT_QUEUE_SIZE):
+        self.backend = backend
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._staged: List[Tuple[str, dict]] = []
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_seq = 0
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    async def start(self):
+        """Attach to the event loop and the writer (lifespan startup)"""
+        if self.backend is None:
+            self.backend = load_backend(EVENT_BUS_BACKEND)
+        self._loop = asyncio.get_running_loop()
+        await self.backend.start(self._deliver)
+        database = get_database()
+        self._last_seq = await database.run_read(_latest_seq)
+        database.add_write_hook(self.after_write)
+
+    async def stop(self):
+        get_database().remove_write_hook(self.after_write)
+        self._loop = None
+        await self.backend.stop()
+
+    # ----- subscribers (event loop) -----
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def _deliver(self, user_id: str, event: dict):
+        """Queue an event for every connection of a user"""
+        for queue in self._subscribers.get(user_id, ()):
+            try:
+                queue.put_nowait(event)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                # A client this far behind reloads everything anyway
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync"})
+                self.dropped += 1
+
+    def _publish(self, events: List[Tuple[str, dict]]):
+        for user_id, event in events:
+            self.backend.publish(user_id, event)
+        self.published += len(events)
+
+    # ----- producers (writer) -----
+
+    def emit(self, user_ids: Iterable[str], event: dict):
+        """Send an event to users once the current write transaction commits;
+        call while holding the writer connection"""
+        with self._lock:
+            self._staged.extend((user_id, event) for user_id in user_ids)
+
+    def after_write(self, conn: sqlite3.Connection, committed: bool):
+        """Write hook: publish the transaction's changes and staged events"""
+        with self._lock:
+            staged, self._staged = self._staged, []
+        if not committed or self._loop is None:
+            return
+
+        rows = conn.execute("""
+            SELECT seq, user_id, entity, entity_id, deleted FROM change_log
+            WHERE seq > ? ORDER BY seq
+        """, (self._last_seq,)).fetchall()
+        events = staged
+        if rows:
+            self._last_seq = rows[-1]["seq"]
+            events = _change_events(conn, rows) + staged
+        if events:
+            self._loop.call_soon_threadsafe(self._publish, events)
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__ if self.backend else None,
+            "users": len(self._subscribers),
+            "connections": sum(len(q) for q in self._subscribers.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped
+        }
+
+
+def _latest_seq(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+
+
+def _change_events(conn: sqlite3.Connection, rows: List[sqlite3.Row]) -> List[Tuple[str, dict]]:
+    """One "changes" event per affected user for a batch of change_log rows"""
+    recipients: Dict[Tuple[str, object], Set[str]] = {}
+    for entity, item_type in SHARED_TYPES.items():
+        ids = [row["entity_id"] for row in rows if row["entity"] == entity]
+        if not ids:
+            continue
+        shares = conn.execute(f"""
+            SELECT item_id, shared_with_id FROM shared_items
+            WHERE item_type = ? AND item_id IN ({','.join('?' * len(ids))})
+        """, [item_type, *ids]).fetchall()
+        for share in shares:
+            recipients.setdefault((entity, share["item_id"]), set()).add(share["shared_with_id"])
+
+    by_user: Dict[str, dict] = {}
+    for row in rows:
+        users = {row["user_id"]} | recipients.get((row["entity"], row["entity_id"]), set())
+        for user_id in users:
+            event = by_user.setdefault(user_id, {"type": "changes", "cursor": 0, "changes": {}})
+            event["cursor"] = row["seq"]
+            bucket = event["changes"].setdefault(row["entity"], {"upserts": [], "deletes": []})
+            bucket["deletes" if row["deleted"] else "upserts"].append(row["entity_id"])
+    return list(by_user.items())
+
+
+# Process-wide event bus
+event_bus = EventBus()
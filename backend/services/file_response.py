@@ -0,0 +1,99 @@
+"""
+File Response Service
+FileResponse with single-range (HTTP Range) support
+"""
+from typing import Optional, Tuple
+import os
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(start, end) inclusive for a single "bytes=" range.
+
+    Returns None when the header should be ignored (other units, several
+    ranges, bad syntax) and raises ValueError when it can't be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep or not (first or last) or not (first + last).isdigit():
+        return None
+    if first:
+        start = int(first)
+        end = int(last) if last else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    if start >= size:
+        raise ValueError(header)
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+class RangeFileResponse(FileResponse):
+    """Serves a byte range of the file with 206 when the request asks for one.
+
+    Starlette 0.38 (the version FastAPI 0.115 pins) always sends the whole
+    file. Either way the file is read in chunk_size pieces, so a transfer
+    holds one chunk in memory whatever the file size. If-Range is honoured:
+    a stale validator gets the full file.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.headers["accept-ranges"] = "bytes"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.stat_result is None:
+            self.stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+            self.set_stat_headers(self.stat_result)
+
+        request_headers = Headers(scope=scope)
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if if_range is not None and if_range not in (self.headers.get("etag"), self.headers.get("last-modified")):
+            range_header = None
+
+        size = self.stat_result.st_size
+        try:
+            byte_range = parse_range(range_header, size) if range_header else None
+        except ValueError:
+            self.status_code = 416
+            self.headers["content-range"] = f"bytes */{size}"
+            self.headers["content-length"] = "0"
+            await send({"type": "http.response.start", "status": 416, "headers": self.raw_headers})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        if byte_range is None:
+            await super().__call__(scope, receive, send)
+            return
+
+        start, end = byte_range
+        self.status_code = 206
+        self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+        self.headers["content-length"] = str(end - start + 1)
+        await send({"type": "http.response.start", "status": 206, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(start)
+            remaining = end - start + 1
+            while remaining:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining:
+            # File shrank underneath us; end the body
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,230 @@
+"""
+Graph Service
+Note graph adjacency index, builders and per-user caches
+"""
+from array import array
+from collections import OrderedDict, deque
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+from models.graph import GraphData, GraphNode, GraphEdge
+from services import link_service
+
+# Configuration
+GRAPH_CACHE_USERS = int(os.getenv("GRAPH_CACHE_USERS", "64"))
+
+
+class GraphIndex:
+    """Compact adjacency index of a user's note graph.
+
+    Notes are numbered 0..n-1 (name -> id via ids) and the undirected
+    link graph is stored in CSR form: the neighbours of node i are
+    neighbors[offsets[i]:offsets[i + 1]], with directions holding, per
+    entry, whether the link goes out of i (1), into i (2) or both (3).
+    """
+
+    OUT, IN, BOTH = 1, 2, 3
+
+    def __init__(self, names: List[str], titles: List[Optional[str]], tags: List[List[str]],
+                 adjacency: List[Dict[int, int]]):
+        self.names = names
+        self.titles = titles
+        self.tags = tags
+        self.ids = {name: i for i, name in enumerate(names)}
+        self._title_ids = {}
+        for i, title in enumerate(titles):
+            if title:
+                self._title_ids.setdefault(title, i)
+
+        self.offsets = array("l", [0])
+        self.neighbors = array("l")
+        self.directions = array("b")
+        for links in adjacency:
+            for v in sorted(links):
+                self.neighbors.append(v)
+                self.directions.append(links[v])
+            self.offsets.append(len(self.neighbors))
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection, user_id: str) -> "GraphIndex":
+        """Build the index from the notes and link tables"""
+        rows = conn.execute("""
+            SELECT name, title, tags 
+            FROM notes 
+            WHERE user_id = ?
+        """, (user_id,)).fetchall()
+        
+        names = [row["name"] for row in rows]
+        ids = {name: i for i, name in enumerate(names)}
+        adjacency: List[Dict[int, int]] = [{} for _ in names]
+        
+        # Merge A->B and B->A into one undirected entry per pair
+        for source, target in link_service.get_resolved_links(conn, user_id):
+            u, v = ids.get(source), ids.get(target)
+            if u is None or v is None or u == v:
+                continue
+            adjacency[u][v] = adjacency[u].get(v, 0) | cls.OUT
+            adjacency[v][u] = adjacency[v].get(u, 0) | cls.IN
+        
+        return cls(
+            names,
+            [row["title"] for row in rows],
+            [json.loads(row["tags"]) if row["tags"] else [] for row in rows],
+            adjacency
+        )
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def degree(self, i: int) -> int:
+        return self.offsets[i + 1] - self.offsets[i]
+
+    def resolve(self, name: str) -> Optional[int]:
+        """Node id for a note name, falling back to a title match"""
+        i = self.ids.get(name)
+        return i if i is not None else self._title_ids.get(name)
+
+    def neighborhood(self, start: int, depth: int, limit: int) -> List[int]:
+        """Breadth-first traversal from start, bounded by depth and node count"""
+        visited = {start: 0}
+        order = [start]
+        queue = deque([start])
+        while queue and len(order) < limit:
+            u = queue.popleft()
+            d = visited[u]
+            if d >= depth:
+                continue
+            for k in range(self.offsets[u], self.offsets[u + 1]):
+                v = self.neighbors[k]
+                if v in visited:
+                    continue
+                visited[v] = d + 1
+                order.append(v)
+                if len(order) >= limit:
+                    break
+                queue.append(v)
+        return order
+
+    def to_graph_data(self, node_ids: Optional[Iterable[int]] = None,
+                      positions: Optional[Dict[str, Tuple[float, float]]] = None,
+                      sizes: Optional[Sequence[int]] = None) -> GraphData:
+        """Graph payload for all nodes, or the subgraph induced by node_ids.
+
+        sizes (indexed by node id) overrides the default degree-based size.
+        """
+        selected = list(range(len(self.names))) if node_ids is None else list(node_ids)
+        included = set(selected)
+        positions = positions or {}
+        
+        nodes = []
+        for i in selected:
+            x, y = positions.get(self.names[i], (None, None))
+            nodes.append(GraphNode(
+                id=self.names[i],
+                label=self.titles[i] or self.names[i],
+                title=self.titles[i],
+                tags=self.tags[i],
+                size=int(sizes[i]) if sizes is not None else max(1, self.degree(i)),
+                x=x,
+                y=y
+            ))
+        
+        edges = []
+        for u in selected:
+            for k in range(self.offsets[u], self.offsets[u + 1]):
+                v = self.neighbors[k]
+                if v <= u or v not in included:
+                    continue
+                direction = self.directions[k]
+                if direction == self.IN:
+                    edges.append(GraphEdge(source=self.names[v], target=self.names[u]))
+                else:
+                    edges.append(GraphEdge(
+                        source=self.names[u],
+                        target=self.names[v],
+                        bidirectional=direction == self.BOTH
+                    ))
+        
+        return GraphData(nodes=nodes, edges=edges)
+
+
+class VersionedCache:
+    """Per-user values keyed by vault version, LRU-bounded.
+
+    An entry is valid for as long as the user's vault version is
+    unchanged; only the max_users most recently used users are kept.
+    """
+
+    def __init__(self, max_users: int = GRAPH_CACHE_USERS):
+        self.max_users = max_users
+        self._entries: "OrderedDict[str, Tuple[int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str, version: int) -> Any:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def latest(self, user_id: str) -> Any:
+        """Most recent value regardless of version (a base for incremental updates)"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            return entry[1] if entry else None
+
+    def set(self, user_id: str, version: int, value: Any):
+        if self.max_users <= 0:
+            return
+        with self._lock:
+            current = self._entries.get(user_id)
+            # Never replace a newer entry with an older one
+            if current is None or current[0] <= version:
+                self._entries[user_id] = (version, value)
+                self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_users": self.max_users,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+def graph_etag(user_id: str, version: int, *variant) -> str:
+    """Strong ETag for a user's graph data at a vault version.
+
+    `variant` names the representation (route and the query parameters
+    that change the body), so different views never share a tag.
+    """
+    key = "\0".join([user_id, *(str(part) for part in variant)])
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+    return f'"graph-{digest}-{version}"'
+
+
+def get_graph_index(conn: sqlite3.Connection, user_id: str, version: int) -> GraphIndex:
+    """Cached adjacency index for a user at a vault version"""
+    index = graph_index_cache.get(user_id, version)
+    if index is None:
+        index = GraphIndex.load(conn, user_id)
+        graph_index_cache.set(user_id, version, index)
+    return index
+
+
+# Process-wide caches used by the graph routes: serialized full-graph
+# payloads, and adjacency indexes for neighbourhood queries
+graph_cache = VersionedCache()
+graph_index_cache = VersionedCache()
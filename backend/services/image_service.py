@@ -0,0 +1,259 @@
+"""
+Image Service
+Resized / re-encoded attachment derivatives, rendered in a process pool and
+cached on disk with LRU eviction by total size
+"""
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+import asyncio
+import bisect
+import logging
+import os
+import threading
+import uuid
+
+from fastapi import HTTPException, status
+
+from services.attachment_service import ATTACHMENTS_PATH, blob_store, release_unreferenced
+
+# Configuration
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+IMAGE_QUEUE_LIMIT = int(os.getenv("IMAGE_QUEUE_LIMIT", "32"))
+IMAGE_CACHE_MB = float(os.getenv("IMAGE_CACHE_MB", "512"))
+# Widths rendered right after an upload, as webp (empty disables)
+IMAGE_PREGENERATE_WIDTHS = [
+    int(w) for w in os.getenv("IMAGE_PREGENERATE_WIDTHS", "320,640,1280").split(",") if w.strip()
+]
+
+# Requested widths are rounded up to one of these so the cache stays bounded
+WIDTHS = [160, 320, 640, 960, 1280, 1920, 2560]
+FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg", "png": "image/png"}
+QUALITY = {"webp": 80, "jpeg": 82}
+# Content types Pillow can't or shouldn't resize; they are always served as is
+PASSTHROUGH_TYPES = {"image/svg+xml"}
+
+logger = logging.getLogger(__name__)
+
+
+def snap_width(width: int) -> int:
+    """The smallest supported width >= width (the largest one past the end)"""
+    i = bisect.bisect_left(WIDTHS, width)
+    return WIDTHS[min(i, len(WIDTHS) - 1)]
+
+
+def render_derivative(source: str, target: str, width: Optional[int], fmt: str) -> Optional[int]:
+    """Resize and re-encode an image file (runs in a worker process).
+
+    Never upscales. Returns the size of the written file, or None for
+    images that should be served unchanged (animations, formats Pillow
+    can't read).
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        img = Image.open(source)
+    except UnidentifiedImageError:
+        return None
+    with img:
+        if getattr(img, "is_animated", False):
+            return None
+        if width and img.width > width:
+            height = max(1, round(img.height * width / img.width))
+            # JPEG can decode at 1/2, 1/4 or 1/8 scale, far cheaper than a full decode
+            img.draft("RGB", (width, height))
+        img = ImageOps.exif_transpose(img)
+        if width and img.width > width:
+            img.thumbnail((width, img.height), Image.LANCZOS, reducing_gap=3.0)
+        if fmt == "jpeg" and img.mode != "RGB":
+            img = img.convert("RGB")
+        elif img.mode not in ("RGB", "RGBA", "L", "LA"):
+            img = img.convert("RGBA")
+
+        temp = f"{target}.{uuid.uuid4().hex}.tmp"
+        options = {"quality": QUALITY[fmt]} if fmt in QUALITY else {"optimize": True}
+        img.save(temp, format=fmt.upper(), **options)
+    os.replace(temp, target)
+    return os.path.getsize(target)
+
+
+class DerivativeCache:
+    """Renders derivatives on demand and keeps them under a size budget.
+
+    Files live in <ATTACHMENTS_PATH>/derived, keyed by the source hash and
+    the parameters, so they are shared by every attachment with the same
+    content. Requests for the same derivative share one render, and the
+    least recently served files are deleted once the total passes the
+    budget. Sources that can't be resized (animations) are remembered by
+    hash so later requests serve them without another decode. The index is rebuilt from the directory on start (oldest
+    access first); like the note buffer it assumes a single process.
+    """
+
+    def __init__(self, root: Path = ATTACHMENTS_PATH / "derived",
+                 max_bytes: int = int(IMAGE_CACHE_MB * 1024 * 1024),
+                 workers: int = IMAGE_WORKERS, queue_limit: int = IMAGE_QUEUE_LIMIT):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.workers = max(1, workers)
+        self.queue_limit = queue_limit
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._files: "OrderedDict[str, int]" = OrderedDict()  # relative path -> size
+        self._passthrough: Set[str] = set()  # digests to serve unchanged
+        self._total = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._pending = 0  # Only touched from the event loop
+        self.hits = 0
+        self.renders = 0
+        self.evictions = 0
+
+    def relative_path(self, digest: str, width: Optional[int], fmt: str) -> str:
+        return f"derived/{digest[:2]}/{digest}_w{width or 0}.{fmt}"
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def _load(self):
+        """Index the files already on disk, least recently used first"""
+        with self._lock:
+            if self._loaded:
+                return
+            entries: List[Tuple[float, str, int]] = []
+            for path in self.root.glob("*/*"):
+                if path.suffix == ".tmp":
+                    path.unlink(missing_ok=True)
+                    continue
+                stat = path.stat()
+                entries.append((stat.st_atime, f"derived/{path.parent.name}/{path.name}", stat.st_size))
+            for _, key, size in sorted(entries):
+                self._files[key] = size
+                self._total += size
+            self._loaded = True
+
+    def _lookup(self, key: str) -> bool:
+        with self._lock:
+            if key not in self._files:
+                return False
+            self._files.move_to_end(key)
+            return True
+
+    def _add(self, key: str, size: int):
+        """Record a new file and evict the least recently used past the budget"""
+        with self._lock:
+            self._total += size - self._files.pop(key, 0)
+            self._files[key] = size
+            evict = []
+            while self._total > self.max_bytes and len(self._files) > 1:
+                old, old_size = self._files.popitem(last=False)
+                self._total -= old_size
+                evict.append(old)
+            self.evictions += len(evict)
+        for old in evict:
+            (self.root.parent / old).unlink(missing_ok=True)
+
+    async def get(self, source: Path, digest: str, width: Optional[int], fmt: str) -> Optional[str]:
+        """Relative path (under ATTACHMENTS_PATH) of a derivative, rendering it
+        if needed; None if the original should be served instead"""
+        if not self._loaded:
+            await asyncio.to_thread(self._load)
+        if digest in self._passthrough:
+            self.hits += 1
+            return None
+        key = self.relative_path(digest, width, fmt)
+        if self._lookup(key):
+            self.hits += 1
+            return key
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._render(source, digest, key, width, fmt))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _render(self, source: Path, digest: str, key: str, width: Optional[int],
+                      fmt: str) -> Optional[str]:
+        if self._pending >= self.workers + self.queue_limit:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many image requests, try again shortly",
+                headers={"Retry-After": "1"}
+            )
+        target = self.root.parent / key
+        target.parent.mkdir(parents=True, exist_ok=True)
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            size = await loop.run_in_executor(
+                self._get_executor(), render_derivative, str(source), str(target), width, fmt
+            )
+        finally:
+            self._pending -= 1
+        if size is None:
+            with self._lock:
+                self._passthrough.add(digest)
+            return None
+        self.renders += 1
+        self._add(key, size)
+        return key
+
+    async def pregenerate(self, source: Path, digest: str, widths: List[int] = IMAGE_PREGENERATE_WIDTHS):
+        """Render the common sizes of a fresh upload (background task)"""
+        for width in widths:
+            try:
+                if await self.get(source, digest, snap_width(width), "webp") is None:
+                    return
+            except Exception:
+                logger.warning("Pregenerating image derivatives of %s failed", digest, exc_info=True)
+                return
+
+    def discard(self, digest: str):
+        """Delete every derivative of a removed file"""
+        prefix = f"derived/{digest[:2]}/{digest}_"
+        with self._lock:
+            self._passthrough.discard(digest)
+            keys = [key for key in self._files if key.startswith(prefix)]
+            for key in keys:
+                self._total -= self._files.pop(key)
+        for path in (self.root / digest[:2]).glob(f"{digest}_*"):
+            path.unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "pending": self._pending,
+                "files": len(self._files),
+                "bytes": self._total,
+                "passthrough": len(self._passthrough),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "renders": self.renders,
+                "evictions": self.evictions
+            }
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Process-wide derivative cache used by the attachments route
+image_derivatives = DerivativeCache()
+
+
+def release_attachment_files(conn) -> List[str]:
+    """Commit, then delete the attachment files (and their derivatives) that
+    no attachments row points at any more.
+
+    Call with the writer connection right after deleting attachments rows,
+    in the same transaction. Returns the digests of the removed files.
+    """
+    digests = release_unreferenced(conn, blob_store)
+    for digest in digests:
+        image_derivatives.discard(digest)
+    return digests
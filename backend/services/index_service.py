@@ -63,18 +63,17 @@ class IndexService:
         
         await self.db.execute("""
             CREATE TRIGGER IF NOT EXISTS notes_ad AFTER DELETE ON notes BEGIN
-                DELETE FROM notes_fts WHERE rowid = old.rowid;
+                INSERT INTO notes_fts(notes_fts, rowid, name, title, content, tags)
+                VALUES ('delete', old.rowid, old.name, old.title, old.content, old.tags);
             END
         """)
         
         await self.db.execute("""
             CREATE TRIGGER IF NOT EXISTS notes_au AFTER UPDATE ON notes BEGIN
-                UPDATE notes_fts SET 
-                    name = new.name,
-                    title = new.title,
-                    content = new.content,
-                    tags = new.tags
-                WHERE rowid = old.rowid;
+                INSERT INTO notes_fts(notes_fts, rowid, name, title, content, tags)
+                VALUES ('delete', old.rowid, old.name, old.title, old.content, old.tags);
+                INSERT INTO notes_fts(rowid, name, title, content, tags)
+                VALUES (new.rowid, new.name, new.title, new.content, new.tags);
             END
         """)
         
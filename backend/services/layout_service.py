@@ -0,0 +1,213 @@
+"""
+Layout Service
+Server-side force-directed graph layout, vectorized with NumPy
+"""
+from typing import Dict, List, Optional, Tuple
+import hashlib
+
+import numpy as np
+
+from services.graph_service import GraphIndex, VersionedCache
+
+# Tuning
+LAYOUT_ITERATIONS = 150
+LAYOUT_MIN_ITERATIONS = 15
+LAYOUT_REFINE_ITERATIONS = 40
+LAYOUT_WORK_BUDGET = 10_000_000  # Pair/edge force evaluations per full layout (~0.7 s)
+LAYOUT_EXACT_LIMIT = 400  # Above this, repulsion is estimated from samples
+LAYOUT_SAMPLES = 24  # Repulsion partners per node per iteration
+LAYOUT_GRAVITY = 0.02  # Pull towards the centre so components stay together
+LAYOUT_SCALE = 60.0  # Ideal edge length in output units (pixels)
+LAYOUT_INCREMENTAL_RATIO = 0.2  # Max share of new nodes for an incremental update
+
+
+class GraphLayout:
+    """Node positions for one graph topology"""
+
+    def __init__(self, index: GraphIndex, positions: np.ndarray, signature: str):
+        self.index = index
+        self.names = index.names
+        self.positions = positions  # (n, 2) in layout units (ideal edge length 1)
+        self.signature = signature
+        self._ids = index.ids
+
+    def position(self, name: str) -> Optional[Tuple[float, float]]:
+        """Output coordinates for a node, or None if it isn't laid out"""
+        i = self._ids.get(name)
+        if i is None:
+            return None
+        x, y = self.positions[i] * LAYOUT_SCALE
+        return round(float(x), 1), round(float(y), 1)
+
+    def coordinates(self) -> Dict[str, Tuple[float, float]]:
+        scaled = np.round(self.positions * LAYOUT_SCALE, 1)
+        return {name: (float(x), float(y)) for name, (x, y) in zip(self.names, scaled)}
+
+
+def topology_signature(index: GraphIndex) -> str:
+    """Digest of the node set and adjacency; unchanged means reuse the layout"""
+    digest = hashlib.sha1()
+    digest.update("\0".join(index.names).encode("utf-8"))
+    digest.update(index.offsets.tobytes())
+    digest.update(index.neighbors.tobytes())
+    return digest.hexdigest()
+
+
+def _neighbor_names(index: GraphIndex, i: int) -> set:
+    return {index.names[index.neighbors[k]] for k in range(index.offsets[i], index.offsets[i + 1])}
+
+
+def _edge_arrays(index: GraphIndex) -> Tuple[np.ndarray, np.ndarray]:
+    """Undirected edge list (u < v) from the CSR arrays"""
+    offsets = np.asarray(index.offsets).astype(np.int64)
+    neighbors = np.asarray(index.neighbors).astype(np.int64)
+    sources = np.repeat(np.arange(len(index), dtype=np.int64), np.diff(offsets))
+    keep = sources < neighbors
+    return sources[keep], neighbors[keep]
+
+
+def layout_iterations(nodes: int, edges: int, moving: Optional[int] = None,
+                      maximum: int = LAYOUT_ITERATIONS) -> int:
+    """Iteration count that keeps a layout within LAYOUT_WORK_BUDGET.
+
+    One step costs about moving * nodes force evaluations with exact
+    repulsion, or moving * LAYOUT_SAMPLES plus the edges when sampling;
+    big graphs get fewer (but at least LAYOUT_MIN_ITERATIONS) steps.
+    """
+    moving = nodes if moving is None else moving
+    if nodes <= LAYOUT_EXACT_LIMIT:
+        step = moving * nodes + edges
+    else:
+        step = moving * LAYOUT_SAMPLES + edges
+    return int(max(LAYOUT_MIN_ITERATIONS, min(maximum, LAYOUT_WORK_BUDGET // max(step, 1))))
+
+
+def _simulate(positions: np.ndarray, src: np.ndarray, dst: np.ndarray,
+              iterations: int, temperature: float, rng: np.random.Generator,
+              movable: Optional[np.ndarray] = None) -> np.ndarray:
+    """Fruchterman-Reingold iterations with ideal edge length 1.
+
+    Small graphs use exact O(n^2) repulsion; larger ones estimate each
+    node's repulsion from LAYOUT_SAMPLES random partners per iteration
+    (scaled up to the full node count), which keeps every step O(n + m).
+    If movable is given, only those nodes move and only their forces are
+    computed, so small updates cost O(changed nodes) per step.
+    """
+    n = len(positions)
+    pos = positions.copy()
+    if n < 2:
+        return pos
+
+    moving = np.arange(n) if movable is None else np.flatnonzero(movable)
+    if len(moving) == 0:
+        return pos
+    if movable is not None:
+        touching = movable[src] | movable[dst]
+        src, dst = src[touching], dst[touching]
+
+    exact = n <= LAYOUT_EXACT_LIMIT
+    for step in range(iterations):
+        if exact:
+            delta = pos[moving, None, :] - pos[None, :, :]
+            dist2 = np.einsum("ijk,ijk->ij", delta, delta)
+            dist2[np.arange(len(moving)), moving] = np.inf
+            rep = np.einsum("ijk,ij->ik", delta, 1.0 / np.maximum(dist2, 1e-4))
+        else:
+            partners = rng.integers(0, n, size=(len(moving), LAYOUT_SAMPLES))
+            delta = pos[moving, None, :] - pos[partners]
+            dist2 = np.einsum("ijk,ijk->ij", delta, delta)
+            inv = np.where(partners == moving[:, None], 0.0, 1.0 / np.maximum(dist2, 1e-4))
+            rep = np.einsum("ijk,ij->ik", delta, inv) * ((n - 1) / LAYOUT_SAMPLES)
+
+        disp = np.zeros_like(pos)
+        disp[moving] = rep
+        if len(src):
+            delta = pos[src] - pos[dst]
+            dist = np.sqrt(np.einsum("ij,ij->i", delta, delta))
+            pull = delta * dist[:, None]  # d^2 / k along the edge
+            np.add.at(disp, src, -pull)
+            np.add.at(disp, dst, pull)
+        disp = disp[moving] - pos[moving] * (LAYOUT_GRAVITY * np.sqrt(n))
+
+        # Move each node at most `limit`, cooling linearly
+        limit = temperature * (1.0 - step / iterations) + 1e-3
+        length = np.sqrt(np.einsum("ij,ij->i", disp, disp))
+        scale = np.minimum(length, limit) / np.maximum(length, 1e-9)
+        pos[moving] += disp * scale[:, None]
+
+    return pos
+
+
+def compute_layout(index: GraphIndex, previous: Optional[GraphLayout] = None,
+                   seed: int = 0) -> GraphLayout:
+    """Lay out a graph, reusing a previous layout where possible.
+
+    - same topology as previous: positions are reused as-is
+    - only a few nodes added/removed: known nodes keep their positions,
+      new ones start next to their placed neighbours, and a short, cool
+      refinement pass settles them
+    - otherwise: full layout from a random start
+    """
+    signature = topology_signature(index)
+    if previous is not None and previous.signature == signature:
+        return previous
+
+    n = len(index)
+    rng = np.random.default_rng(seed)
+    src, dst = _edge_arrays(index)
+    spread = max(1.0, np.sqrt(n))
+
+    known = np.zeros(n, dtype=bool)
+    positions = np.zeros((n, 2))
+    if previous is not None:
+        for i, name in enumerate(index.names):
+            i_prev = previous._ids.get(name)
+            if i_prev is not None:
+                positions[i] = previous.positions[i_prev]
+                known[i] = True
+
+    incremental = n > 0 and known.sum() >= n * (1 - LAYOUT_INCREMENTAL_RATIO)
+    if not incremental:
+        positions = rng.uniform(-spread / 2, spread / 2, size=(n, 2))
+        iterations = layout_iterations(n, len(src))
+        positions = _simulate(positions, src, dst, iterations, spread / 4, rng)
+        return GraphLayout(index, positions, signature)
+
+    # Place new nodes next to already placed neighbours, else near the
+    # centre; then let only them and their neighbours settle
+    movable = ~known
+    for i in np.flatnonzero(~known):
+        neighbours = [
+            index.neighbors[k] for k in range(index.offsets[i], index.offsets[i + 1])
+            if known[index.neighbors[k]]
+        ]
+        anchor = positions[neighbours].mean(axis=0) if neighbours else np.zeros(2)
+        positions[i] = anchor + rng.normal(scale=0.5, size=2)
+        known[i] = True
+
+    # Nodes whose links changed move too, even if they already existed
+    old = previous.index
+    for i, name in enumerate(index.names):
+        i_prev = old.ids.get(name)
+        if i_prev is None or movable[i]:
+            continue
+        if old.degree(i_prev) != index.degree(i) or \
+                _neighbor_names(old, i_prev) != _neighbor_names(index, i):
+            movable[i] = True
+
+    iterations = layout_iterations(n, len(src), int(movable.sum()), LAYOUT_REFINE_ITERATIONS)
+    positions = _simulate(positions, src, dst, iterations, 1.0, rng, movable)
+    return GraphLayout(index, positions, signature)
+
+
+def get_layout(user_id: str, version: int, index: GraphIndex) -> GraphLayout:
+    """Cached layout for a user's graph, updated incrementally from the last one"""
+    layout = layout_cache.get(user_id, version)
+    if layout is None:
+        layout = compute_layout(index, layout_cache.latest(user_id))
+        layout_cache.set(user_id, version, layout)
+    return layout
+
+
+# Process-wide layout cache, keyed like the graph caches
+layout_cache = VersionedCache()
@@ -0,0 +1,108 @@
+"""
+Link Service
+Persisted wiki-link table for backlinks and graph queries
+"""
+from typing import Iterable, List, Optional, Tuple
+import sqlite3
+
+from services.file_service import FileService
+
+
+def init_links_table(conn: sqlite3.Connection):
+    """Create note_links and backfill it from existing notes on first run"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'note_links'")
+    created = cursor.fetchone() is None
+
+    # One row per (source note, link target); target is the text inside [[...]]
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS note_links (
+            user_id TEXT NOT NULL,
+            source TEXT NOT NULL,
+            target TEXT NOT NULL,
+            PRIMARY KEY (user_id, source, target)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_note_links_target ON note_links(user_id, target)")
+    # Link targets resolve against note titles as well as names
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes'")
+    has_notes = cursor.fetchone() is not None
+    if has_notes:
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_notes_user_title ON notes(user_id, title)")
+
+    if created and has_notes:
+        rows = cursor.execute("SELECT user_id, name, content FROM notes").fetchall()
+        for row in rows:
+            set_links(conn, row[0], row[1], row[2])
+
+
+def extract_links(content: Optional[str]) -> List[str]:
+    """Unique wiki-link targets in a note, in order of first appearance"""
+    if not content:
+        return []
+    seen = []
+    for link in FileService._extract_links(content):
+        if link and link not in seen:
+            seen.append(link)
+    return seen
+
+
+def set_links(conn: sqlite3.Connection, user_id: str, source: str, content: Optional[str]):
+    """Replace the outgoing links of a note, writing only what changed"""
+    new = set(extract_links(content))
+    old = set(get_links(conn, user_id, source))
+    conn.executemany(
+        "DELETE FROM note_links WHERE user_id = ? AND source = ? AND target = ?",
+        [(user_id, source, target) for target in old - new]
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO note_links (user_id, source, target) VALUES (?, ?, ?)",
+        [(user_id, source, target) for target in new - old]
+    )
+
+
+def delete_links(conn: sqlite3.Connection, user_id: str, source: str):
+    """Drop the outgoing links of a deleted or renamed note"""
+    conn.execute("DELETE FROM note_links WHERE user_id = ? AND source = ?", (user_id, source))
+
+
+def get_links(conn: sqlite3.Connection, user_id: str, source: str) -> List[str]:
+    rows = conn.execute("""
+        SELECT target FROM note_links WHERE user_id = ? AND source = ?
+    """, (user_id, source)).fetchall()
+    return [row[0] for row in rows]
+
+
+def get_backlinks(conn: sqlite3.Connection, user_id: str, targets: Iterable[str]) -> List[str]:
+    """Notes linking to any of the given targets (a note's name and title)"""
+    targets = [t for t in dict.fromkeys(targets) if t]
+    if not targets:
+        return []
+    placeholders = ",".join("?" * len(targets))
+    rows = conn.execute(f"""
+        SELECT DISTINCT source FROM note_links
+        WHERE user_id = ? AND target IN ({placeholders})
+        ORDER BY source
+    """, (user_id, *targets)).fetchall()
+    return [row[0] for row in rows]
+
+
+def get_resolved_links(conn: sqlite3.Connection, user_id: str) -> List[Tuple[str, str]]:
+    """All (source, target note name) pairs for a user.
+
+    A link target resolves to a note whose name or title matches it, like
+    IndexService.build_graph's title_to_name map; unresolved links are
+    dropped. Both lookups are index probes, so no note content is read.
+    """
+    rows = conn.execute("""
+        SELECT l.source, n.name
+        FROM note_links l
+        JOIN notes n ON n.user_id = l.user_id AND n.name = l.target
+        WHERE l.user_id = ?
+        UNION
+        SELECT l.source, n.name
+        FROM note_links l
+        JOIN notes n ON n.user_id = l.user_id AND n.title = l.target
+        WHERE l.user_id = ?
+    """, (user_id, user_id)).fetchall()
+    return [(row[0], row[1]) for row in rows]
@@ -0,0 +1,78 @@
+"""
+Password Service
+Runs bcrypt hashing and verification in a bounded worker pool
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import asyncio
+import os
+
+from fastapi import HTTPException, status
+
+from models.user import hash_password, verify_password
+
+# Configuration
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "2"))
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", "32"))
+
+
+class PasswordHasher:
+    """Offloads bcrypt to a small dedicated thread pool.
+
+    bcrypt releases the GIL while hashing, so worker threads keep the event
+    loop and the database threadpool responsive. The pool is deliberately
+    small: a login storm queues here instead of eating every CPU, and once
+    more than queue_limit jobs are waiting new ones are rejected with 503.
+    """
+
+    def __init__(self, workers: int = PASSWORD_WORKERS, queue_limit: int = PASSWORD_QUEUE_LIMIT):
+        self.workers = max(1, workers)
+        self.queue_limit = queue_limit
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0  # Only touched from the event loop
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="bcrypt"
+            )
+        return self._executor
+
+    async def _submit(self, func, *args):
+        if self._pending >= self.workers + self.queue_limit:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many authentication requests, try again shortly",
+                headers={"Retry-After": "1"}
+            )
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """Hash a password with the configured work factor"""
+        return await self._submit(hash_password, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """Verify a password against a stored hash"""
+        return await self._submit(verify_password, password, hashed_password)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "pending": self._pending
+        }
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Process-wide hasher used by the auth routes
+password_hasher = PasswordHasher()
@@ -0,0 +1,62 @@
+"""
+Patch Service
+Apply splice lists from the editor to note content
+"""
+from typing import Iterable, Optional
+
+from models.note import Splice
+
+
+class PatchError(ValueError):
+    """A splice list that does not fit the base text"""
+
+
+def apply_splices(text: str, splices: Iterable[Splice]) -> str:
+    """Apply splices to text and return the new text.
+
+    Offsets are UTF-16 code units into the *base* text, which is what
+    JavaScript string indices are, so the browser can send
+    `{start, delete, insert}` straight from a string diff. Splices must be
+    sorted and must not overlap.
+    """
+    # surrogatepass on every step so a lone surrogate from the client is a
+    # PatchError (checked at the end), not a UnicodeEncodeError and a 500
+    try:
+        units = text.encode("utf-16-le", "surrogatepass")
+        length = len(units) // 2
+        parts = []
+        position = 0
+        for splice in splices:
+            end = splice.start + splice.delete
+            if splice.start < position:
+                raise PatchError("Splices must be sorted and non-overlapping")
+            if end > length:
+                raise PatchError("Splice extends past the end of the note")
+            parts.append(units[2 * position:2 * splice.start])
+            parts.append(splice.insert.encode("utf-16-le", "surrogatepass"))
+            position = end
+        parts.append(units[2 * position:])
+        result = b"".join(parts).decode("utf-16-le", "surrogatepass")
+        # Notes are stored as UTF-8, which has no lone surrogates
+        result.encode("utf-8")
+    except UnicodeError:
+        raise PatchError("Splice leaves an unpaired surrogate (splits a character)")
+    return result
+
+
+def frontmatter_block(content: str) -> Optional[str]:
+    """The leading ---...--- block of a note, or None if it has none.
+
+    Lets a patch skip re-parsing metadata when the frontmatter is unchanged
+    without splitting the whole note into lines.
+    """
+    if not content.startswith("---"):
+        return None
+    start = content.find("\n")
+    while start != -1:
+        end = content.find("\n", start + 1)
+        line = content[start + 1:end if end != -1 else len(content)]
+        if line.strip() == "---":
+            return content[:end if end != -1 else len(content)]
+        start = end
+    return None
@@ -0,0 +1,310 @@
+"""
+Search Service
+FTS5 index maintenance and ranked full-text search over notes
+"""
+from typing import List, Optional, Set
+import html
+import os
+import re
+import sqlite3
+
+from models.note import SearchResult
+from services.tag_service import parse_tags
+
+# Rebuild both indexes from the notes table on startup (repairs a damaged index)
+SEARCH_REBUILD_ON_START = os.getenv("SEARCH_REBUILD_ON_START", "false").lower() == "true"
+
+# bm25 column weights, in notes_fts column order: name, title, content, tags
+BM25_WEIGHTS = (10.0, 8.0, 1.0, 5.0)
+SNIPPET_TOKENS = 24
+
+# Fuzzy mode: candidates pulled from the trigram index before re-ranking
+FUZZY_CANDIDATES = 200
+FUZZY_MIN_SIMILARITY = 0.2
+
+# Markers FTS5 wraps around matches; swapped for <mark> after escaping
+_MARK_OPEN = "\x02"
+_MARK_CLOSE = "\x03"
+
+_TOKEN_RE = re.compile(r'"([^"]*)"(\*?)|(\S+)')
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+FTS_TRIGGERS = {
+    "notes_ai": """
+        CREATE TRIGGER IF NOT EXISTS notes_ai AFTER INSERT ON notes BEGIN
+            INSERT INTO notes_fts(rowid, name, title, content, tags)
+            VALUES (new.rowid, new.name, new.title, new.content, new.tags);
+        END
+    """,
+    "notes_ad": """
+        CREATE TRIGGER IF NOT EXISTS notes_ad AFTER DELETE ON notes BEGIN
+            INSERT INTO notes_fts(notes_fts, rowid, name, title, content, tags)
+            VALUES ('delete', old.rowid, old.name, old.title, old.content, old.tags);
+        END
+    """,
+    "notes_au": """
+        CREATE TRIGGER IF NOT EXISTS notes_au AFTER UPDATE ON notes BEGIN
+            INSERT INTO notes_fts(notes_fts, rowid, name, title, content, tags)
+            VALUES ('delete', old.rowid, old.name, old.title, old.content, old.tags);
+            INSERT INTO notes_fts(rowid, name, title, content, tags)
+            VALUES (new.rowid, new.name, new.title, new.content, new.tags);
+        END
+    """,
+}
+
+
+TRIGRAM_TRIGGERS = {
+    "notes_trigram_ai": """
+        CREATE TRIGGER IF NOT EXISTS notes_trigram_ai AFTER INSERT ON notes BEGIN
+            INSERT INTO notes_trigram(rowid, name, title)
+            VALUES (new.rowid, new.name, new.title);
+        END
+    """,
+    "notes_trigram_ad": """
+        CREATE TRIGGER IF NOT EXISTS notes_trigram_ad AFTER DELETE ON notes BEGIN
+            INSERT INTO notes_trigram(notes_trigram, rowid, name, title)
+            VALUES ('delete', old.rowid, old.name, old.title);
+        END
+    """,
+    "notes_trigram_au": """
+        CREATE TRIGGER IF NOT EXISTS notes_trigram_au AFTER UPDATE OF name, title ON notes BEGIN
+            INSERT INTO notes_trigram(notes_trigram, rowid, name, title)
+            VALUES ('delete', old.rowid, old.name, old.title);
+            INSERT INTO notes_trigram(rowid, name, title)
+            VALUES (new.rowid, new.name, new.title);
+        END
+    """,
+}
+
+
+def init_fts_index(conn: sqlite3.Connection):
+    """Create notes_fts and its sync triggers, repairing older trigger versions.
+
+    notes_fts is an external-content table, so FTS5 can only remove a row
+    when it is given the old column values via the 'delete' command. The
+    original triggers used plain UPDATE/DELETE, which leaves stale tokens
+    behind; if those are found they are replaced and the index is rebuilt.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes'")
+    if cursor.fetchone() is None:
+        return
+
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+            name, title, content, tags,
+            content='notes',
+            content_rowid='rowid'
+        )
+    """)
+
+    cursor.execute("""
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'trigger' AND name IN ('notes_ai', 'notes_ad', 'notes_au')
+    """)
+    existing = {row[0]: row[1] for row in cursor.fetchall()}
+
+    stale = [
+        name for name, sql in existing.items()
+        if "'delete'" not in sql and name != "notes_ai"
+    ]
+    for name in stale:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+    for sql in FTS_TRIGGERS.values():
+        cursor.execute(sql)
+
+    if stale or not existing:
+        conn.execute("INSERT INTO notes_fts(notes_fts) VALUES('rebuild')")
+
+    init_trigram_index(conn)
+
+
+def init_trigram_index(conn: sqlite3.Connection):
+    """Create the trigram index over note names and titles used by fuzzy search"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes_trigram'")
+    created = cursor.fetchone() is None
+
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS notes_trigram USING fts5(
+            name, title,
+            content='notes',
+            content_rowid='rowid',
+            tokenize='trigram'
+        )
+    """)
+    for sql in TRIGRAM_TRIGGERS.values():
+        cursor.execute(sql)
+
+    if created:
+        cursor.execute("INSERT INTO notes_trigram(notes_trigram) VALUES('rebuild')")
+
+
+def rebuild_fts_index(conn: sqlite3.Connection) -> int:
+    """Rebuild the FTS indexes from the notes table; returns the number of notes"""
+    conn.execute("INSERT INTO notes_fts(notes_fts) VALUES('rebuild')")
+    conn.execute("INSERT INTO notes_trigram(notes_trigram) VALUES('rebuild')")
+    return conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+
+
+def build_match_query(query: str) -> str:
+    """Turn user input into a safe FTS5 MATCH expression.
+
+    Supported syntax:
+        word        token match (all terms must match)
+        word*       prefix match
+        "a b c"     phrase match, "a b"* for a prefix phrase
+        a OR b      either term
+
+    Everything else is reduced to plain words and quoted, so user input
+    can never produce an FTS5 syntax error.
+    """
+    terms: List[str] = []
+    for match in _TOKEN_RE.finditer(query):
+        phrase, phrase_prefix, word = match.groups()
+
+        if word == "OR":
+            if terms and terms[-1] != "OR":
+                terms.append("OR")
+            continue
+
+        if word is not None:
+            prefix = word.endswith("*")
+            text = word
+        else:
+            prefix = bool(phrase_prefix)
+            text = phrase
+
+        parts = _WORD_RE.findall(text)
+        if not parts:
+            continue
+        terms.append('"' + " ".join(parts) + '"' + ("*" if prefix else ""))
+
+    while terms and terms[-1] == "OR":
+        terms.pop()
+    return " ".join(terms)
+
+
+# The MATCH drives both queries and each hit is joined to notes by rowid.
+# Starting from the user's notes instead would re-run the MATCH once per
+# note, far slower than the scan FTS replaces.
+SEARCH_SQL = f"""
+    SELECT n.name, n.path, n.title, n.tags,
+           snippet(notes_fts, -1, ?, ?, '...', ?) AS snippet,
+           bm25(notes_fts, {", ".join(str(w) for w in BM25_WEIGHTS)}) AS rank
+    FROM notes_fts
+    JOIN notes n ON n.rowid = notes_fts.rowid
+    WHERE notes_fts MATCH ?
+    AND n.user_id = ?
+    ORDER BY rank
+    LIMIT ?
+"""
+
+FUZZY_SQL = """
+    SELECT n.name, n.path, n.title, n.tags
+    FROM notes_trigram
+    JOIN notes n ON n.rowid = notes_trigram.rowid
+    WHERE notes_trigram MATCH ?
+    AND n.user_id = ?
+    ORDER BY bm25(notes_trigram)
+    LIMIT ?
+"""
+
+
+def _render_snippet(raw: str) -> str:
+    escaped = html.escape(raw or "")
+    return escaped.replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>")
+
+
+def search_notes(conn: sqlite3.Connection, user_id: str, query: str,
+                 limit: int = 20) -> List[SearchResult]:
+    """Ranked full-text search across one user's notes"""
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    rows = conn.execute(SEARCH_SQL, (_MARK_OPEN, _MARK_CLOSE, SNIPPET_TOKENS, match, user_id, limit)).fetchall()
+
+    return [
+        SearchResult(
+            name=row["name"],
+            path=row["path"],
+            title=row["title"] or row["name"],
+            snippet=_render_snippet(row["snippet"]),
+            score=round(-row["rank"], 4),  # bm25 is lower-is-better
+            tags=parse_tags(row["tags"])
+        )
+        for row in rows
+    ]
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _trigrams(text: str) -> Set[str]:
+    text = _normalize(text)
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def _similarity(query_grams: Set[str], query_length: int, text: Optional[str]) -> float:
+    """Best Jaccard similarity of the query's trigrams against the whole text
+    or any window of it about as long as the query.
+
+    Comparing against the whole text alone punishes long names: "projct"
+    shares too few trigrams with "projectmeet-3" to pass the threshold,
+    but scores well against its "project" window.
+    """
+    if not text:
+        return 0.0
+    text = _normalize(text)
+    best = _jaccard(query_grams, _trigrams(text))
+    for size in range(max(query_length - 1, 3), query_length + 2):
+        for start in range(len(text) - size + 1):
+            best = max(best, _jaccard(query_grams, _trigrams(text[start:start + size])))
+    return best
+
+
+def fuzzy_search_notes(conn: sqlite3.Connection, user_id: str, query: str,
+                       limit: int = 20) -> List[SearchResult]:
+    """Typo-tolerant lookup of notes by name/title.
+
+    Any of the user's notes sharing a trigram with the query is a
+    candidate; the trigram index returns the best FUZZY_CANDIDATES by bm25
+    (which favours notes sharing more trigrams) and those are re-ranked by
+    Jaccard similarity against the best-matching part of the name/title.
+    Queries shorter than three characters have no trigrams and fall back
+    to the regular prefix-aware search.
+    """
+    query_grams = _trigrams(query)
+    if not query_grams:
+        return search_notes(conn, user_id, query + "*" if query.strip() else query, limit)
+
+    match = " OR ".join('"' + gram.replace('"', '""') + '"' for gram in sorted(query_grams))
+    rows = conn.execute(FUZZY_SQL, (match, user_id, FUZZY_CANDIDATES)).fetchall()
+
+    query_length = len(_normalize(query))
+    scored = []
+    for row in rows:
+        score = max(_similarity(query_grams, query_length, row["name"]),
+                    _similarity(query_grams, query_length, row["title"]))
+        if score >= FUZZY_MIN_SIMILARITY:
+            scored.append((score, row))
+    scored.sort(key=lambda item: item[0], reverse=True)
+
+    return [
+        SearchResult(
+            name=row["name"],
+            path=row["path"],
+            title=row["title"] or row["name"],
+            snippet=html.escape(row["title"] or row["name"]),
+            score=round(score, 4),
+            tags=parse_tags(row["tags"])
+        )
+        for score, row in scored[:limit]
+    ]
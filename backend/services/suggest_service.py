@@ -0,0 +1,261 @@
+"""
+Suggest Service
+In-memory per-user prefix index for typeahead over note titles, tags and projects
+"""
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+import os
+import threading
+import time
+
+from models.note import Suggestion
+from services.database import get_database
+from services.tag_service import parse_tags
+
+# Configuration
+SUGGEST_MAX_USERS = int(os.getenv("SUGGEST_MAX_USERS", "256"))
+SUGGEST_TTL = float(os.getenv("SUGGEST_TTL", "300"))
+SUGGEST_SCAN_LIMIT = 200  # Candidates examined per kind before ranking
+
+
+def _title_keys(display: str, name: str) -> List[str]:
+    """Keys for every word start of the title (and the name if different)"""
+    keys = []
+    for text in {display.lower(), name.lower()}:
+        start = 0
+        while start < len(text):
+            keys.append(text[start:])
+            space = text.find(" ", start)
+            if space == -1:
+                break
+            start = space + 1
+    return sorted(set(keys))
+
+
+def _scan(entries: list, prefix: str) -> Iterable[tuple]:
+    """Yield sorted entries whose key starts with prefix"""
+    i = bisect_left(entries, (prefix,))
+    end = min(len(entries), i + SUGGEST_SCAN_LIMIT)
+    while i < end and entries[i][0].startswith(prefix):
+        yield entries[i]
+        i += 1
+
+
+class _UserIndex:
+    """Sorted key arrays for one user; mutate only while holding lock"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded_at = time.monotonic()
+        self.notes: Dict[str, Tuple[str, Optional[str], Tuple[str, ...]]] = {}
+        self.titles: List[Tuple[str, str, str]] = []  # (key, display, name)
+        self.tags: List[Tuple[str, str]] = []  # (key, tag)
+        self.tag_counts: Dict[str, int] = {}
+        self.projects: List[Tuple[str, str]] = []  # (key, project id)
+        self.project_names: Dict[str, str] = {}
+        self.project_counts: Dict[str, int] = {}
+
+    # ----- counters -----
+
+    def _count_tag(self, tag: str, delta: int):
+        count = self.tag_counts.get(tag, 0) + delta
+        entry = (tag.lower(), tag)
+        if count <= 0:
+            self.tag_counts.pop(tag, None)
+            self._remove(self.tags, entry)
+        else:
+            if tag not in self.tag_counts:
+                insort(self.tags, entry)
+            self.tag_counts[tag] = count
+
+    def _count_project(self, project_id: Optional[str], delta: int):
+        if not project_id:
+            return
+        count = self.project_counts.get(project_id, 0) + delta
+        if count <= 0:
+            self.project_counts.pop(project_id, None)
+        else:
+            self.project_counts[project_id] = count
+
+    @staticmethod
+    def _remove(entries: list, entry: tuple):
+        i = bisect_left(entries, entry)
+        if i < len(entries) and entries[i] == entry:
+            del entries[i]
+
+    # ----- notes -----
+
+    def add_note(self, name: str, title: Optional[str], project: Optional[str], tags: Tuple[str, ...]):
+        self.remove_note(name)
+        display = title or name
+        self.notes[name] = (display, project, tags)
+        for key in _title_keys(display, name):
+            insort(self.titles, (key, display, name))
+        for tag in tags:
+            self._count_tag(tag, 1)
+        self._count_project(project, 1)
+
+    def remove_note(self, name: str):
+        old = self.notes.pop(name, None)
+        if old is None:
+            return
+        display, project, tags = old
+        for key in _title_keys(display, name):
+            self._remove(self.titles, (key, display, name))
+        for tag in tags:
+            self._count_tag(tag, -1)
+        self._count_project(project, -1)
+
+    # ----- projects -----
+
+    def add_project(self, project_id: str, name: str):
+        self.remove_project(project_id)
+        self.project_names[project_id] = name
+        insort(self.projects, (name.lower(), project_id))
+
+    def remove_project(self, project_id: str):
+        name = self.project_names.pop(project_id, None)
+        if name is not None:
+            self._remove(self.projects, (name.lower(), project_id))
+
+    # ----- lookup -----
+
+    def suggest(self, prefix: str, limit: int) -> List[Suggestion]:
+        # (rank, type, value, name, count); rank sorts word-start matches
+        # below matches at the very start, then by popularity and length
+        ranked = []
+
+        seen = set()
+        for key, display, name in _scan(self.titles, prefix):
+            if name in seen:
+                continue
+            seen.add(name)
+            from_start = display.lower().startswith(prefix) or name.lower().startswith(prefix)
+            ranked.append(((from_start, 1, -len(display)), "note", display, name, 0))
+
+        for key, tag in _scan(self.tags, prefix):
+            count = self.tag_counts.get(tag, 0)
+            ranked.append(((True, count, -len(tag)), "tag", tag, None, count))
+
+        for key, project_id in _scan(self.projects, prefix):
+            name = self.project_names[project_id]
+            count = self.project_counts.get(project_id, 0)
+            ranked.append(((True, count, -len(name)), "project", name, project_id, count))
+
+        ranked.sort(key=lambda item: item[0], reverse=True)
+        return [
+            Suggestion(type=kind, value=value, name=name, count=count)
+            for _, kind, value, name, count in ranked[:limit]
+        ]
+
+
+class SuggestIndex:
+    """Per-user prefix indexes, built lazily and kept current by the routes.
+
+    Each index is loaded from SQLite on first use and then updated in place
+    by note/project writes in this process. Indexes are dropped after
+    SUGGEST_TTL seconds so writes made by other workers show up eventually,
+    and only the SUGGEST_MAX_USERS most recently used users are kept.
+    """
+
+    def __init__(self, max_users: int = SUGGEST_MAX_USERS, ttl: float = SUGGEST_TTL):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._users: "OrderedDict[str, _UserIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, user_id: str, index: _UserIndex):
+        with get_database().read() as conn:
+            notes = conn.execute("""
+                SELECT name, title, project, tags FROM notes WHERE user_id = ?
+            """, (user_id,)).fetchall()
+            projects = conn.execute("""
+                SELECT id, name FROM projects WHERE user_id = ?
+            """, (user_id,)).fetchall()
+
+        titles, tag_counts = [], {}
+        for row in notes:
+            display = row["title"] or row["name"]
+            tags = tuple(sorted(set(parse_tags(row["tags"]))))
+            index.notes[row["name"]] = (display, row["project"], tags)
+            titles.extend((key, display, row["name"]) for key in _title_keys(display, row["name"]))
+            for tag in tags:
+                tag_counts[tag] = tag_counts.get(tag, 0) + 1
+            if row["project"]:
+                index.project_counts[row["project"]] = index.project_counts.get(row["project"], 0) + 1
+
+        index.titles = sorted(titles)
+        index.tag_counts = tag_counts
+        index.tags = sorted((tag.lower(), tag) for tag in tag_counts)
+        index.project_names = {row["id"]: row["name"] for row in projects}
+        index.projects = sorted((row["name"].lower(), row["id"]) for row in projects)
+
+    def _get(self, user_id: str) -> _UserIndex:
+        """Return the user's index, loading it if missing or expired"""
+        now = time.monotonic()
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is not None and now - index.loaded_at < self.ttl:
+                self._users.move_to_end(user_id)
+                return index
+            # Register the index locked so concurrent writes queue behind the load
+            index = _UserIndex()
+            index.lock.acquire()
+            self._users[user_id] = index
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+        try:
+            self._load(user_id, index)
+        except BaseException:
+            with self._lock:
+                if self._users.get(user_id) is index:
+                    del self._users[user_id]
+            raise
+        finally:
+            index.lock.release()
+        return index
+
+    def _loaded(self, user_id: str) -> Optional[_UserIndex]:
+        with self._lock:
+            return self._users.get(user_id)
+
+    def suggest(self, user_id: str, prefix: str, limit: int = 10) -> List[Suggestion]:
+        prefix = " ".join(prefix.lower().split())
+        if not prefix:
+            return []
+        index = self._get(user_id)
+        with index.lock:
+            return index.suggest(prefix, limit)
+
+    # ----- write hooks (call after commit) -----
+
+    def note_saved(self, user_id: str, name: str, title: Optional[str],
+                   project: Optional[str], tags: Iterable[str]):
+        index = self._loaded(user_id)
+        if index is not None:
+            with index.lock:
+                index.add_note(name, title, project, tuple(sorted({t.strip() for t in tags if t.strip()})))
+
+    def note_removed(self, user_id: str, name: str):
+        index = self._loaded(user_id)
+        if index is not None:
+            with index.lock:
+                index.remove_note(name)
+
+    def project_saved(self, user_id: str, project_id: str, name: str):
+        index = self._loaded(user_id)
+        if index is not None:
+            with index.lock:
+                index.add_project(project_id, name)
+
+    def project_removed(self, user_id: str, project_id: str):
+        index = self._loaded(user_id)
+        if index is not None:
+            with index.lock:
+                index.remove_project(project_id)
+
+
+# Process-wide index used by the search and notes routes
+suggest_index = SuggestIndex()
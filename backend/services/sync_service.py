@@ -0,0 +1,94 @@
+"""
+Sync Service
+Per-user change log for delta sync of notes, tasks, projects, ideas, habits and snippets
+"""
+from typing import List
+import sqlite3
+
+# Table -> entity name used in the change log and the sync response
+SYNC_ENTITIES = {
+    "notes": "notes",
+    "tasks": "tasks",
+    "projects": "projects",
+    "ideas": "ideas",
+    "habits": "habits",
+    "snippets": "snippets",
+}
+
+
+def _triggers(table: str, entity: str) -> List[str]:
+    """Log triggers for one table: writes upsert, deletes leave a tombstone.
+
+    INSERT OR REPLACE keeps one row per entity, moved to a new seq on every
+    change, so the log grows with the number of entities, not of writes.
+    """
+    upsert = f"""
+        INSERT OR REPLACE INTO change_log (user_id, entity, entity_id, deleted)
+        VALUES (new.user_id, '{entity}', new.id, 0);
+    """
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_sync_ai AFTER INSERT ON {table}
+            WHEN new.user_id IS NOT NULL BEGIN {upsert} END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_sync_au AFTER UPDATE ON {table}
+            WHEN new.user_id IS NOT NULL BEGIN {upsert} END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_sync_ad AFTER DELETE ON {table}
+            WHEN old.user_id IS NOT NULL BEGIN
+            INSERT OR REPLACE INTO change_log (user_id, entity, entity_id, deleted)
+            VALUES (old.user_id, '{entity}', old.id, 1);
+        END""",
+    ]
+
+
+def init_change_log(conn: sqlite3.Connection):
+    """Create change_log, seed it with every existing row on first run, and
+    add the triggers that log each mutation in the same transaction"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'change_log'")
+    created = cursor.fetchone() is None
+
+    # AUTOINCREMENT: a seq is never reused, even after its row is replaced,
+    # so a client cursor can't skip a change. entity_id has no declared type
+    # so ideas keep their integer ids.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            entity TEXT NOT NULL,
+            entity_id NOT NULL,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (user_id, entity, entity_id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_change_log_user_seq ON change_log(user_id, seq)")
+
+    existing = {
+        row[0] for row in
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+    }
+    for table, entity in SYNC_ENTITIES.items():
+        if table not in existing:
+            continue
+        if created:
+            cursor.execute(f"""
+                INSERT OR IGNORE INTO change_log (user_id, entity, entity_id, deleted)
+                SELECT user_id, '{entity}', id, 0 FROM {table} WHERE user_id IS NOT NULL
+            """)
+        for sql in _triggers(table, entity):
+            cursor.execute(sql)
+
+
+def get_changes(conn: sqlite3.Connection, user_id: str, since: int, limit: int) -> List[sqlite3.Row]:
+    """Up to limit + 1 log entries after `since`, oldest first"""
+    return conn.execute("""
+        SELECT seq, entity, entity_id, deleted FROM change_log
+        WHERE user_id = ? AND seq > ?
+        ORDER BY seq
+        LIMIT ?
+    """, (user_id, since, limit + 1)).fetchall()
+
+
+def get_latest_seq(conn: sqlite3.Connection, user_id: str) -> int:
+    row = conn.execute(
+        "SELECT MAX(seq) FROM change_log WHERE user_id = ?", (user_id,)
+    ).fetchone()
+    return row[0] or 0
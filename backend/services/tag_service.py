@@ -0,0 +1,191 @@
+"""
+Tag Service
+Normalized note_tags table and materialized per-user tag counts
+"""
+from typing import Dict, Iterable, List, Optional
+import asyncio
+import logging
+import os
+import sqlite3
+import json
+
+from services.database import get_database
+
+logger = logging.getLogger(__name__)
+
+# Seconds between tag_counts consistency checks (0 disables)
+TAG_VERIFY_INTERVAL = float(os.getenv("TAG_VERIFY_INTERVAL", "3600"))
+
+TAG_COUNT_TRIGGERS = {
+    "note_tags_count_ai": """
+        CREATE TRIGGER IF NOT EXISTS note_tags_count_ai AFTER INSERT ON note_tags BEGIN
+            INSERT INTO tag_counts (user_id, tag, count) VALUES (new.user_id, new.tag, 1)
+            ON CONFLICT(user_id, tag) DO UPDATE SET count = count + 1;
+        END
+    """,
+    "note_tags_count_ad": """
+        CREATE TRIGGER IF NOT EXISTS note_tags_count_ad AFTER DELETE ON note_tags BEGIN
+            UPDATE tag_counts SET count = count - 1
+            WHERE user_id = old.user_id AND tag = old.tag;
+            DELETE FROM tag_counts
+            WHERE user_id = old.user_id AND tag = old.tag AND count <= 0;
+        END
+    """,
+}
+
+
+def init_tags_table(conn: sqlite3.Connection):
+    """Create note_tags and backfill it from the notes.tags JSON on first run"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'note_tags'")
+    created = cursor.fetchone() is None
+
+    # One row per (note, tag); keyed by note id so renames need no update
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS note_tags (
+            user_id TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            note_id TEXT NOT NULL,
+            PRIMARY KEY (user_id, tag, note_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_note_tags_note ON note_tags(note_id)")
+
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes'")
+    if created and cursor.fetchone() is not None:
+        rows = cursor.execute(
+            "SELECT id, user_id, tags FROM notes WHERE tags IS NOT NULL"
+        ).fetchall()
+        for row in rows:
+            set_tags(conn, row[1], row[0], parse_tags(row[2]))
+
+    init_tag_counts(conn)
+
+
+def init_tag_counts(conn: sqlite3.Connection):
+    """Create tag_counts, fill it from note_tags on first run, and add the
+    note_tags triggers that keep it current in the same transaction"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tag_counts'")
+    created = cursor.fetchone() is None
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tag_counts (
+            user_id TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (user_id, tag)
+        ) WITHOUT ROWID
+    """)
+    if created:
+        cursor.execute("""
+            INSERT INTO tag_counts (user_id, tag, count)
+            SELECT user_id, tag, COUNT(*) FROM note_tags GROUP BY user_id, tag
+        """)
+    for sql in TAG_COUNT_TRIGGERS.values():
+        cursor.execute(sql)
+
+
+def parse_tags(tags: Optional[str]) -> List[str]:
+    """Tags from the notes.tags column (JSON list; older rows may be comma-separated)"""
+    if not tags:
+        return []
+    try:
+        parsed = json.loads(tags)
+    except ValueError:
+        parsed = tags.split(",")
+    if isinstance(parsed, str):
+        parsed = [parsed]
+    if not isinstance(parsed, list):
+        return []
+    return [str(tag).strip() for tag in parsed if str(tag).strip()]
+
+
+def set_tags(conn: sqlite3.Connection, user_id: str, note_id: str, tags: Iterable[str]):
+    """Replace the tags of a note.
+
+    Only the difference between the stored and new tag sets is written, so
+    saving a note without touching its tags leaves tag_counts alone.
+    """
+    new = {tag for tag in tags if tag}
+    old = {
+        row[0] for row in
+        conn.execute("SELECT tag FROM note_tags WHERE note_id = ?", (note_id,)).fetchall()
+    }
+    conn.executemany(
+        "DELETE FROM note_tags WHERE note_id = ? AND tag = ?",
+        [(note_id, tag) for tag in old - new]
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO note_tags (user_id, tag, note_id) VALUES (?, ?, ?)",
+        [(user_id, tag, note_id) for tag in new - old]
+    )
+
+
+def delete_tags(conn: sqlite3.Connection, note_id: str):
+    """Drop the tags of a deleted note"""
+    conn.execute("DELETE FROM note_tags WHERE note_id = ?", (note_id,))
+
+
+def get_tag_counts(conn: sqlite3.Connection, user_id: str) -> Dict[str, int]:
+    """Number of notes per tag, read from the materialized tag_counts"""
+    rows = conn.execute("""
+        SELECT tag, count FROM tag_counts WHERE user_id = ?
+    """, (user_id,)).fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+def get_notes_by_tag(conn: sqlite3.Connection, user_id: str, tag: str) -> List[str]:
+    """Names of the notes carrying a tag"""
+    rows = conn.execute("""
+        SELECT n.name
+        FROM note_tags t
+        JOIN notes n ON n.id = t.note_id
+        WHERE t.user_id = ? AND t.tag = ?
+        ORDER BY n.name
+    """, (user_id, tag)).fetchall()
+    return [row[0] for row in rows]
+
+
+def verify_tag_counts(conn: sqlite3.Connection) -> int:
+    """Compare tag_counts with a full GROUP BY over note_tags and repair it.
+
+    Returns the number of (user, tag) rows that were wrong. The triggers
+    should keep this at 0; a nonzero result points at writes that bypassed
+    them (manual SQL, restored backups).
+    """
+    drift = conn.execute("""
+        SELECT user_id, tag, actual FROM (
+            SELECT t.user_id, t.tag, COUNT(*) AS actual
+            FROM note_tags t GROUP BY t.user_id, t.tag
+        ) a
+        WHERE actual IS NOT (
+            SELECT count FROM tag_counts c WHERE c.user_id = a.user_id AND c.tag = a.tag
+        )
+    """).fetchall()
+    stale = conn.execute("""
+        SELECT c.user_id, c.tag FROM tag_counts c
+        WHERE NOT EXISTS (
+            SELECT 1 FROM note_tags t WHERE t.user_id = c.user_id AND t.tag = c.tag
+        )
+    """).fetchall()
+    conn.executemany("""
+        INSERT INTO tag_counts (user_id, tag, count) VALUES (?, ?, ?)
+        ON CONFLICT(user_id, tag) DO UPDATE SET count = excluded.count
+    """, [(row[0], row[1], row[2]) for row in drift])
+    conn.executemany(
+        "DELETE FROM tag_counts WHERE user_id = ? AND tag = ?",
+        [(row[0], row[1]) for row in stale]
+    )
+    return len(drift) + len(stale)
+
+
+async def run_tag_count_verifier(interval: float = TAG_VERIFY_INTERVAL):
+    """Background task: verify tag_counts every `interval` seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            repaired = await get_database().run_write(verify_tag_counts)
+            if repaired:
+                logger.warning("Repaired %d drifted tag counts", repaired)
+        except Exception:
+            logger.exception("Tag count verification failed")
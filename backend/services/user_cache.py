@@ -0,0 +1,86 @@
+"""
+User Cache Service
+In-process TTL/LRU cache of authenticated users keyed by token subject
+"""
+from collections import OrderedDict
+from typing import Dict, Optional
+import os
+import threading
+import time
+
+from models.user import User
+
+# Configuration
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+
+
+class UserCache:
+    """Thread-safe LRU cache with a per-entry time to live.
+
+    Entries are invalidated explicitly whenever a user row changes in a way
+    that affects the User model (2FA toggle, failed logins / lockout,
+    password change, deletion). The TTL bounds staleness for changes made
+    outside this process, e.g. by migration scripts or another worker.
+    """
+
+    def __init__(self, max_size: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, email: str) -> Optional[User]:
+        """Return the cached user, or None on a miss or expired entry"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[email]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(email)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, email: str, user: User):
+        """Cache a user, evicting the least recently used entry if full"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[email] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(email)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, email: str):
+        """Drop a user so the next request reloads it from the database"""
+        with self._lock:
+            self._entries.pop(email, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters for the metrics endpoint"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
+
+
+# Process-wide cache used by get_current_user
+user_cache = UserCache()
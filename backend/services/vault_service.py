@@ -0,0 +1,55 @@
+"""
+Vault Service
+Per-user vault version counter bumped on every note write
+"""
+import sqlite3
+
+VAULT_VERSION_TRIGGERS = {
+    "notes_version_ai": """
+        CREATE TRIGGER IF NOT EXISTS notes_version_ai AFTER INSERT ON notes BEGIN
+            INSERT INTO vault_versions (user_id, version) VALUES (new.user_id, 1)
+            ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+        END
+    """,
+    "notes_version_au": """
+        CREATE TRIGGER IF NOT EXISTS notes_version_au AFTER UPDATE ON notes BEGIN
+            INSERT INTO vault_versions (user_id, version) VALUES (new.user_id, 1)
+            ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+        END
+    """,
+    "notes_version_ad": """
+        CREATE TRIGGER IF NOT EXISTS notes_version_ad AFTER DELETE ON notes BEGIN
+            INSERT INTO vault_versions (user_id, version) VALUES (old.user_id, 1)
+            ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+        END
+    """,
+}
+
+
+def init_vault_versions(conn: sqlite3.Connection):
+    """Create vault_versions and the notes triggers that bump it.
+
+    Bumping from triggers means every write to notes (routes, migrations,
+    future bulk imports) invalidates caches keyed by the version, in the
+    same transaction as the write itself.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS vault_versions (
+            user_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes'")
+    if cursor.fetchone() is None:
+        return
+    for sql in VAULT_VERSION_TRIGGERS.values():
+        cursor.execute(sql)
+
+
+def get_vault_version(conn: sqlite3.Connection, user_id: str) -> int:
+    """Current vault version for a user (0 if they never wrote a note)"""
+    row = conn.execute(
+        "SELECT version FROM vault_versions WHERE user_id = ?", (user_id,)
+    ).fetchone()
+    return row[0] if row else 0
@@ -0,0 +1,45 @@
+"""
+Version Service
+Per-row version columns, ETags and conditional request checks
+"""
+from typing import Optional
+import sqlite3
+
+from fastapi import HTTPException, status
+
+
+def ensure_version_column(conn: sqlite3.Connection, table: str):
+    """Add a `version` column to tables created before it existed.
+
+    Every write to a row bumps it; it backs the row's ETag, so If-Match
+    detects concurrent edits instead of silently losing one of them.
+    """
+    cursor = conn.cursor()
+    columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})").fetchall()]
+    if columns and "version" not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+
+
+def item_etag(item_id: str, version: int) -> str:
+    """Strong ETag for one row; includes the id so a re-created row never matches"""
+    return f'"{item_id}.{version}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match / If-Match header lists the ETag (or is *)"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in header.split(",")]
+    return etag in tags or f"W/{etag}" in tags
+
+
+def require_if_match(if_match: Optional[str], etag: str):
+    """412 if the client sent If-Match for a version that is no longer current"""
+    if if_match is not None and not etag_matches(if_match, etag):
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Item was modified by someone else",
+            headers={"ETag": etag}
+        )
@@ -0,0 +1,204 @@
+"""
+Write Buffer Service
+Per-note write-behind buffer that coalesces autosaves into one transaction
+"""
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+import sqlite3
+
+from services import link_service, tag_service
+from services.database import get_database
+from services.suggest_service import suggest_index
+
+# Seconds a note save may wait in memory before it is written (0 = write-through)
+NOTE_WRITE_DELAY = float(os.getenv("NOTE_WRITE_DELAY", "3"))
+
+logger = logging.getLogger(__name__)
+
+
+class PendingNote:
+    """The latest unsaved state of one note"""
+
+    __slots__ = ("note_id", "user_id", "name", "content", "title", "project",
+                 "tags", "version", "modified_at", "since")
+
+    def __init__(self, note_id: str, user_id: str, name: str, content: str,
+                 title: Optional[str], project: Optional[str], tags: List[str],
+                 version: int, modified_at: str):
+        self.note_id = note_id
+        self.user_id = user_id
+        self.name = name
+        self.content = content
+        self.title = title
+        self.project = project
+        self.tags = tags
+        self.version = version
+        self.modified_at = modified_at
+        self.since = time.monotonic()  # First buffered write since the last flush
+
+
+def write_note(conn: sqlite3.Connection, note: PendingNote):
+    """Write a note's content, metadata, links and tags (no commit)"""
+    conn.execute("""
+        UPDATE notes
+        SET content = ?, title = ?, project = ?, tags = ?, modified_at = ?, version = ?
+        WHERE id = ?
+    """, (note.content, note.title, note.project, json.dumps(note.tags),
+          note.modified_at, note.version, note.note_id))
+    link_service.set_links(conn, note.user_id, note.name, note.content)
+    tag_service.set_tags(conn, note.user_id, note.note_id, note.tags)
+
+
+class NoteWriteBuffer:
+    """Coalesces saves of the same note arriving within NOTE_WRITE_DELAY.
+
+    Each save replaces the pending state of its note, so ten autosaves in
+    the window cost one UPDATE, one FTS row update and one WAL commit, and
+    every due note is flushed in a single transaction.
+
+    Consistency rules:
+    - routes that save notes hold the writer connection, and so does the
+      flush, so a route never sees a half-flushed note
+    - note reads overlay the pending state (read-your-writes); listings,
+      search and the graph catch up when the note is flushed
+    - renames flush the note first, deletes discard it
+    - the buffer is per process, so the backend must run as a single
+      process (one uvicorn worker): another worker would neither see nor
+      overlay the pending saves
+    - a save is acknowledged before it is committed; the lifespan hook
+      flushes everything on a clean shutdown, but a crash loses up to
+      NOTE_WRITE_DELAY seconds of edits (set it to 0 to write through)
+    - a failed flush leaves the notes buffered and the flusher retries them
+    """
+
+    def __init__(self, delay: float = NOTE_WRITE_DELAY):
+        self.delay = delay
+        self._pending: Dict[Tuple[str, str], PendingNote] = {}
+        self._lock = threading.Lock()
+        self.saves = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.written = 0
+        self.failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.delay > 0
+
+    def get(self, user_id: str, name: str) -> Optional[PendingNote]:
+        """Pending state of a note, if a save is waiting to be written"""
+        with self._lock:
+            return self._pending.get((user_id, name))
+
+    def put(self, note: PendingNote):
+        """Buffer a save, replacing any pending save of the same note"""
+        key = (note.user_id, note.name)
+        with self._lock:
+            previous = self._pending.get(key)
+            if previous is not None:
+                note.since = previous.since
+                self.coalesced += 1
+            self._pending[key] = note
+            self.saves += 1
+
+    def discard(self, user_id: str, name: str):
+        """Drop a pending save (the note is being deleted)"""
+        with self._lock:
+            self._pending.pop((user_id, name), None)
+
+    def flush(self, conn: sqlite3.Connection, due_only: bool = False,
+              key: Optional[Tuple[str, str]] = None) -> int:
+        """Write pending notes in one transaction; call with the writer connection.
+
+        Entries stay visible to readers until the commit, then are removed
+        unless a newer save replaced them in the meantime.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if key is not None:
+                batch = [self._pending[key]] if key in self._pending else []
+            else:
+                batch = [
+                    note for note in self._pending.values()
+                    if not due_only or now - note.since >= self.delay
+                ]
+        if not batch:
+            return 0
+
+        try:
+            for note in batch:
+                write_note(conn, note)
+            conn.commit()
+            written = batch
+        except Exception:
+            conn.rollback()
+            if len(batch) == 1:
+                raise
+            # Write one at a time so a single bad note can't hold back the rest
+            written = []
+            for note in batch:
+                try:
+                    write_note(conn, note)
+                    conn.commit()
+                    written.append(note)
+                except Exception:
+                    conn.rollback()
+                    self.failures += 1
+                    logger.exception("Writing buffered note %r of user %s failed; will retry",
+                                     note.name, note.user_id)
+
+        with self._lock:
+            for note in written:
+                if self._pending.get((note.user_id, note.name)) is note:
+                    del self._pending[(note.user_id, note.name)]
+            self.flushes += 1
+            self.written += len(written)
+        for note in written:
+            suggest_index.note_saved(note.user_id, note.name, note.title, note.project, note.tags)
+        return len(written)
+
+    async def flush_all(self) -> int:
+        """Write every pending note (shutdown)"""
+        if not self._pending:
+            return 0
+        return await get_database().run_write(self.flush)
+
+    async def run_flusher(self):
+        """Background task: write notes whose window has passed.
+
+        Notes that fail to write stay buffered (and keep overlaying reads),
+        so they are retried on the next pass.
+        """
+        interval = max(self.delay / 4, 0.05)
+        while True:
+            await asyncio.sleep(interval)
+            if not self._pending:
+                continue
+            try:
+                await get_database().run_write(self.flush, True)
+            except Exception:
+                self.failures += 1
+                logger.exception("Note write buffer flush failed; %d notes stay buffered for retry",
+                                 len(self._pending))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "delay": self.delay,
+                "pending": len(self._pending),
+                "saves": self.saves,
+                "coalesced": self.coalesced,
+                "flushes": self.flushes,
+                "written": self.written,
+                "failures": self.failures
+            }
+
+
+# Process-wide write buffer
+note_buffer = NoteWriteBuffer()
@@ -0,0 +1,58 @@
+"""
+Shared test fixtures
+One temporary database, vault and attachment store per test session, a
+TestClient for the app and freshly registered users
+"""
+from pathlib import Path
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+# The app modules read the environment and create their tables on import,
+# so everything is configured before the first of them is imported
+_TMP = Path(tempfile.mkdtemp(prefix="synora-tests-"))
+os.environ["DATABASE_PATH"] = str(_TMP / "notes.db")
+os.environ["VAULT_PATH"] = str(_TMP / "vault")
+os.environ["ATTACHMENTS_PATH"] = str(_TMP / "attachments")
+os.environ["NOTE_WRITE_DELAY"] = "0"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["IMAGE_PREGENERATE_WIDTHS"] = ""
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import init_database  # noqa: E402
+
+init_database.DB_PATH = os.environ["DATABASE_PATH"]
+init_database.init_database()
+init_database.add_missing_columns()
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def make_user(client):
+    """Register a new user and return their auth headers"""
+    def register() -> dict:
+        name = uuid.uuid4().hex[:12]
+        r = client.post("/api/auth/register", json={
+            "email": f"{name}@example.com",
+            "username": name,
+            "password": "password123"
+        })
+        assert r.status_code == 201, r.text
+        return {"Authorization": f"Bearer {r.json()['access_token']}"}
+    return register
+
+
+@pytest.fixture
+def headers(make_user):
+    return make_user()
@@ -0,0 +1,182 @@
+"""
+Attachment store: content-addressed files with reference counts
+"""
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import io
+import os
+import sqlite3
+
+from PIL import Image
+
+from services.attachment_service import BlobStore, init_attachments_table, release_unreferenced
+from services.database import get_database
+from services import image_service
+from services.image_service import image_derivatives
+
+
+def upload(client, headers, content, filename="file.png"):
+    r = client.post("/api/attachments/upload", headers=headers,
+                    files={"file": (filename, content, "image/png")})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def refcount(digest):
+    with get_database().read() as conn:
+        row = conn.execute("SELECT refcount FROM attachment_blobs WHERE sha256 = ?", (digest,)).fetchone()
+    return row[0] if row else None
+
+
+def png():
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 600), tuple(os.urandom(3))).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def animated_gif():
+    frames = [Image.new("RGB", (800, 600), tuple(os.urandom(3))) for _ in range(3)]
+    buffer = io.BytesIO()
+    frames[0].save(buffer, "GIF", save_all=True, append_images=frames[1:], duration=100, loop=0)
+    return buffer.getvalue()
+
+
+def test_blob_store_dedups_by_content(tmp_path):
+    store = BlobStore(tmp_path)
+    digest = store.put(b"content")
+    assert digest == hashlib.sha256(b"content").hexdigest()
+    assert store.path(digest) == tmp_path / digest[:2] / digest[2:4] / digest
+    assert store.put(b"content") == digest
+    assert [p for p in tmp_path.rglob("*") if p.is_file()] == [store.path(digest)]
+
+
+def test_release_unreferenced_follows_refcount(tmp_path):
+    store = BlobStore(tmp_path)
+    conn = sqlite3.connect(":memory:")
+    init_attachments_table(conn, store)
+    for attachment_id in ("a", "b"):
+        digest, temp, size = store.stage(io.BytesIO(b"shared"))
+        store.commit(digest, temp)
+        conn.execute("INSERT INTO attachments (id, filename, size, sha256) VALUES (?, 'f', ?, ?)",
+                     (attachment_id, size, digest))
+    assert conn.execute("SELECT refcount FROM attachment_blobs").fetchone()[0] == 2
+
+    conn.execute("DELETE FROM attachments WHERE id = 'a'")
+    assert release_unreferenced(conn, store) == []
+    assert store.path(digest).exists()
+
+    conn.execute("DELETE FROM attachments WHERE id = 'b'")
+    assert release_unreferenced(conn, store) == [digest]
+    assert not store.path(digest).exists()
+    assert conn.execute("SELECT COUNT(*) FROM attachment_blobs").fetchone()[0] == 0
+
+
+def test_legacy_blobs_are_moved_out_of_the_database(tmp_path):
+    store = BlobStore(tmp_path)
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""
+        CREATE TABLE attachments (id TEXT PRIMARY KEY, filename TEXT NOT NULL, content_type TEXT,
+                                  data BLOB NOT NULL, size INTEGER NOT NULL, created_at TIMESTAMP)
+    """)
+    for attachment_id, data in (("a", b"same"), ("b", b"same"), ("c", b"other")):
+        conn.execute("INSERT INTO attachments VALUES (?, 'f.png', 'image/png', ?, ?, NULL)",
+                     (attachment_id, data, len(data)))
+
+    assert init_attachments_table(conn, store) == 3
+    digest = hashlib.sha256(b"same").hexdigest()
+    assert store.path(digest).read_bytes() == b"same"
+    assert conn.execute("SELECT refcount FROM attachment_blobs WHERE sha256 = ?", (digest,)).fetchone()[0] == 2
+    assert "data" not in [row[1] for row in conn.execute("PRAGMA table_info(attachments)")]
+
+
+def test_uploads_share_files_until_the_last_reference_goes(client, headers):
+    content = os.urandom(1024)
+    first = upload(client, headers, content, "x.png")
+    second = upload(client, headers, content, "y.png")
+    digest = hashlib.sha256(content).hexdigest()
+    path = image_derivatives.root.parent / digest[:2] / digest[2:4] / digest
+    assert first["id"] != second["id"]
+    assert refcount(digest) == 2
+
+    assert client.delete(f"/api/attachments/{first['id']}").status_code == 200
+    assert refcount(digest) == 1
+    assert client.get(second["url"]).content == content
+
+    assert client.delete(f"/api/attachments/{second['id']}").status_code == 200
+    assert refcount(digest) is None
+    assert not path.exists()
+    assert client.get(second["url"]).status_code == 404
+
+
+def test_upload_records_the_owner(client, headers):
+    attachment = upload(client, headers, os.urandom(64))
+    user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+    with get_database().read() as conn:
+        owner = conn.execute("SELECT user_id FROM attachments WHERE id = ?", (attachment["id"],)).fetchone()[0]
+    assert owner == user_id
+    assert client.post("/api/attachments/upload",
+                       files={"file": ("a.png", b"x", "image/png")}).status_code in (401, 403)
+
+
+def test_deleting_a_note_releases_its_files_and_derivatives(client, headers):
+    content = png()
+    attachment = upload(client, headers, content)
+    digest = hashlib.sha256(content).hexdigest()
+    assert client.get(attachment["url"], params={"w": 320, "format": "webp"}).status_code == 200
+    root = image_derivatives.root.parent
+    assert list((root / "derived" / digest[:2]).glob(f"{digest}_*"))
+
+    client.post("/api/notes", headers=headers, json={"name": "img", "content": f"![x]({attachment['url']})"})
+    r = client.delete("/api/notes/img", headers=headers)
+    assert r.json()["deleted_attachments"] == 1
+    assert refcount(digest) is None
+    assert not (root / digest[:2] / digest[2:4] / digest).exists()
+    assert not list((root / "derived" / digest[:2]).glob(f"{digest}_*"))
+
+
+def test_deleting_a_note_keeps_other_users_attachments(client, make_user):
+    owner, other = make_user(), make_user()
+    attachment = upload(client, owner, os.urandom(64))
+    client.post("/api/notes", headers=other, json={"name": "copy", "content": f"![x]({attachment['url']})"})
+    assert client.delete("/api/notes/copy", headers=other).json()["deleted_attachments"] == 0
+    assert client.get(attachment["url"]).status_code == 200
+
+
+def test_cleanup_keeps_attachments_referenced_by_buffered_saves(client, headers, monkeypatch):
+    from services.write_buffer import note_buffer
+
+    monkeypatch.setattr(note_buffer, "delay", 60)
+    content = os.urandom(256)
+    attachment = upload(client, headers, content)
+    digest = hashlib.sha256(content).hexdigest()
+
+    client.post("/api/notes", headers=headers, json={"name": "draft", "content": "empty"})
+    client.put("/api/notes/draft", headers=headers, json={"content": f"![x]({attachment['url']})"})
+    assert note_buffer.stats()["pending"] == 1
+
+    assert client.post("/api/attachments/cleanup").status_code == 200
+    assert refcount(digest) == 1
+    assert client.get(attachment["url"]).content == content
+    assert note_buffer.stats()["pending"] == 0
+
+
+def test_animations_are_passed_through_without_decoding_again(client, headers, monkeypatch):
+    calls = []
+    render_derivative = image_service.render_derivative
+
+    def render(*args):
+        calls.append(args)
+        return render_derivative(*args)
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(image_derivatives, "_get_executor", lambda: executor)
+    monkeypatch.setattr(image_service, "render_derivative", render)
+    content = animated_gif()
+    attachment = upload(client, headers, content, "anim.gif")
+
+    for width in (320, 320, 640):
+        r = client.get(attachment["url"], params={"w": width})
+        assert r.status_code == 200
+        assert r.content == content
+    assert len(calls) == 1
+    executor.shutdown()
@@ -0,0 +1,60 @@
+"""
+Conditional requests: ETag / If-None-Match (304) and If-Match (412)
+"""
+from services.version_service import etag_matches, item_etag
+
+
+def test_etag_matches():
+    etag = item_etag("id", 3)
+    assert etag == '"id.3"'
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other.1", {etag}', etag)
+    assert etag_matches(f"W/{etag}", etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches(item_etag("id", 2), etag)
+
+
+def test_note_revalidation_and_lost_update(client, headers):
+    client.post("/api/notes", headers=headers, json={"name": "n", "content": "a"})
+    r = client.get("/api/notes/n", headers=headers)
+    etag = r.headers["etag"]
+    assert r.json()["version"] == 1
+    assert client.get("/api/notes/n", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    r = client.put("/api/notes/n", headers={**headers, "If-Match": etag}, json={"content": "b"})
+    assert r.status_code == 200
+    new_etag = r.headers["etag"]
+    assert new_etag != etag
+
+    # A second writer still holding the old version is refused
+    r = client.put("/api/notes/n", headers={**headers, "If-Match": etag}, json={"content": "c"})
+    assert r.status_code == 412
+    assert r.headers["etag"] == new_etag
+    assert client.get("/api/notes/n", headers=headers).json()["content"] == "b"
+    assert client.get("/api/notes/n", headers={**headers, "If-None-Match": etag}).status_code == 200
+
+    # Without If-Match the last write wins, as before
+    assert client.put("/api/notes/n", headers=headers, json={"content": "d"}).status_code == 200
+
+
+def test_task_revalidation_and_lost_update(client, headers):
+    task = client.post("/api/tasks", headers=headers, json={"title": "T"}).json()
+    assert task["version"] == 1
+    url = f"/api/tasks/{task['id']}"
+    etag = client.get(url, headers=headers).headers["etag"]
+    assert client.get(url, headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    r = client.put(url, headers={**headers, "If-Match": etag}, json={"completed": True})
+    assert r.status_code == 200
+    assert r.json()["version"] == 2
+    r = client.put(url, headers={**headers, "If-Match": etag}, json={"completed": False})
+    assert r.status_code == 412
+
+
+def test_etags_are_per_user(client, make_user):
+    alice, bob = make_user(), make_user()
+    client.post("/api/notes", headers=alice, json={"name": "same", "content": "a"})
+    client.post("/api/notes", headers=bob, json={"name": "same", "content": "a"})
+    etag = client.get("/api/notes/same", headers=alice).headers["etag"]
+    assert client.get("/api/notes/same", headers={**bob, "If-None-Match": etag}).status_code == 200
@@ -0,0 +1,56 @@
+"""
+Graph ETags: one per user, vault version and view
+"""
+import pytest
+
+from services.graph_service import graph_etag
+
+
+VIEWS = [
+    "/api/graph",
+    "/api/graph?layout=true",
+    "/api/graph/stats",
+    "/api/graph/stats?limit=1",
+    "/api/graph/neighborhood/A",
+    "/api/graph/neighborhood/A?depth=1",
+    "/api/graph/neighborhood/B",
+]
+
+
+@pytest.fixture
+def graph_user(client, headers):
+    client.post("/api/notes", headers=headers, json={"name": "A", "content": "[[B]]"})
+    client.post("/api/notes", headers=headers, json={"name": "B", "content": "text"})
+    return headers
+
+
+def test_graph_etag_depends_on_user_version_and_variant():
+    assert graph_etag("u1", 1) == graph_etag("u1", 1)
+    assert graph_etag("u1", 1) != graph_etag("u2", 1)
+    assert graph_etag("u1", 1) != graph_etag("u1", 2)
+    assert graph_etag("u1", 1, "graph", False) != graph_etag("u1", 1, "graph", True)
+    assert graph_etag("u1", 1, "stats", 100) != graph_etag("u1", 1, "neighborhood", 100)
+
+
+def test_each_view_has_its_own_etag(client, graph_user):
+    etags = {url: client.get(url, headers=graph_user).headers["etag"] for url in VIEWS}
+    assert len(set(etags.values())) == len(VIEWS)
+
+
+@pytest.mark.parametrize("url", VIEWS)
+def test_revalidation_only_matches_the_same_view(client, graph_user, url):
+    etag = client.get(url, headers=graph_user).headers["etag"]
+    assert client.get(url, headers={**graph_user, "If-None-Match": etag}).status_code == 304
+
+    other = next(view for view in VIEWS if view != url)
+    other_etag = client.get(other, headers=graph_user).headers["etag"]
+    r = client.get(url, headers={**graph_user, "If-None-Match": other_etag})
+    assert r.status_code == 200
+
+
+def test_etag_changes_when_the_vault_changes(client, graph_user):
+    etag = client.get("/api/graph", headers=graph_user).headers["etag"]
+    client.post("/api/notes", headers=graph_user, json={"name": "C", "content": "[[A]]"})
+    r = client.get("/api/graph", headers={**graph_user, "If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
@@ -0,0 +1,42 @@
+"""
+Server-side layout: the iteration count shrinks with the graph size
+"""
+import random
+
+from services.graph_service import GraphIndex
+from services.layout_service import (
+    LAYOUT_ITERATIONS, LAYOUT_MIN_ITERATIONS, LAYOUT_REFINE_ITERATIONS, LAYOUT_SAMPLES,
+    LAYOUT_WORK_BUDGET, compute_layout, layout_iterations
+)
+
+
+def random_graph(n, m, seed=1):
+    rng = random.Random(seed)
+    adjacency = [{} for _ in range(n)]
+    for _ in range(m):
+        u, v = rng.randrange(n), rng.randrange(n)
+        if u != v:
+            adjacency[u][v] = adjacency[u].get(v, 0) | GraphIndex.OUT
+            adjacency[v][u] = adjacency[v].get(u, 0) | GraphIndex.IN
+    return GraphIndex([f"n{i}" for i in range(n)], [None] * n, [[] for _ in range(n)], adjacency)
+
+
+def test_small_graphs_get_the_full_iteration_count():
+    assert layout_iterations(100, 300) == LAYOUT_ITERATIONS
+
+
+def test_large_graphs_stay_within_the_work_budget():
+    iterations = layout_iterations(20_000, 100_000)
+    assert LAYOUT_MIN_ITERATIONS <= iterations < LAYOUT_ITERATIONS
+    assert iterations * (20_000 * LAYOUT_SAMPLES + 100_000) <= LAYOUT_WORK_BUDGET
+    assert layout_iterations(10**7, 10**8) == LAYOUT_MIN_ITERATIONS
+
+
+def test_refinement_is_capped_separately():
+    assert layout_iterations(20_000, 100_000, 10, LAYOUT_REFINE_ITERATIONS) == LAYOUT_REFINE_ITERATIONS
+
+
+def test_unchanged_topology_reuses_the_layout():
+    layout = compute_layout(random_graph(500, 1500))
+    assert len(layout.coordinates()) == 500
+    assert compute_layout(random_graph(500, 1500), layout) is layout
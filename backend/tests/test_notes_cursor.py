@@ -0,0 +1,88 @@
+"""
+Keyset pagination of GET /api/notes
+"""
+import pytest
+
+
+def read_all_pages(client, headers, cursor=None, **params):
+    names, pages = [], 0
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        r = client.get("/api/notes", headers=headers, params=query)
+        assert r.status_code == 200, r.text
+        if cursor is None:
+            assert "x-total-count" in r.headers
+        else:
+            assert "x-total-count" not in r.headers
+        names += [note["name"] for note in r.json()]
+        pages += 1
+        cursor = r.headers.get("x-next-cursor")
+        if not cursor:
+            return names, pages
+
+
+@pytest.fixture
+def notes_user(client, headers):
+    for i in range(25):
+        client.post("/api/notes", headers=headers, json={
+            "name": f"n{i:02d}",
+            "content": f"---\ntags: [{'even' if i % 2 == 0 else 'odd'}]\nproject: P{i % 3}\n---\n",
+            "folder": "a/b" if i < 5 else ("a" if i < 10 else None)
+        })
+    return headers
+
+
+def test_pages_cover_the_listing_exactly_once(client, notes_user):
+    full = [note["name"] for note in client.get("/api/notes", headers=notes_user).json()]
+    assert len(full) == 25
+
+    names, pages = read_all_pages(client, notes_user, limit=7)
+    assert pages == 4
+    assert names == full
+
+    r = client.get("/api/notes", headers=notes_user, params={"limit": 7})
+    assert r.headers["x-total-count"] == "25"
+
+
+def test_last_page_has_no_cursor(client, notes_user):
+    r = client.get("/api/notes", headers=notes_user, params={"limit": 25})
+    assert len(r.json()) == 25
+    assert "x-next-cursor" not in r.headers
+
+
+def test_new_notes_do_not_shift_later_pages(client, notes_user):
+    r = client.get("/api/notes", headers=notes_user, params={"limit": 10})
+    first = [note["name"] for note in r.json()]
+    client.post("/api/notes", headers=notes_user, json={"name": "newest", "content": ""})
+
+    rest, _ = read_all_pages(client, notes_user, limit=10, cursor=r.headers["x-next-cursor"])
+    assert "newest" not in rest
+    assert not set(first) & set(rest)
+    assert len(first) + len(rest) == 25
+
+
+def test_filters_and_projection(client, notes_user):
+    names, _ = read_all_pages(client, notes_user, limit=4, tag="even")
+    assert len(names) == 13
+    r = client.get("/api/notes", headers=notes_user, params={"tag": "even", "limit": 5})
+    assert r.headers["x-total-count"] == "13"
+
+    assert len(client.get("/api/notes", headers=notes_user, params={"project": "P0"}).json()) == 9
+    folder = client.get("/api/notes", headers=notes_user, params={"folder": "a/b"}).json()
+    assert sorted(note["name"] for note in folder) == [f"n{i:02d}" for i in range(5)]
+    assert len(client.get("/api/notes", headers=notes_user, params={"folder": "a"}).json()) == 10
+
+    r = client.get("/api/notes", headers=notes_user, params={"limit": 3, "fields": "name,tags"})
+    assert all(set(note) == {"name", "tags"} for note in r.json())
+
+
+def test_bad_requests(client, notes_user):
+    assert client.get("/api/notes", headers=notes_user, params={"fields": "name,bogus"}).status_code == 422
+    assert client.get("/api/notes", headers=notes_user, params={"cursor": "%%%", "limit": 2}).status_code == 400
+
+
+def test_pages_are_per_user(client, notes_user, make_user):
+    other = make_user()
+    client.post("/api/notes", headers=other, json={"name": "mine", "content": ""})
+    names, _ = read_all_pages(client, other, limit=2)
+    assert names == ["mine"]
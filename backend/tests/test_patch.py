@@ -0,0 +1,84 @@
+"""
+Note patches: splice application and PATCH /api/notes/{name}
+"""
+import pytest
+
+from models.note import Splice
+from services.patch_service import PatchError, apply_splices, frontmatter_block
+
+
+def splice(start, delete=0, insert=""):
+    return Splice(start=start, delete=delete, insert=insert)
+
+
+def test_apply_splices_uses_base_text_offsets():
+    text = "hello world"
+    assert apply_splices(text, [splice(0, 5, "goodbye"), splice(6, 5, "moon")]) == "goodbye moon"
+    assert apply_splices(text, []) == text
+    assert apply_splices(text, [splice(11, 0, "!")]) == "hello world!"
+
+
+def test_offsets_are_utf16_code_units():
+    # The emoji is two UTF-16 units, as in a JavaScript string
+    text = "a😀b"
+    assert apply_splices(text, [splice(3, 1, "c")]) == "a😀c"
+    assert apply_splices(text, [splice(1, 2, "x")]) == "axb"
+
+
+def test_surrogate_pair_split_across_splices_is_joined():
+    assert apply_splices("ab", [splice(1, 0, "\ud83d"), splice(1, 0, "\ude00")]) == "a😀b"
+
+
+@pytest.mark.parametrize("splices", [
+    [splice(0, 0, "\ud800")],   # lone surrogate in the insert
+    [splice(2, 0, "x")],        # between the halves of a pair
+    [splice(1, 1)],             # deletes half of a pair
+])
+def test_unpaired_surrogates_are_rejected(splices):
+    with pytest.raises(PatchError):
+        apply_splices("a😀b", splices)
+
+
+@pytest.mark.parametrize("splices", [
+    [splice(3, 0, "x"), splice(1, 0, "y")],
+    [splice(0, 3, "x"), splice(2, 0, "y")],
+    [splice(5, 1)],
+])
+def test_unsorted_overlapping_or_out_of_range_splices_are_rejected(splices):
+    with pytest.raises(PatchError):
+        apply_splices("abcde", splices)
+
+
+def test_frontmatter_block():
+    assert frontmatter_block("---\ntags: [a]\n---\nbody") == "---\ntags: [a]\n---"
+    assert frontmatter_block("no frontmatter") is None
+    assert frontmatter_block("---\nunterminated") is None
+
+
+def test_patch_route(client, headers):
+    client.post("/api/notes", headers=headers, json={"name": "p", "content": "hello world"})
+
+    r = client.patch("/api/notes/p", headers=headers, json={
+        "base_version": 1, "splices": [{"start": 6, "delete": 5, "insert": "there"}]
+    })
+    assert r.status_code == 200, r.text
+    assert r.json()["version"] == 2
+    assert client.get("/api/notes/p", headers=headers).json()["content"] == "hello there"
+
+    # Stale base version
+    r = client.patch("/api/notes/p", headers=headers, json={"base_version": 1, "splices": []})
+    assert r.status_code == 409
+    assert r.json()["detail"]["version"] == 2
+
+
+def test_patch_route_rejects_bad_splices_with_422(client, headers):
+    client.post("/api/notes", headers=headers, json={"name": "q", "content": "a😀b"})
+    body = b'{"base_version": 1, "splices": [{"start": 0, "delete": 0, "insert": "\\ud800"}]}'
+    r = client.patch("/api/notes/q", headers={**headers, "Content-Type": "application/json"}, content=body)
+    assert r.status_code == 422
+
+    r = client.patch("/api/notes/q", headers=headers, json={
+        "base_version": 1, "splices": [{"start": 10, "delete": 0, "insert": "x"}]
+    })
+    assert r.status_code == 422
+    assert client.get("/api/notes/q", headers=headers).json()["content"] == "a😀b"
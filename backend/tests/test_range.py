@@ -0,0 +1,87 @@
+"""
+Byte ranges: parse_range and attachment downloads with Range / If-Range
+"""
+import os
+
+import pytest
+
+from services.file_response import parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=990-5000", (990, 999)),
+    ("bytes = 0-0", (0, 0)),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", [
+    "items=0-10",       # other unit
+    "bytes=0-1,5-6",    # several ranges
+    "bytes=abc",
+    "bytes=-",
+    "bytes=5-2",
+    "bytes=1-2x",
+])
+def test_parse_range_ignores_what_it_cannot_serve(header):
+    assert parse_range(header, 1000) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=5000-6000"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+
+@pytest.fixture
+def attachment(client, headers):
+    content = os.urandom(200_000)
+    r = client.post("/api/attachments/upload", headers=headers,
+                    files={"file": ("big.png", content, "image/png")})
+    return r.json()["url"], content
+
+
+def test_full_download_advertises_ranges(client, attachment):
+    url, content = attachment
+    r = client.get(url)
+    assert r.status_code == 200
+    assert r.headers["accept-ranges"] == "bytes"
+    assert r.content == content
+
+
+def test_range_download(client, attachment):
+    url, content = attachment
+    r = client.get(url, headers={"Range": "bytes=1000-1999"})
+    assert r.status_code == 206
+    assert r.headers["content-range"] == f"bytes 1000-1999/{len(content)}"
+    assert r.headers["content-length"] == "1000"
+    assert r.content == content[1000:2000]
+
+    r = client.get(url, headers={"Range": "bytes=-10"})
+    assert r.status_code == 206
+    assert r.content == content[-10:]
+
+
+def test_unsatisfiable_range(client, attachment):
+    url, content = attachment
+    r = client.get(url, headers={"Range": f"bytes={len(content)}-"})
+    assert r.status_code == 416
+    assert r.headers["content-range"] == f"bytes */{len(content)}"
+
+
+def test_if_range(client, attachment):
+    url, content = attachment
+    etag = client.get(url).headers["etag"]
+    r = client.get(url, headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert r.status_code == 206
+    assert r.content == content[:10]
+
+    # A stale validator gets the whole file
+    r = client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert r.status_code == 200
+    assert r.content == content
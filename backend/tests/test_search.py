@@ -0,0 +1,62 @@
+"""
+Full-text search: per-user results and query plans
+"""
+from services import search_service
+from services.database import get_database
+
+
+def plan(sql, params):
+    with get_database().read() as conn:
+        return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+
+
+def test_fts_drives_the_search_query():
+    steps = plan(search_service.SEARCH_SQL, ("[", "]", 8, '"word"*', "user", 20))
+    # One MATCH over the index, then each hit looked up by rowid; never a
+    # walk over the user's notes re-running the MATCH for every one
+    assert steps[0].startswith("SCAN notes_fts VIRTUAL TABLE")
+    assert any("n USING INTEGER PRIMARY KEY (rowid=?)" in step for step in steps)
+    assert not any(step.startswith(("SCAN n ", "SEARCH n USING INDEX", "SEARCH n USING COVERING INDEX"))
+                   or step == "SCAN n" for step in steps)
+
+
+def test_search_is_ranked_and_per_user(client, make_user):
+    alice, bob = make_user(), make_user()
+    client.post("/api/notes", headers=alice, json={"name": "Fox A", "content": "---\ntags: [x, y]\n---\nquick fox"})
+    client.post("/api/notes", headers=alice, json={"name": "Other", "content": "a fox appears once"})
+    client.post("/api/notes", headers=bob, json={"name": "Fox B", "content": "quick fox"})
+
+    results = client.get("/api/search", headers=alice, params={"q": "fox"}).json()
+    assert [r["name"] for r in results] == ["Fox A", "Other"]
+    assert results[0]["tags"] == ["x", "y"]
+    assert "<mark>" in results[0]["snippet"]
+
+    assert [r["name"] for r in client.get("/api/search", headers=alice, params={"q": "qui*"}).json()] == ["Fox A"]
+    assert [r["name"] for r in client.get("/api/search", headers=bob, params={"q": "fox"}).json()] == ["Fox B"]
+
+
+def test_trigram_index_drives_the_fuzzy_query():
+    steps = plan(search_service.FUZZY_SQL, ('"pro"', "user", 200))
+    assert steps[0].startswith("SCAN notes_trigram VIRTUAL TABLE")
+    assert any("n USING INTEGER PRIMARY KEY (rowid=?)" in step for step in steps)
+
+
+def test_fuzzy_finds_a_one_letter_typo_in_a_longer_name(client, headers):
+    for name in ("projectmeet-3", "projectmeet-12", "groceries"):
+        client.post("/api/notes", headers=headers, json={"name": name, "content": ""})
+
+    results = client.get("/api/search", headers=headers, params={"q": "projct", "mode": "fuzzy"}).json()
+    assert sorted(r["name"] for r in results) == ["projectmeet-12", "projectmeet-3"]
+
+
+def test_fuzzy_ranks_closer_matches_first(client, headers):
+    client.post("/api/notes", headers=headers, json={"name": "Meeting notes", "content": ""})
+    client.post("/api/notes", headers=headers, json={"name": "Notes on metals", "content": ""})
+    results = client.get("/api/search", headers=headers, params={"q": "meting notes", "mode": "fuzzy"}).json()
+    assert results[0]["name"] == "Meeting notes"
+
+
+def test_similarity_scores_the_best_window():
+    grams = search_service._trigrams("projct")
+    assert search_service._similarity(grams, 6, "projectmeet-3") >= search_service.FUZZY_MIN_SIMILARITY
+    assert search_service._similarity(grams, 6, "groceries") < search_service.FUZZY_MIN_SIMILARITY
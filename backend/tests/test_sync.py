@@ -0,0 +1,68 @@
+"""
+Delta sync: GET /api/sync over the change_log
+"""
+
+
+def sync(client, headers, since=0, limit=500):
+    r = client.get("/api/sync", headers=headers, params={"since": since, "limit": limit})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_new_user_has_nothing_to_sync(client, headers):
+    assert sync(client, headers) == {"cursor": 0, "has_more": False, "changes": {}}
+
+
+def test_upserts_and_deletes_since_cursor(client, headers):
+    client.post("/api/notes", headers=headers, json={"name": "n1", "content": "---\ntags: [x]\n---\nhi"})
+    task = client.post("/api/tasks", headers=headers, json={"title": "T"}).json()
+    snippet = client.post("/api/snippets", headers=headers, json={"id": None, "title": "S"}).json()
+
+    first = sync(client, headers)
+    changes = first["changes"]
+    assert set(changes) == {"notes", "tasks", "snippets"}
+    assert changes["notes"]["upserts"][0]["tags"] == ["x"]
+    assert changes["notes"]["upserts"][0]["content"].endswith("hi")
+    assert changes["tasks"]["upserts"][0]["title"] == "T"
+
+    cursor = first["cursor"]
+    assert sync(client, headers, cursor)["changes"] == {}
+
+    # Two edits of one task collapse into one upsert with the latest state
+    client.put(f"/api/tasks/{task['id']}", headers=headers, json={"completed": True})
+    client.put(f"/api/tasks/{task['id']}", headers=headers, json={"title": "T2"})
+    client.delete(f"/api/snippets/{snippet['id']}", headers=headers)
+    client.delete("/api/notes/n1", headers=headers)
+
+    changes = sync(client, headers, cursor)["changes"]
+    assert len(changes["tasks"]["upserts"]) == 1
+    assert changes["tasks"]["upserts"][0]["title"] == "T2"
+    assert changes["tasks"]["upserts"][0]["completed"]
+    assert changes["snippets"] == {"upserts": [], "deletes": [snippet["id"]]}
+    assert changes["notes"]["upserts"] == [] and len(changes["notes"]["deletes"]) == 1
+
+
+def test_changes_are_per_user(client, make_user):
+    alice, bob = make_user(), make_user()
+    client.post("/api/tasks", headers=alice, json={"title": "private"})
+    assert sync(client, bob)["changes"] == {}
+
+
+def test_paging_returns_each_change_once(client, headers):
+    for i in range(12):
+        client.post("/api/tasks", headers=headers, json={"title": f"t{i}"})
+    client.post("/api/notes", headers=headers, json={"name": "paged", "content": ""})
+
+    seen, cursor, pages = [], 0, 0
+    while True:
+        page = sync(client, headers, cursor, limit=5)
+        pages += 1
+        for entity, batch in page["changes"].items():
+            seen += [(entity, item["id"]) for item in batch["upserts"]]
+            seen += [(entity, item_id) for item_id in batch["deletes"]]
+        assert page["cursor"] >= cursor
+        cursor = page["cursor"]
+        if not page["has_more"]:
+            break
+    assert pages == 3
+    assert len(seen) == len(set(seen)) == 13
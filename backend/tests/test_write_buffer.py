@@ -0,0 +1,138 @@
+"""
+Note write buffer: coalescing, flushing, retries and read-your-writes
+"""
+import pytest
+
+from services import write_buffer
+from services.database import get_database
+from services.write_buffer import NoteWriteBuffer, PendingNote, note_buffer
+
+
+def create_note(client, headers, name, content="v0"):
+    client.post("/api/notes", headers=headers, json={"name": name, "content": content})
+    user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+    with get_database().read() as conn:
+        row = conn.execute("SELECT id FROM notes WHERE user_id = ? AND name = ?", (user_id, name)).fetchone()
+    return row["id"], user_id
+
+
+def pending(note_id, user_id, name, content, version):
+    return PendingNote(note_id, user_id, name, content, None, None, [], version, "2024-01-01T00:00:00")
+
+
+def stored_content(note_id):
+    with get_database().read() as conn:
+        return conn.execute("SELECT content FROM notes WHERE id = ?", (note_id,)).fetchone()[0]
+
+
+def test_saves_of_one_note_coalesce(client, headers):
+    note_id, user_id = create_note(client, headers, "coalesce")
+    buffer = NoteWriteBuffer(delay=60)
+    for version in range(2, 7):
+        buffer.put(pending(note_id, user_id, "coalesce", f"v{version}", version))
+
+    assert buffer.get(user_id, "coalesce").content == "v6"
+    assert buffer.stats()["coalesced"] == 4
+    assert stored_content(note_id) == "v0"
+
+    with get_database().write() as conn:
+        assert buffer.flush(conn) == 1
+    assert stored_content(note_id) == "v6"
+    assert buffer.stats()["pending"] == 0
+
+
+def test_due_only_flush_waits_for_the_window(client, headers):
+    note_id, user_id = create_note(client, headers, "due")
+    buffer = NoteWriteBuffer(delay=60)
+    buffer.put(pending(note_id, user_id, "due", "later", 2))
+
+    with get_database().write() as conn:
+        assert buffer.flush(conn, due_only=True) == 0
+        buffer.get(user_id, "due").since -= 61
+        assert buffer.flush(conn, due_only=True) == 1
+    assert stored_content(note_id) == "later"
+
+
+def test_discard_drops_the_pending_save(client, headers):
+    note_id, user_id = create_note(client, headers, "discard")
+    buffer = NoteWriteBuffer(delay=60)
+    buffer.put(pending(note_id, user_id, "discard", "never", 2))
+    buffer.discard(user_id, "discard")
+
+    with get_database().write() as conn:
+        assert buffer.flush(conn) == 0
+    assert stored_content(note_id) == "v0"
+
+
+def test_failed_note_stays_buffered_and_others_are_written(client, headers, monkeypatch):
+    good_id, user_id = create_note(client, headers, "good")
+    bad_id, _ = create_note(client, headers, "bad")
+    buffer = NoteWriteBuffer(delay=60)
+    buffer.put(pending(good_id, user_id, "good", "written", 2))
+    buffer.put(pending(bad_id, user_id, "bad", "retried", 2))
+
+    write_note = write_buffer.write_note
+
+    def failing_write(conn, note):
+        if note.name == "bad":
+            raise RuntimeError("disk full")
+        write_note(conn, note)
+
+    monkeypatch.setattr(write_buffer, "write_note", failing_write)
+    with get_database().write() as conn:
+        assert buffer.flush(conn) == 1
+    assert stored_content(good_id) == "written"
+    assert stored_content(bad_id) == "v0"
+    assert buffer.get(user_id, "bad").content == "retried"
+    assert buffer.stats()["failures"] == 1
+
+    # The next pass retries it
+    monkeypatch.setattr(write_buffer, "write_note", write_note)
+    with get_database().write() as conn:
+        assert buffer.flush(conn) == 1
+    assert stored_content(bad_id) == "retried"
+    assert buffer.stats()["pending"] == 0
+
+
+@pytest.fixture
+def buffered(monkeypatch):
+    """Turn on the app's write buffer; anything left is written afterwards"""
+    monkeypatch.setattr(note_buffer, "delay", 60)
+    yield note_buffer
+    with get_database().write() as conn:
+        note_buffer.flush(conn)
+
+
+def test_reads_see_buffered_saves(client, headers, buffered):
+    note_id, _ = create_note(client, headers, "ryw")
+    r = client.put("/api/notes/ryw", headers=headers, json={"content": "---\ntags: [fresh]\n---\nnew [[Other]]"})
+    assert r.json()["version"] == 2
+
+    note = client.get("/api/notes/ryw", headers=headers).json()
+    assert note["content"].endswith("new [[Other]]")
+    assert note["version"] == 2
+    assert note["tags"] == ["fresh"]
+    assert stored_content(note_id) == "v0"
+
+    # A patch applies on top of the buffered state
+    r = client.patch("/api/notes/ryw", headers=headers, json={
+        "base_version": 2, "splices": [{"start": len(note["content"]), "insert": "!"}]
+    })
+    assert r.json()["version"] == 3
+
+    with get_database().write() as conn:
+        buffered.flush(conn)
+    assert stored_content(note_id) == note["content"] + "!"
+
+
+def test_rename_flushes_and_delete_discards(client, headers, buffered):
+    note_id, user_id = create_note(client, headers, "old")
+    client.put("/api/notes/old", headers=headers, json={"content": "buffered"})
+    r = client.put("/api/notes/old", headers=headers, json={"content": "renamed", "name": "new"})
+    assert r.status_code == 200, r.text
+    assert buffered.get(user_id, "old") is None
+    assert client.get("/api/notes/new", headers=headers).json()["content"] == "renamed"
+
+    client.put("/api/notes/new", headers=headers, json={"content": "gone"})
+    assert client.delete("/api/notes/new", headers=headers).status_code == 200
+    assert buffered.get(user_id, "new") is None
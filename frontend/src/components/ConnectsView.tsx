@@ -6,6 +6,7 @@ import {
   Mail, Clock, Check, X, Trash2, Share2, Bell
 } from 'lucide-react';
 import { api } from '@/lib/api';
+import { useRealtime } from '@/lib/realtime';
 
 interface Connect {
   id: string;
@@ -49,6 +50,8 @@ export default function ConnectsView() {
     loadData();
   }, []);
 
+  useRealtime(['connects'], () => loadData());
+
   const loadData = async () => {
     try {
       setLoading(true);
@@ -4,6 +4,7 @@ import { FileText, CheckSquare, Lightbulb, FolderKanban, Calendar, Activity } fr
 import { useEffect, useState } from 'react';
 import { useTranslation } from '@/lib/useTranslation';
 import { api } from '@/lib/api';
+import { useRealtime } from '@/lib/realtime';
 
 interface Stats {
   totalNotes: number;
@@ -29,6 +30,8 @@ export default function Dashboard() {
     loadStats();
   }, []);
 
+  useRealtime(['notes', 'projects', 'tasks', 'ideas', 'habits'], () => loadStats());
+
   const loadStats = async () => {
     try {
       // Load all data from backend API
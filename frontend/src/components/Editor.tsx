@@ -2,7 +2,7 @@
 
 import { useState, useEffect, useRef } from 'react';
 import dynamic from 'next/dynamic';
-import { api, uploadAttachment, type Note } from '@/lib/api';
+import { api, diffSplice, uploadAttachment, type Note } from '@/lib/api';
 import MarkdownPreview from './MarkdownPreview';
 import StatusBar from './StatusBar';
 import FileInfoModal from './FileInfoModal';
@@ -34,6 +34,8 @@ export default function Editor({ noteName, onNoteChange, onNoteDeleted }: Editor
   const [backlinksCount, setBacklinksCount] = useState(0);
   const editorRef = useRef<any>(null);
   const saveTimeoutRef = useRef<NodeJS.Timeout | null>(null);
+  // Last content/version the server has, so autosave can send a patch
+  const savedRef = useRef<{ content: string; version: number } | null>(null);
 
   useEffect(() => {
     // Initial dark mode check
@@ -101,6 +103,7 @@ export default function Editor({ noteName, onNoteChange, onNoteDeleted }: Editor
     try {
       const data = await api.getNote(name);
       setNote(data);
+      savedRef.current = data.version ? { content: data.content, version: data.version } : null;
       
       // Only show the content WITHOUT frontmatter in editor
       // Frontmatter is managed through the sidebar (title, tags, project)
@@ -128,6 +131,25 @@ export default function Editor({ noteName, onNoteChange, onNoteDeleted }: Editor
     }
   };
 
+  // Save full content: patch against the last saved version when possible,
+  // otherwise (first save, conflict, old server) send the whole note
+  const persist = async (name: string, fullContent: string) => {
+    const saved = savedRef.current;
+    if (saved) {
+      const splice = diffSplice(saved.content, fullContent);
+      if (!splice) return;
+      try {
+        const version = await api.patchNote(name, saved.version, [splice]);
+        savedRef.current = { content: fullContent, version };
+        return;
+      } catch (error) {
+        console.warn('Patch failed, saving full note:', error);
+      }
+    }
+    const version = await api.updateNote(name, fullContent);
+    savedRef.current = version ? { content: fullContent, version } : null;
+  };
+
   const saveNote = async () => {
     if (!noteName || !note || saving) return;
 
@@ -148,7 +170,7 @@ export default function Editor({ noteName, onNoteChange, onNoteDeleted }: Editor
       const fullContent = frontmatterLines.join('\n') + content;
       
       // Get current content from editor
-      await api.updateNote(noteName, fullContent);
+      await persist(noteName, fullContent);
       // Don't reload immediately to avoid losing cursor position
       // await loadNote(noteName);
     } catch (error) {
@@ -195,7 +217,7 @@ export default function Editor({ noteName, onNoteChange, onNoteDeleted }: Editor
       
       const fullContent = frontmatterLines.join('\n') + '\n\n' + content;
       
-      await api.updateNote(noteName, fullContent);
+      await persist(noteName, fullContent);
       // Don't reload the note to avoid UI reset
     } catch (error) {
       console.error('Failed to update project:', error);
@@ -65,6 +65,8 @@ export default function GraphView({ onNodeClick }: GraphViewProps) {
   const [stats, setStats] = useState({ nodes: 0, edges: 0, energy: 0 });
   const [selectedNode, setSelectedNode] = useState<string | null>(null);
   const [isSimulating, setIsSimulating] = useState(true);
+  // Mirrors isSimulating for the animation loop, which is created once
+  const simulatingRef = useRef(true);
   const [isDark, setIsDark] = useState(false);
 
   // Initialize
@@ -119,17 +121,19 @@ export default function GraphView({ onNodeClick }: GraphViewProps) {
         connectionCount.set(link.target, (connectionCount.get(link.target) || 0) + 1);
       });
 
-      // Create nodes with random initial positions (centered at 0,0)
+      // Start from the server-side layout when available, otherwise
+      // from a circle (centered at 0,0)
       data.nodes.forEach((node, index) => {
         const angle = (index / data.nodes.length) * Math.PI * 2;
         const radius = 150 + Math.random() * 100;
         const connections = connectionCount.get(node.id) || 0;
+        const hasLayout = node.x != null && node.y != null;
         
         nodes.set(node.id, {
           id: node.id,
           label: node.label,
-          x: Math.cos(angle) * radius,
-          y: Math.sin(angle) * radius,
+          x: hasLayout ? node.x! : Math.cos(angle) * radius,
+          y: hasLayout ? node.y! : Math.sin(angle) * radius,
           vx: 0,
           vy: 0,
           fx: 0,
@@ -153,6 +157,12 @@ export default function GraphView({ onNodeClick }: GraphViewProps) {
       nodesRef.current = nodes;
       edgesRef.current = edges;
       setStats({ nodes: nodes.size, edges: edges.length, energy: 0 });
+
+      // A complete server-side layout is already settled; only run the
+      // local simulation when positions are missing (or on user request)
+      if (data.nodes.length > 0 && data.nodes.every(node => node.x != null && node.y != null)) {
+        setSimulating(false);
+      }
     } catch (error) {
       console.error('Failed to load graph:', error);
     }
@@ -441,16 +451,21 @@ export default function GraphView({ onNodeClick }: GraphViewProps) {
     );
   };
 
+  const setSimulating = (value: boolean) => {
+    simulatingRef.current = value;
+    setIsSimulating(value);
+  };
+
   // Animation loop
   const startSimulation = () => {
     const animate = () => {
       // Only apply physics when not dragging
-      if (isSimulating && !isDraggingRef.current) {
+      if (simulatingRef.current && !isDraggingRef.current) {
         const energy = applyForces();
         
         // Auto-stop when stable
         if (energy < PHYSICS.stopThreshold) {
-          setIsSimulating(false);
+          setSimulating(false);
         }
         
         setStats(prev => ({ ...prev, energy: Math.round(energy * 100) / 100 }));
@@ -605,11 +620,11 @@ export default function GraphView({ onNodeClick }: GraphViewProps) {
       node.vx = (Math.random() - 0.5) * 2;
       node.vy = (Math.random() - 0.5) * 2;
     });
-    setIsSimulating(true);
+    setSimulating(true);
   };
 
   const toggleSimulation = () => {
-    setIsSimulating(!isSimulating);
+    setSimulating(!simulatingRef.current);
   };
 
   return (
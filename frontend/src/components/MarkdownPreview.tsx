@@ -4,6 +4,8 @@ import { useEffect, useRef } from 'react';
 import MarkdownIt from 'markdown-it';
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
+// Attachment widths the backend pre-renders after upload
+const RESPONSIVE_WIDTHS = [320, 640, 1280];
 
 const md = new MarkdownIt({
   html: true,
@@ -42,6 +44,16 @@ export default function MarkdownPreview({ content, onLinkClick }: MarkdownPrevie
     const html = md.render(processedContent);
     containerRef.current.innerHTML = html;
 
+    // Let the browser fetch a server-resized copy instead of scaling the original
+    containerRef.current.querySelectorAll<HTMLImageElement>('img').forEach((img) => {
+      const src = img.getAttribute('src') || '';
+      if (!src.startsWith(`${API_URL}/api/attachments/`) || src.includes('?')) return;
+      img.srcset = RESPONSIVE_WIDTHS.map((w) => `${src}?w=${w}&format=webp ${w}w`).join(', ');
+      img.sizes = '(max-width: 768px) 100vw, 768px';
+      img.loading = 'lazy';
+      img.decoding = 'async';
+    });
+
     // Handle wiki link clicks
     const handleClick = (e: MouseEvent) => {
       const target = e.target as HTMLElement;
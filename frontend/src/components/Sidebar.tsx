@@ -82,7 +82,8 @@ export default function Sidebar({ currentNote, onNoteSelect, onCreateNote }: Sid
   const loadData = async () => {
     try {
       const [notesData, tagsData, sharedNotesData] = await Promise.all([
-        api.getAllNotes(),
+        // Only the fields the tree uses; path/project are not needed here
+        api.getAllNotes(['id', 'name', 'title', 'tags']),
         api.getTags(),
         api.getSharedNotes().catch((err) => {
           console.error('Failed to fetch shared notes:', err);
@@ -72,9 +72,8 @@ export default function TaskDetailView({ taskId, onBack, onNoteClick }: TaskDeta
   const loadTaskData = async () => {
     try {
       setLoading(true);
-      // Load task
-      const tasks = await api.getTasks();
-      const foundTask = tasks.find((t: Task) => t.id === taskId);
+      // Load task (revalidated with If-None-Match when already cached)
+      const foundTask = await api.getTask(taskId).catch(() => null);
       if (foundTask) {
         setTask(foundTask);
         setEditedTitle(foundTask.title);
@@ -4,6 +4,7 @@ import { useState, useEffect } from 'react';
 import { Plus, Clock, Check, ArrowRight, FolderOpen, Trash2, CheckSquare, Share2 } from 'lucide-react';
 import { useTranslation } from '@/lib/useTranslation';
 import { api } from '@/lib/api';
+import { useRealtime } from '@/lib/realtime';
 import TaskDetailView from './TaskDetailView';
 import ShareDialog from './ShareDialog';
 
@@ -55,6 +56,9 @@ export default function TasksView() {
     loadProjects();
   }, []);
 
+  useRealtime(['tasks', 'shared'], () => loadTasks());
+  useRealtime(['projects'], () => loadProjects());
+
   const loadTasks = async () => {
     try {
       setLoading(true);
@@ -21,6 +21,35 @@ export interface Note {
   tags: string[];
   created?: string;
   modified?: string;
+  version?: number;  // Bumped on every save; base for patchNote
+}
+
+// Replace `delete` UTF-16 units at `start` of the base text with `insert`
+export interface Splice {
+  start: number;
+  delete: number;
+  insert: string;
+}
+
+// Single splice turning `base` into `text` (common prefix/suffix), or null if equal
+export function diffSplice(base: string, text: string): Splice | null {
+  if (base === text) return null;
+  const max = Math.min(base.length, text.length);
+  let prefix = 0;
+  while (prefix < max && base.charCodeAt(prefix) === text.charCodeAt(prefix)) prefix++;
+  let suffix = 0;
+  while (
+    suffix < max - prefix &&
+    base.charCodeAt(base.length - 1 - suffix) === text.charCodeAt(text.length - 1 - suffix)
+  ) suffix++;
+  // Don't split a surrogate pair (emoji etc.) at either boundary
+  if (prefix > 0 && /[\uD800-\uDBFF]/.test(base[prefix - 1])) prefix--;
+  if (suffix > 0 && /[\uDC00-\uDFFF]/.test(base[base.length - suffix])) suffix--;
+  return {
+    start: prefix,
+    delete: base.length - prefix - suffix,
+    insert: text.slice(prefix, text.length - suffix),
+  };
 }
 
 export interface NoteList {
@@ -53,6 +82,8 @@ export interface GraphNode {
   title?: string;
   tags: string[];
   size: number;
+  x?: number | null;  // Server-side layout position
+  y?: number | null;
 }
 
 export interface GraphEdge {
@@ -105,6 +136,44 @@ export interface Habit {
 }
 
 class API {
+  // ETag per item URL (notes, tasks, snippets). GETs revalidate with
+  // If-None-Match and reuse the cached body on 304; PUTs send If-Match so a
+  // concurrent edit fails with 412 instead of being overwritten.
+  private etags = new Map<string, string>();
+  private bodies = new Map<string, any>();
+
+  private async getVersioned(url: string, errorMessage: string): Promise<any> {
+    const cached = this.bodies.get(url);
+    const etag = this.etags.get(url);
+    const res = await fetch(url, {
+      headers: {
+        ...getAuthHeaders(),
+        ...(cached !== undefined && etag ? { 'If-None-Match': etag } : {})
+      }
+    });
+    if (res.status === 304 && cached !== undefined) return cached;
+    if (!res.ok) throw new Error(errorMessage);
+    const body = await res.json();
+    this.remember(url, res, body);
+    return body;
+  }
+
+  private ifMatch(url: string): Record<string, string> {
+    const etag = this.etags.get(url);
+    return etag ? { 'If-Match': etag } : {};
+  }
+
+  private remember(url: string, res: Response, body?: any) {
+    const etag = res.headers.get('ETag');
+    if (etag) this.etags.set(url, etag); else this.etags.delete(url);
+    if (etag && body !== undefined) this.bodies.set(url, body); else this.bodies.delete(url);
+  }
+
+  private forget(url: string) {
+    this.etags.delete(url);
+    this.bodies.delete(url);
+  }
+
   // Simple fetch wrapper with retries for transient errors (503, network failures)
   private async requestWithRetries(input: string, init?: RequestInit, retries: number = 3, backoffMs: number = 250): Promise<Response> {
     let attempt = 0;
@@ -129,8 +198,9 @@ class API {
     }
   }
 
-  async getAllNotes(): Promise<NoteList[]> {
-    const res = await this.requestWithRetries(`${API_URL}/api/notes`, {
+  async getAllNotes(fields?: (keyof NoteList)[]): Promise<NoteList[]> {
+    const query = fields ? `?fields=${fields.join(',')}` : '';
+    const res = await this.requestWithRetries(`${API_URL}/api/notes${query}`, {
       headers: getAuthHeaders()
     });
     if (!res.ok) throw new Error('Failed to fetch notes');
@@ -138,11 +208,7 @@ class API {
   }
 
   async getNote(name: string): Promise<Note> {
-    const res = await fetch(`${API_URL}/api/notes/${encodeURIComponent(name)}`, {
-      headers: getAuthHeaders()
-    });
-    if (!res.ok) throw new Error('Failed to fetch note');
-    return res.json();
+    return this.getVersioned(`${API_URL}/api/notes/${encodeURIComponent(name)}`, 'Failed to fetch note');
   }
 
   async createNote(name: string, content: string = '', folder?: string): Promise<void> {
@@ -161,24 +227,50 @@ class API {
     }
   }
 
-  async updateNote(name: string, content: string, newName?: string): Promise<void> {
-    const res = await fetch(`${API_URL}/api/notes/${encodeURIComponent(name)}`, {
+  async updateNote(name: string, content: string, newName?: string): Promise<number | undefined> {
+    const url = `${API_URL}/api/notes/${encodeURIComponent(name)}`;
+    const res = await fetch(url, {
       method: 'PUT',
       headers: {
         'Content-Type': 'application/json',
-        ...getAuthHeaders()
+        ...getAuthHeaders(),
+        ...this.ifMatch(url)
       },
       body: JSON.stringify({ content, name: newName }),
     });
+    if (res.status === 412) {
+      this.forget(url);
+      throw new Error('Note was modified by someone else');
+    }
     if (!res.ok) throw new Error('Failed to update note');
+    if (newName && newName !== name) this.forget(url);
+    else this.remember(url, res);
+    return (await res.json()).version;
   }
 
-  async deleteNote(name: string): Promise<void> {
+  // Send only the changed range; throws if the note changed since baseVersion
+  async patchNote(name: string, baseVersion: number, splices: Splice[]): Promise<number> {
     const res = await fetch(`${API_URL}/api/notes/${encodeURIComponent(name)}`, {
+      method: 'PATCH',
+      headers: {
+        'Content-Type': 'application/json',
+        ...getAuthHeaders()
+      },
+      body: JSON.stringify({ base_version: baseVersion, splices }),
+    });
+    if (!res.ok) throw new Error(res.status === 409 ? 'Note was modified' : 'Failed to patch note');
+    this.remember(`${API_URL}/api/notes/${encodeURIComponent(name)}`, res);
+    return (await res.json()).version;
+  }
+
+  async deleteNote(name: string): Promise<void> {
+    const url = `${API_URL}/api/notes/${encodeURIComponent(name)}`;
+    const res = await fetch(url, {
       method: 'DELETE',
       headers: getAuthHeaders()
     });
     if (!res.ok) throw new Error('Failed to delete note');
+    this.forget(url);
   }
 
   async search(query: string): Promise<SearchResult[]> {
@@ -190,7 +282,7 @@ class API {
   }
 
   async getGraph(): Promise<GraphData> {
-    const res = await fetch(`${API_URL}/api/graph`, {
+    const res = await fetch(`${API_URL}/api/graph?layout=true`, {
       headers: getAuthHeaders()
     });
     if (!res.ok) throw new Error('Failed to fetch graph');
@@ -285,25 +377,39 @@ class API {
     return res.json();
   }
 
+  async getTask(id: string): Promise<any> {
+    return this.getVersioned(`${API_URL}/api/tasks/${id}`, 'Failed to fetch task');
+  }
+
   async updateTask(id: string, data: any): Promise<any> {
-    const res = await fetch(`${API_URL}/api/tasks/${id}`, {
+    const url = `${API_URL}/api/tasks/${id}`;
+    const res = await fetch(url, {
       method: 'PUT',
       headers: {
         'Content-Type': 'application/json',
-        ...getAuthHeaders()
+        ...getAuthHeaders(),
+        ...this.ifMatch(url)
       },
       body: JSON.stringify(data),
     });
+    if (res.status === 412) {
+      this.forget(url);
+      throw new Error('Task was modified by someone else');
+    }
     if (!res.ok) throw new Error('Failed to update task');
-    return res.json();
+    const task = await res.json();
+    this.remember(url, res, task);
+    return task;
   }
 
   async deleteTask(id: string): Promise<void> {
-    const res = await fetch(`${API_URL}/api/tasks/${id}`, {
+    const url = `${API_URL}/api/tasks/${id}`;
+    const res = await fetch(url, {
       method: 'DELETE',
       headers: getAuthHeaders()
     });
     if (!res.ok) throw new Error('Failed to delete task');
+    this.forget(url);
   }
 
   // Ideas API
@@ -426,25 +532,39 @@ class API {
     return res.json();
   }
 
+  async getSnippet(id: string): Promise<any> {
+    return this.getVersioned(`${API_URL}/api/snippets/${id}`, 'Failed to fetch snippet');
+  }
+
   async updateSnippet(id: string, data: any): Promise<any> {
-    const res = await fetch(`${API_URL}/api/snippets/${id}`, {
+    const url = `${API_URL}/api/snippets/${id}`;
+    const res = await fetch(url, {
       method: 'PUT',
       headers: {
         'Content-Type': 'application/json',
-        ...getAuthHeaders()
+        ...getAuthHeaders(),
+        ...this.ifMatch(url)
       },
       body: JSON.stringify(data),
     });
+    if (res.status === 412) {
+      this.forget(url);
+      throw new Error('Snippet was modified by someone else');
+    }
     if (!res.ok) throw new Error('Failed to update snippet');
-    return res.json();
+    const snippet = await res.json();
+    this.remember(url, res, snippet);
+    return snippet;
   }
 
   async deleteSnippet(id: string): Promise<void> {
-    const res = await fetch(`${API_URL}/api/snippets/${id}`, {
+    const url = `${API_URL}/api/snippets/${id}`;
+    const res = await fetch(url, {
       method: 'DELETE',
       headers: getAuthHeaders()
     });
     if (!res.ok) throw new Error('Failed to delete snippet');
+    this.forget(url);
   }
 
   // ============= Connects API =============
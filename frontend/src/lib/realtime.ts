@@ -0,0 +1,96 @@
+/**
+ * Realtime
+ * One shared WebSocket to /ws per tab; components subscribe to the events
+ * they care about instead of re-fetching lists to notice changes
+ */
+
+import { useEffect, useRef } from 'react';
+
+const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
+const WS_URL = API_URL.replace(/^http/, 'ws') + '/ws';
+
+export interface RealtimeEvent {
+  type: 'ready' | 'changes' | 'connects' | 'shared' | 'resync' | 'pong';
+  cursor?: number;
+  changes?: Record<string, { upserts: (string | number)[]; deletes: (string | number)[] }>;
+  action?: string;
+  item_type?: string;
+  item_id?: string;
+  request_id?: string;
+}
+
+type Listener = (event: RealtimeEvent) => void;
+
+const listeners = new Set<Listener>();
+let socket: WebSocket | null = null;
+let retryDelay = 1000;
+let retryTimer: ReturnType<typeof setTimeout> | null = null;
+
+function connect() {
+  const token = localStorage.getItem('auth_token');
+  if (!token || socket) return;
+
+  const ws = new WebSocket(WS_URL);
+  socket = ws;
+  ws.onopen = () => ws.send(JSON.stringify({ type: 'auth', token }));
+  ws.onmessage = (message) => {
+    const event: RealtimeEvent = JSON.parse(message.data);
+    if (event.type === 'ready') {
+      // A reconnect may have missed events; let everyone reload once
+      if (retryDelay > 1000) listeners.forEach((listener) => listener({ type: 'resync' }));
+      retryDelay = 1000;
+    }
+    listeners.forEach((listener) => listener(event));
+  };
+  ws.onclose = () => {
+    socket = null;
+    if (listeners.size === 0) return;
+    retryTimer = setTimeout(connect, retryDelay);
+    retryDelay = Math.min(retryDelay * 2, 30000);
+  };
+}
+
+function disconnect() {
+  if (retryTimer) clearTimeout(retryTimer);
+  retryTimer = null;
+  socket?.close();
+  socket = null;
+}
+
+export function subscribe(listener: Listener): () => void {
+  listeners.add(listener);
+  connect();
+  return () => {
+    listeners.delete(listener);
+    if (listeners.size === 0) disconnect();
+  };
+}
+
+/**
+ * Call `onChange` (debounced) whenever one of the given entities changes,
+ * e.g. useRealtime(['tasks', 'shared'], loadTasks). 'connects' and 'shared'
+ * match the connect and sharing events, anything else a changed entity.
+ */
+export function useRealtime(entities: string[], onChange: () => void, delay = 300) {
+  const callback = useRef(onChange);
+  callback.current = onChange;
+  const key = entities.join(',');
+
+  useEffect(() => {
+    const wanted = new Set(key.split(','));
+    let timer: ReturnType<typeof setTimeout> | null = null;
+    const unsubscribe = subscribe((event) => {
+      const hit =
+        event.type === 'resync' ||
+        ((event.type === 'connects' || event.type === 'shared') && wanted.has(event.type)) ||
+        (event.type === 'changes' && Object.keys(event.changes || {}).some((entity) => wanted.has(entity)));
+      if (!hit) return;
+      if (timer) clearTimeout(timer);
+      timer = setTimeout(() => callback.current(), delay);
+    });
+    return () => {
+      if (timer) clearTimeout(timer);
+      unsubscribe();
+    };
+  }, [key, delay]);
+}